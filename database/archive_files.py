@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import io
+import os
+import zipfile
+
+# weekly files are read straight out of compressed archives, without extracting them first:
+# - xml/2013/ipgb20130101.xml.gz      one gzip-compressed weekly file
+# - xml/2013/ipgb20130101.zip         a zip holding the weekly file, as the USPTO bulk downloads come
+# - json.zip!json/2013/ipgb20130101.json   a member of a source archive (the json.zip of the Google Drive folder),
+#                                          named by the archive path and the member path joined by MEMBER_SEPARATOR
+MEMBER_SEPARATOR = '!'
+ARCHIVE_EXTENSIONS = ('.gz', '.zip')
+
+def split_member(filename):
+    if MEMBER_SEPARATOR in filename:
+        archive, member = filename.split(MEMBER_SEPARATOR, 1)
+        return archive, member
+    return filename, None
+
+def is_data_member(name):
+    return not name.endswith('/') and not os.path.basename(name).startswith('.') and '__MACOSX' not in name
+
+# the weekly file inside a zip downloaded from the USPTO, e.g. ipg130101.xml inside ipg130101.zip
+def weekly_member(archive):
+    members = [info for info in archive.infolist() if is_data_member(info.filename)]
+    if len(members) != 1:
+        raise ValueError(archive.filename + " should hold exactly one weekly file, it holds " + str(len(members)))
+    return members[0]
+
+# binary stream of the uncompressed weekly file, decompressed while it is read
+# (a zip file closed while one of its members is open stays open until the member stream is closed)
+def open_binary(filename):
+    path, member = split_member(filename)
+    if member is None and path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if member is None and not path.endswith('.zip'):
+        return open(path, 'rb')
+    with zipfile.ZipFile(path) as archive:
+        return archive.open(member if member is not None else weekly_member(archive))
+
+# uncompressed bytes of a weekly file that also go into a hash as they are read, so the parse that reads the file
+# hashes it, instead of a second read of the file just for its digest
+class HashingReader(io.RawIOBase):
+    def __init__(self, raw, sha256):
+        self.raw = raw
+        self.sha256 = sha256
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        if n:
+            self.sha256.update(memoryview(buffer)[:n])
+        return n
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+# with sha256 (a hashlib object), the uncompressed bytes read are hashed into it
+def open_text(filename, encoding='utf-8', sha256=None):
+    if sha256 is None:
+        return io.TextIOWrapper(open_binary(filename), encoding=encoding)
+    return io.TextIOWrapper(io.BufferedReader(HashingReader(open_binary(filename), sha256)), encoding=encoding)
+
+# size and SHA-256 recorded in the ingest manifest: the size of the file as it is stored on disk (a member of a
+# source archive has its member size), the SHA-256 of the uncompressed weekly file, as the import hashes it while
+# parsing it (see open_text); this reads the whole file, the import only calls it to verify imported files
+def file_digest(filename):
+    sha256 = hashlib.sha256()
+    with open_binary(filename) as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(chunk)
+    return file_size(filename), sha256.hexdigest()
+
+def file_size(filename):
+    path, member = split_member(filename)
+    if member is None:
+        return os.path.getsize(path)
+    with zipfile.ZipFile(path) as archive:
+        return archive.getinfo(member).file_size
+
+# members of a source archive that belong to a year, found by their directory name (e.g. json/2013/...)
+def list_archive_members(archive_path, year):
+    with zipfile.ZipFile(archive_path) as archive:
+        names = [name for name in archive.namelist() if is_data_member(name)]
+    return sorted(archive_path + MEMBER_SEPARATOR + name for name in names if name.split('/')[-2:-1] == [year])
@@ -0,0 +1,116 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from search_patents import schema_sql
+from bulk_loader import first_pending_rowid
+from build_name_keys import derived_version, set_derived_version
+from name_keys import name_keys_version
+
+# co-inventor graph: every inventor gets the identity of its normalized name (surname_key and first_key of
+# build_name_keys.py, so "Bill Smith" and "William Smith" are one identity), and coinventors holds an edge in both
+# directions between every two identities named on the same patent, weighted by the number of patents they share
+# coinventors is clustered by its primary key, so the neighbors of an identity are one range of the b-tree
+# inventors without a surname key get identity 0, which is not in the graph
+COINVENTOR_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS inventor_identities (
+        id INTEGER PRIMARY KEY,
+        surname_key TEXT NOT NULL,
+        first_key TEXT NOT NULL,
+        UNIQUE (surname_key, first_key)
+    );
+    CREATE TABLE IF NOT EXISTS coinventors (
+        identity_id INTEGER NOT NULL,
+        coinventor_id INTEGER NOT NULL,
+        patents INTEGER NOT NULL,
+        PRIMARY KEY (identity_id, coinventor_id)
+    ) WITHOUT ROWID;
+    """
+
+def create_tables_coinventors(connection):
+    connection.executescript(COINVENTOR_TABLES_SQL)
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(inventors)").fetchall()]
+    if 'identity_id' not in columns:
+        connection.execute("ALTER TABLE inventors ADD COLUMN identity_id INTEGER")
+    connection.commit()
+
+# give the inventors from first_id on without an identity theirs, so after an incremental import only new rows are
+# visited (inventors are only visited once build_name_keys.py has given them their keys)
+# new inventors are new patents, which are remembered in temp.new_coinventor_patents for fill_coinventors
+# inventors are visited in id ranges of chunk_size; nothing is committed before fill_coinventors has added the
+# edges of the new patents, so an interrupted build leaves the inventors without identity and is redone
+def fill_inventor_identities(connection, first_id=1, chunk_size=100000):
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS new_coinventor_patents (ref PRIMARY KEY) WITHOUT ROWID")
+    identities_sql = """
+        INSERT OR IGNORE INTO inventor_identities (surname_key, first_key)
+        SELECT surname_key, coalesce(first_key, '') FROM inventors
+        WHERE id >= ? AND id < ? AND identity_id IS NULL AND surname_key != ''
+        """
+    patents_sql = """
+        INSERT OR IGNORE INTO temp.new_coinventor_patents SELECT {ref} FROM inventors
+        WHERE id >= ? AND id < ? AND identity_id IS NULL AND surname_key IS NOT NULL
+        """
+    update_sql = """
+        UPDATE inventors SET identity_id = coalesce((SELECT t.id FROM inventor_identities t
+                                                     WHERE t.surname_key = inventors.surname_key AND t.first_key = coalesce(inventors.first_key, '')), 0)
+        WHERE id >= ? AND id < ? AND identity_id IS NULL AND surname_key IS NOT NULL
+        """
+    first_id, last_id = connection.execute("SELECT min(id), max(id) FROM inventors WHERE id >= ? AND identity_id IS NULL AND surname_key IS NOT NULL",
+                                           (first_id,)).fetchone()
+    updated = 0
+    if first_id is not None:
+        for start in range(first_id, last_id + 1, chunk_size):
+            connection.execute(identities_sql, (start, start + chunk_size))
+            connection.execute(patents_sql.format(**schema_sql(connection)), (start, start + chunk_size))
+            updated += connection.execute(update_sql, (start, start + chunk_size)).rowcount
+    print(str(updated) + " inventors given an identity of the co-inventor graph...")
+
+# add the edges of the new patents, the patents two identities share are added to the weight of their edge
+def fill_coinventors(connection):
+    connection.execute("DROP TABLE IF EXISTS temp.new_patent_identities")
+    connection.execute("""
+        CREATE TEMP TABLE new_patent_identities AS
+        SELECT DISTINCT i.{ref} AS ref, i.identity_id FROM temp.new_coinventor_patents n
+        CROSS JOIN inventors i ON i.{ref} = n.ref
+        WHERE i.identity_id != 0
+        """.format(**schema_sql(connection)))
+    connection.execute("CREATE INDEX temp.new_patent_identities_ref ON new_patent_identities (ref, identity_id)")
+    connection.execute("""
+        INSERT INTO coinventors (identity_id, coinventor_id, patents)
+        SELECT a.identity_id, b.identity_id, count(*) FROM temp.new_patent_identities a
+        INNER JOIN temp.new_patent_identities b ON b.ref = a.ref AND b.identity_id != a.identity_id
+        GROUP BY a.identity_id, b.identity_id
+        ON CONFLICT (identity_id, coinventor_id) DO UPDATE SET patents = patents + excluded.patents
+        """)
+    patents = connection.execute("SELECT count(*) FROM temp.new_coinventor_patents").fetchone()[0]
+    connection.execute("DROP TABLE temp.new_patent_identities")
+    connection.execute("DELETE FROM temp.new_coinventor_patents")
+    connection.commit()
+    edges = connection.execute("SELECT count(*) FROM coinventors").fetchone()[0] // 2
+    print(str(patents) + " patents added to the co-inventor graph, " + str(edges) + " co-inventor pairs...")
+
+# identities are keyed by the name keys, so a graph built under another name_keys_version() is cleared and rebuilt
+def clear_coinventors(connection):
+    connection.execute("DELETE FROM coinventors")
+    connection.execute("DELETE FROM inventor_identities")
+    connection.execute("UPDATE inventors SET identity_id = NULL WHERE identity_id IS NOT NULL")
+    connection.commit()
+
+# an incremental import only visits the inventors of the pending patents (see bulk_loader.py)
+def build_coinventors(connection, incremental=False):
+    create_tables_coinventors(connection)
+    version = name_keys_version()
+    first_id = first_pending_rowid(connection, 'inventors') if incremental else 1
+    if derived_version(connection, 'coinventors') != version:
+        clear_coinventors(connection)
+        first_id = 1
+    fill_inventor_identities(connection, first_id)
+    fill_coinventors(connection)
+    set_derived_version(connection, 'coinventors', version)
+
+if __name__ == '__main__':
+    from database_setup import get_database
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "patents.db"
+    connection = get_database(db_path)
+    build_coinventors(connection)
+    connection.close()
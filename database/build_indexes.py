@@ -0,0 +1,81 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from search_patents import search_sql, name_match_sql, schema_sql, family_sql, create_faculty_database, university_parameters, NO_FILTER
+
+# covering indexes for the join in search_patents:
+# faculty surname -> inventors -> grantees -> patents, all by document number
+INDEXES = [
+    ("idx_inventors_surname", "CREATE INDEX IF NOT EXISTS idx_inventors_surname ON inventors (surname, first_name, document_number, city, state)"),
+    ("idx_inventors_document_number", "CREATE INDEX IF NOT EXISTS idx_inventors_document_number ON inventors (document_number)"),
+    ("idx_grantees_document_number", "CREATE INDEX IF NOT EXISTS idx_grantees_document_number ON grantees (document_number, name)"),
+    ("idx_patents_document_number", "CREATE INDEX IF NOT EXISTS idx_patents_document_number ON patents (document_number, document_date, title_of_invention)"),
+    # grant date and classification filters of the search: the candidate patents are a range scan of one of these
+    ("idx_patents_document_date", "CREATE INDEX IF NOT EXISTS idx_patents_document_date ON patents (document_date, document_number)"),
+    ("idx_patents_classification", "CREATE INDEX IF NOT EXISTS idx_patents_classification ON patents (national_main_classifications, document_number)"),
+]
+
+# trigram full-text index over grantees.name, so the LIKE '%university%' of the search is answered from the index
+# it is an external content table that stores no copy of the names, the triggers keep it in sync with grantees
+GRANTEES_FTS_SQL = """
+    CREATE VIRTUAL TABLE grantees_fts USING fts5(name, content='grantees', content_rowid='id', tokenize='trigram');
+    CREATE TRIGGER IF NOT EXISTS grantees_fts_insert AFTER INSERT ON grantees BEGIN
+        INSERT INTO grantees_fts (rowid, name) VALUES (new.id, new.name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS grantees_fts_delete AFTER DELETE ON grantees BEGIN
+        INSERT INTO grantees_fts (grantees_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS grantees_fts_update AFTER UPDATE OF name ON grantees BEGIN
+        INSERT INTO grantees_fts (grantees_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO grantees_fts (rowid, name) VALUES (new.id, new.name);
+    END;
+    INSERT INTO grantees_fts (grantees_fts) VALUES ('rebuild');
+"""
+
+# built once from the existing grantees, afterwards the triggers keep it up to date during ingest
+def create_grantees_fts(connection):
+    if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'grantees_fts'").fetchone() is not None:
+        return
+    connection.executescript(GRANTEES_FTS_SQL)
+    print("Full-text index grantees_fts created successfully...")
+
+# only the missing indexes are created (all of them are after a full load, see bulk_loader.py)
+# a full load is analyzed in full; an incremental import analyzes the indexes it created (e.g. after a crash)
+# and lets PRAGMA optimize refresh the statistics of the tables that grew, instead of re-analyzing every table
+def create_indexes(connection, incremental=False):
+    existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master").fetchall()}
+    created = []
+    for name, sql in INDEXES:
+        if name not in existing:
+            connection.execute(sql)
+            created.append(name)
+            print("Index " + name + " created successfully...")
+    create_grantees_fts(connection)
+    if not incremental or 'sqlite_stat1' not in existing:
+        connection.execute("ANALYZE")
+    else:
+        for name in created:
+            connection.execute(f"ANALYZE {name}")
+        connection.execute("PRAGMA optimize")
+    connection.commit()
+
+# query plan of the search_patents query, run against an empty faculty table
+def explain_search(connection):
+    dbname = create_faculty_database(connection, "plan")
+    sql = "EXPLAIN QUERY PLAN " + search_sql(connection).format(dbname=dbname, name_match=name_match_sql(connection), **schema_sql(connection), **family_sql(connection), **NO_FILTER)
+    return [row[3] for row in connection.execute(sql, university_parameters("University")).fetchall()]
+
+def print_plan(title, plan):
+    print(title)
+    for step in plan:
+        print("    " + step)
+
+if __name__ == '__main__':
+    from database_setup import get_database
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "patents.db"
+    connection = get_database(db_path)
+    print_plan("Query plan before indexing:", explain_search(connection))
+    create_indexes(connection)
+    print_plan("Query plan after indexing:", explain_search(connection))
+    connection.close()
@@ -0,0 +1,78 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from name_keys import name_keys, name_keys_version
+from search_patents import schema_sql
+from bulk_loader import first_pending_rowid
+
+KEY_COLUMNS = ['first_key', 'first_initial', 'first_soundex', 'surname_key', 'surname_soundex']
+
+# the search joins faculty to inventors by equality on these keys instead of a LIKE per surname match
+NAME_KEY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_inventors_name_key ON inventors (surname_key, first_key, {ref})",
+    "CREATE INDEX IF NOT EXISTS idx_inventors_name_soundex ON inventors (surname_soundex, first_soundex, {ref})",
+]
+
+# version of the name keys each derived table was built with, e.g. ('name_keys', '<name_keys_version()>')
+DERIVED_VERSIONS_SQL = "CREATE TABLE IF NOT EXISTS derived_versions (stage TEXT PRIMARY KEY, version TEXT NOT NULL) WITHOUT ROWID"
+
+def derived_version(connection, stage):
+    connection.execute(DERIVED_VERSIONS_SQL)
+    row = connection.execute("SELECT version FROM derived_versions WHERE stage = ?", (stage,)).fetchone()
+    return row[0] if row is not None else None
+
+def set_derived_version(connection, stage, version):
+    connection.execute(DERIVED_VERSIONS_SQL)
+    connection.execute("INSERT OR REPLACE INTO derived_versions VALUES (?, ?)", (stage, version))
+    connection.commit()
+
+def create_columns_name_keys(connection):
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(inventors)").fetchall()]
+    for column in KEY_COLUMNS:
+        if column not in columns:
+            connection.execute(f"ALTER TABLE inventors ADD COLUMN {column} TEXT")
+    # nicknames are resolved by src/name_keys.py when the keys are filled, databases keyed before that have an
+    # unused name_equivalents table
+    connection.execute("DROP TABLE IF EXISTS name_equivalents")
+    connection.commit()
+
+# fill the keys of the inventors from first_id on that do not have them yet, so after an incremental import only
+# new rows are visited, or with rekey those of every inventor from first_id on
+# rows are read in id order in chunks and updated by rowid, one transaction per chunk
+def fill_name_keys(connection, first_id=1, rekey=False, chunk_size=100000):
+    select_sql = "SELECT id, first_name, surname FROM inventors WHERE id > ? {unkeyed}ORDER BY id LIMIT ?".format(unkeyed='' if rekey else 'AND surname_key IS NULL ')
+    update_sql = "UPDATE inventors SET first_key = ?, first_initial = ?, first_soundex = ?, surname_key = ?, surname_soundex = ? WHERE id = ?"
+    last_id = first_id - 1
+    updated = 0
+    while True:
+        rows = connection.execute(select_sql, (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        connection.executemany(update_sql, [name_keys(first_name, surname) + (id,) for id, first_name, surname in rows])
+        connection.commit()
+        last_id = rows[-1][0]
+        updated += len(rows)
+    print(str(updated) + " inventors keyed by normalized, nickname and phonetic names...")
+
+# an incremental import only visits the inventors of the pending patents (see bulk_loader.py)
+# every inventor is re-keyed when the keys were filled under another name_keys_version(), e.g. after NICKNAMES
+# was edited; the version is only stored once all rows are keyed, so an interrupted re-key starts over
+def build_name_keys(connection, incremental=False):
+    create_columns_name_keys(connection)
+    version = name_keys_version()
+    if derived_version(connection, 'name_keys') != version:
+        fill_name_keys(connection, rekey=True)
+    else:
+        fill_name_keys(connection, first_pending_rowid(connection, 'inventors') if incremental else 1)
+    set_derived_version(connection, 'name_keys', version)
+    for sql in NAME_KEY_INDEXES:
+        connection.execute(sql.format(**schema_sql(connection)))
+    connection.commit()
+
+if __name__ == '__main__':
+    from database_setup import get_database
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "patents.db"
+    connection = get_database(db_path)
+    build_name_keys(connection)
+    connection.close()
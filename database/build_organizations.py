@@ -0,0 +1,74 @@
+import os
+import sys
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from organizations import normalize_org_name, ORGANIZATION_ALIASES
+from search_patents import schema_sql
+from bulk_loader import first_pending_rowid
+
+ORGANIZATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS organizations (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        normalized_name TEXT UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS organization_aliases (
+        alias TEXT PRIMARY KEY,
+        org_id INTEGER,
+        FOREIGN KEY (org_id) REFERENCES organizations(id)
+    );
+"""
+
+def create_tables_organizations(connection):
+    connection.executescript(ORGANIZATIONS_SQL)
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(grantees)").fetchall()]
+    if 'org_id' not in columns:
+        connection.execute("ALTER TABLE grantees ADD COLUMN org_id INTEGER REFERENCES organizations(id)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_grantees_org_id ON grantees (org_id, {ref})".format(**schema_sql(connection)))
+    connection.commit()
+
+# map every grantee without an org_id to the organization of its normalized name,
+# creating organizations for names not seen before (canonical name = most frequent spelling)
+# only new grantees are visited, those from first_id on, so this is cheap after an incremental import
+def map_grantees(connection, first_id=1):
+    names = connection.execute("SELECT name, count(*) FROM grantees WHERE id >= ? AND org_id IS NULL AND name != 'null' GROUP BY name", (first_id,)).fetchall()
+    spellings = {}
+    for name, count in names:
+        spellings.setdefault(normalize_org_name(name), Counter())[name] += count
+
+    org_ids = dict(connection.execute("SELECT normalized_name, id FROM organizations").fetchall())
+    new_organizations = [(spellings[key].most_common(1)[0][0], key) for key in spellings if key not in org_ids]
+    connection.executemany("INSERT INTO organizations (name, normalized_name) VALUES (?, ?)", new_organizations)
+    org_ids = dict(connection.execute("SELECT normalized_name, id FROM organizations").fetchall())
+
+    connection.execute("CREATE TEMP TABLE grantee_org (name TEXT PRIMARY KEY, org_id INTEGER)")
+    connection.executemany("INSERT INTO grantee_org VALUES (?, ?)", [(name, org_ids[normalize_org_name(name)]) for name, _ in names])
+    connection.execute("""
+        UPDATE grantees SET org_id = (SELECT org_id FROM grantee_org WHERE grantee_org.name = grantees.name)
+        WHERE id >= ? AND org_id IS NULL AND name IN (SELECT name FROM grantee_org)
+        """, (first_id,))
+    connection.execute("DROP TABLE grantee_org")
+    connection.commit()
+    print(str(len(names)) + " grantee names mapped to organizations, " + str(len(new_organizations)) + " new organizations...")
+
+def create_aliases(connection):
+    for alias, normalized_name in ORGANIZATION_ALIASES.items():
+        connection.execute("""
+            INSERT OR REPLACE INTO organization_aliases (alias, org_id)
+            SELECT ?, id FROM organizations WHERE normalized_name = ?
+            """, (alias, normalized_name))
+    connection.commit()
+
+# an incremental import only visits the grantees of the pending patents (see bulk_loader.py)
+def build_organizations(connection, incremental=False):
+    create_tables_organizations(connection)
+    map_grantees(connection, first_pending_rowid(connection, 'grantees') if incremental else 1)
+    create_aliases(connection)
+
+if __name__ == '__main__':
+    from database_setup import get_database
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "patents.db"
+    connection = get_database(db_path)
+    build_organizations(connection)
+    connection.close()
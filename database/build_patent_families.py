@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from family_keys import family_id
+from search_patents import schema_sql, schema_version
+from bulk_loader import first_pending_rowid
+
+# family id of every patent (see src/family_keys.py), the search reports one row per family and faculty name
+# by joining this table instead of grouping the joined rows by title
+PATENT_FAMILIES_SQL = {
+    1: "CREATE TABLE IF NOT EXISTS patent_families (document_number TEXT PRIMARY KEY, family_id INTEGER NOT NULL) WITHOUT ROWID",
+    2: "CREATE TABLE IF NOT EXISTS patent_families (patent_id INTEGER PRIMARY KEY, family_id INTEGER NOT NULL)",
+}
+
+def create_table_patent_families(connection):
+    connection.execute(PATENT_FAMILIES_SQL[schema_version(connection)])
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_patent_families_family_id ON patent_families (family_id)")
+    connection.commit()
+
+# add the patents from first_rowid on that are not in patent_families yet, so after an incremental import only new
+# grants are visited; a reissue or continuation imported later hashes to the family of its original grant
+# patents are read in rowid order in chunks, one transaction per chunk
+def fill_patent_families(connection, first_rowid=1, chunk_size=100000):
+    select_sql = """
+        SELECT p.rowid, p.{key}, p.title_of_invention, p.document_number,
+               (SELECT g.name FROM grantees g WHERE g.{ref} = p.{key} ORDER BY g.id LIMIT 1)
+        FROM patents p
+        WHERE p.rowid > ? AND NOT EXISTS (SELECT 1 FROM patent_families pf WHERE pf.{ref} = p.{key})
+        ORDER BY p.rowid LIMIT ?
+        """.format(**schema_sql(connection))
+    last_rowid = first_rowid - 1
+    added = 0
+    while True:
+        rows = connection.execute(select_sql, (last_rowid, chunk_size)).fetchall()
+        if not rows:
+            break
+        connection.executemany("INSERT INTO patent_families VALUES (?, ?)",
+                               [(key, family_id(title, grantee_name, document_number)) for _, key, title, document_number, grantee_name in rows])
+        connection.commit()
+        last_rowid = rows[-1][0]
+        added += len(rows)
+    families = connection.execute("SELECT count(DISTINCT family_id) FROM patent_families").fetchone()[0]
+    print(str(added) + " patents added to patent_families, " + str(families) + " families...")
+
+# an incremental import only visits the pending patents (see bulk_loader.py)
+def build_patent_families(connection, incremental=False):
+    create_table_patent_families(connection)
+    fill_patent_families(connection, first_pending_rowid(connection, 'patents') if incremental else 1)
+
+if __name__ == '__main__':
+    from database_setup import get_database
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "patents.db"
+    connection = get_database(db_path)
+    build_patent_families(connection)
+    connection.close()
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import instrumentation
+
+INSERT_SQL = {
+    'patents': "INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    'inventors': "INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, ?, ?, ?, ?, ?)",
+    'grantees': "INSERT INTO grantees (document_number, name, city, state, country, type) VALUES (?, ?, ?, ?, ?, ?)",
+}
+
+MANIFEST_SQL = "INSERT OR REPLACE INTO ingest_manifest VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))"
+
+# document numbers of the patents loaded since the derived-table stages last ran (see database_setup.import_database),
+# committed with the rows of their file, so the patents of a crashed import stay pending until a rerun completes it
+PENDING_PATENTS_SQL = "CREATE TABLE IF NOT EXISTS pending_patents (document_number TEXT PRIMARY KEY) WITHOUT ROWID"
+
+# buffers the rows of each table and writes them with executemany in batches,
+# each weekly file is committed in its own transaction together with its ingest_manifest row
+# while loading, the connection uses load-friendly settings (no fsync, large page cache, WAL or no journal)
+# and, when loading into empty tables, the secondary indexes are dropped, then rebuilt once in finish()
+class BulkLoader:
+    def __init__(self, connection: sqlite3.Connection, batch_size=50000, journal_mode='WAL', cache_size_mb=1024):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.journal_mode = journal_mode
+        self.cache_size_mb = cache_size_mb
+        self.buffers = {table: [] for table in INSERT_SQL}
+        self.pending = []
+        self.buffered = 0
+        self.file_counts = {table: 0 for table in INSERT_SQL}
+        self.rows_loaded = 0
+        self.full_load = False
+        self.deferred_indexes = []
+        self.started_at = None
+        self.file_started_at = None
+
+    def start(self):
+        self.connection.commit()
+        self.connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute(f"PRAGMA cache_size=-{self.cache_size_mb * 1024}")
+        self.connection.execute("PRAGMA temp_store=MEMORY")
+        self.connection.execute(PENDING_PATENTS_SQL)
+        # rebuilding the indexes only pays off for a full import, an incremental one keeps them
+        self.full_load = self.connection.execute("SELECT 1 FROM patents LIMIT 1").fetchone() is None
+        if self.full_load:
+            self.defer_indexes()
+        self.started_at = time.perf_counter()
+        self.file_started_at = self.started_at
+
+    # drop the secondary indexes of the loaded tables so rows are not indexed one by one
+    def defer_indexes(self):
+        tables = ', '.join(f"'{t}'" for t in INSERT_SQL)
+        sql = f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({tables})"
+        self.deferred_indexes = self.connection.execute(sql).fetchall()
+        for name, _ in self.deferred_indexes:
+            self.connection.execute(f"DROP INDEX {name}")
+        self.connection.commit()
+
+    # rows is the (patent_row, inventor_rows, grantee_rows) tuple returned by the extract functions
+    def add(self, rows):
+        patent_row, inventor_rows, grantee_rows = rows
+        self.buffers['patents'].append(patent_row)
+        self.pending.append(patent_row[:1])
+        self.buffers['inventors'].extend(inventor_rows)
+        self.buffers['grantees'].extend(grantee_rows)
+        self.file_counts['patents'] += 1
+        self.file_counts['inventors'] += len(inventor_rows)
+        self.file_counts['grantees'] += len(grantee_rows)
+        self.buffered += 1 + len(inventor_rows) + len(grantee_rows)
+        if self.buffered >= self.batch_size:
+            self.write()
+
+    # write the buffered rows into the open transaction
+    def write(self):
+        db_cursor = self.connection.cursor()
+        for table, sql in INSERT_SQL.items():
+            if self.buffers[table]:
+                db_cursor.executemany(sql, self.buffers[table])
+                self.buffers[table] = []
+        db_cursor.executemany("INSERT OR IGNORE INTO pending_patents VALUES (?)", self.pending)
+        self.pending = []
+        self.rows_loaded += self.buffered
+        self.buffered = 0
+
+    def flush(self):
+        self.write()
+        self.connection.commit()
+
+    # commit the rows of a weekly file together with its manifest row,
+    # a crash before this point rolls the whole file back
+    def end_file(self, week, filename, size, sha256):
+        self.write()
+        counts = self.file_counts
+        self.connection.execute(MANIFEST_SQL, (week, filename, size, sha256, counts['patents'], counts['inventors'], counts['grantees']))
+        self.connection.commit()
+        now = time.perf_counter()
+        instrumentation.record_file(week, filename, sum(counts.values()), size, now - self.file_started_at)
+        self.file_started_at = now
+        self.file_counts = {table: 0 for table in INSERT_SQL}
+
+    def rows_per_second(self):
+        elapsed = time.perf_counter() - self.started_at
+        return self.rows_loaded / elapsed if elapsed > 0 else 0.0
+
+    # flush the remaining rows, rebuild the deferred indexes and restore the safe default settings
+    def finish(self):
+        self.flush()
+        elapsed = time.perf_counter() - self.started_at
+        rows_per_second = self.rows_per_second()
+        for _, sql in self.deferred_indexes:
+            self.connection.execute(sql)
+        self.connection.commit()
+        self.connection.execute("PRAGMA journal_mode=DELETE")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.execute("PRAGMA cache_size=-2000")
+        self.connection.execute("PRAGMA temp_store=DEFAULT")
+        print(f"Loaded {self.rows_loaded} rows in {elapsed:.1f} s ({rows_per_second:.0f} rows/sec)")
+        return {'rows': self.rows_loaded, 'seconds': elapsed, 'rows_per_second': rows_per_second}
+
+# rows are only appended, so the rows of the pending patents are the last ones of their table: the derived-table
+# stages of an incremental import visit the rows from the first of them on (past the last row when none is pending)
+def first_pending_rowid(connection, table):
+    sql = f"SELECT min(t.rowid) FROM pending_patents n CROSS JOIN {table} t ON t.document_number = n.document_number"
+    first = connection.execute(sql).fetchone()[0]
+    if first is None:
+        first = connection.execute(f"SELECT coalesce(max(rowid), 0) + 1 FROM {table}").fetchone()[0]
+    return first
+
+def clear_pending_patents(connection):
+    connection.execute("DELETE FROM pending_patents")
+    connection.commit()
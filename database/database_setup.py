@@ -1,7 +1,25 @@
 import sqlite3
+import hashlib
 import pathlib
 import json
 import os
+import argparse
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from xml_stream import read_xml_patents
+from archive_files import open_text, file_digest, file_size, list_archive_members
+from field_extractor import make_extractor
+from bulk_loader import BulkLoader, clear_pending_patents
+import build_indexes
+import build_organizations
+import build_name_keys
+import build_patent_families
+import build_coinventors
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import instrumentation
 
 # get connection to database
 def get_database(dp_path: str) -> sqlite3.Connection:
@@ -14,8 +32,8 @@ def get_database(dp_path: str) -> sqlite3.Connection:
         exit(1)
     return connection
 
-def create_table_patents():
-    connection = get_database("patents.db")
+def create_table_patents(db_path="patents.db"):
+    connection = get_database(db_path)
     db_cursor = connection.cursor()
     sql = """CREATE TABLE IF NOT EXISTS patents (
         document_number TEXT PRIMARY KEY,
@@ -32,8 +50,8 @@ def create_table_patents():
     connection.commit()
     connection.close()
 
-def create_table_inventors():
-    connection = get_database("patents.db")
+def create_table_inventors(db_path="patents.db"):
+    connection = get_database(db_path)
     db_cursor = connection.cursor()
     sql = """CREATE TABLE IF NOT EXISTS inventors (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -50,8 +68,8 @@ def create_table_inventors():
     connection.commit()
     connection.close()
 
-def create_table_grantees():
-    connection = get_database("patents.db")
+def create_table_grantees(db_path="patents.db"):
+    connection = get_database(db_path)
     db_cursor = connection.cursor()
     sql = """CREATE TABLE IF NOT EXISTS grantees (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -61,487 +79,359 @@ def create_table_grantees():
         state TEXT,
         country TEXT,
         type TEXT,
-        FOREIGN KEY (document_number) REFERENCES patents(document_number)
+        org_id INTEGER,
+        FOREIGN KEY (document_number) REFERENCES patents(document_number),
+        FOREIGN KEY (org_id) REFERENCES organizations(id)
     )"""
     db_cursor.execute(sql)
     print("Table grantees created successfully...")
     connection.commit()
     connection.close()
 
-# populate the database with patent records from year 2002 through 2004
-# uses special encoding (e.g. B110, B220) in the xml file 
-# to learn more about the encoding, refer to the Grant Red Book provided by the USPTO Office of Information Dissemination Service 
-# https://www.uspto.gov/sites/default/files/products/PatentGrantSGMLv19-Documentation.pdf
-# Note: the data in pgb20020430.json and pgb20020528.json were not populated into the database due to format error
-def populate2002Through2004():
-    connection = get_database("patents.db")
+# one row per weekly file whose records were committed, written in the same transaction as the records
+# reruns skip the weeks found here, so an interrupted import resumes after the last completed file
+def create_table_ingest_manifest(db_path="patents.db"):
+    connection = get_database(db_path)
     db_cursor = connection.cursor()
-    for i in range(2002, 2005):
-        year = str(i)
-        for filename in os.listdir('json/' + year):
-            if filename == '.DS_Store' or filename == 'pgb20020430.json' or filename == 'pgb20020528.json':
-                continue
-            filename = 'json/' + year + '/' + filename
-            with open(filename, 'r') as f:
-                data = json.load(f)
-            for i in range(len(data)):
-
-                # patents
-                patent = data[i]
-                document_number = patent['PATDOC']['SDOBI']['B100']['B110']['DNUM']['PDAT']
-                SIR_flag = 'B122US' in patent['PATDOC']['SDOBI']['B100']
-                document_kind = patent['PATDOC']['SDOBI']['B100']['B130']['PDAT']
-                document_date = patent['PATDOC']['SDOBI']['B100']['B140']['DATE']['PDAT']
-                application_filing_date = patent['PATDOC']['SDOBI']['B200']['B220']['DATE']['PDAT']
-                national_main_classification = patent['PATDOC']['SDOBI']['B500']['B520']['B521']['PDAT']
-                title_of_invention = patent['PATDOC']['SDOBI']['B500']['B540']['STEXT']['PDAT']
-                if 'B600' not in patent['PATDOC']['SDOBI']:
-                    not_new_invention_flag = False
-                else:
-                    not_new_invention_flag = \
-                    'B640' in patent['PATDOC']['SDOBI']['B600'] or \
-                    'B641US' in patent['PATDOC']['SDOBI']['B600'] or \
-                    'B645' in patent['PATDOC']['SDOBI']['B600'] or \
-                    'B645US' in patent['PATDOC']['SDOBI']['B600'] or \
-                    'B660' in patent['PATDOC']['SDOBI']['B600']
-                    if 'B630' in patent['PATDOC']['SDOBI']['B600'] and not_new_invention_flag != True:
-                        not_new_invention_flag = \
-                        'B631' in patent['PATDOC']['SDOBI']['B600']['B630'] or \
-                        'B632' in patent['PATDOC']['SDOBI']['B600']['B630'] or \
-                        'B633' in patent['PATDOC']['SDOBI']['B600']['B630']
-                if type(title_of_invention) is not str:
-                    title_of_invention = 'null'
-                db_cursor.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (document_number, SIR_flag, document_kind, document_date, application_filing_date, national_main_classification, title_of_invention, not_new_invention_flag))
-
-                # inventors (every patent must have at least one inventor)
-                inventors = patent['PATDOC']['SDOBI']['B700']['B720']['B721']
-                if type(inventors) is list:
-                    for inventor in inventors:
-                        first_name = 'null'
-                        last_name = 'null'
-                        city = 'null'
-                        state = 'null'
-                        country = 'null'
-                        if 'FNM' in inventor['PARTY-US']['NAM']:
-                            first_name = inventor['PARTY-US']['NAM']['FNM']['PDAT']
-                        if 'SNM' in inventor['PARTY-US']['NAM']:
-                            last_name = inventor['PARTY-US']['NAM']['SNM']['STEXT']['PDAT']
-                        if 'ADR' in inventor['PARTY-US']:
-                            if 'CITY' in inventor['PARTY-US']['ADR']:
-                                city = inventor['PARTY-US']['ADR']['CITY']['PDAT']
-                            if 'STATE' in inventor['PARTY-US']['ADR']:
-                                state = inventor['PARTY-US']['ADR']['STATE']['PDAT']
-                            if 'CTRY' in inventor['PARTY-US']['ADR']:
-                                country = inventor['PARTY-US']['ADR']['CTRY']['PDAT']
-                            else:
-                                country = 'US'
-                        if type(first_name) is not str:
-                            first_name = 'null'
-                        if type(city) is not str:
-                            city = 'null'
-                        db_cursor.execute("INSERT INTO inventors VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, first_name, last_name, city, state, country))
-                else:
-                    first_name = 'null'
-                    last_name = 'null'
-                    city = 'null'
-                    state = 'null'
-                    country = 'null'
-                    if 'FNM' in inventors['PARTY-US']['NAM']:
-                        first_name = inventors['PARTY-US']['NAM']['FNM']['PDAT']
-                    if 'SNM' in inventors['PARTY-US']['NAM']:
-                        last_name = inventors['PARTY-US']['NAM']['SNM']['STEXT']['PDAT']
-                    if 'CITY' in inventors['PARTY-US']['ADR']:
-                        city = inventors['PARTY-US']['ADR']['CITY']['PDAT']
-                    if 'STATE' in inventors['PARTY-US']['ADR']:
-                        state = inventors['PARTY-US']['ADR']['STATE']['PDAT']
-                    if 'CTRY' in inventors['PARTY-US']['ADR']:
-                        country = inventors['PARTY-US']['ADR']['CTRY']['PDAT']
-                    else:
-                        country = 'US'
-                    db_cursor.execute("INSERT INTO inventors VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, first_name, last_name, city, state, country))
-
-                # assignees (not every patent has an assignee)
-                if 'B730' in patent['PATDOC']['SDOBI']['B700']:
-                    assignees = patent['PATDOC']['SDOBI']['B700']['B730']
-                    if type(assignees) is list:
-                        for assignee in assignees:
-                            name = 'null'
-                            city = 'null'
-                            state = 'null'
-                            country = 'null'
-
-                            # company's name or individual's name
-                            if 'ONM' in assignee['B731']['PARTY-US']['NAM']:
-                                name = assignee['B731']['PARTY-US']['NAM']['ONM']['STEXT']['PDAT']
-                            elif 'FNM' in assignee['B731']['PARTY-US']['NAM'] and 'SNM' in assignee['B731']['PARTY-US']['NAM']:
-                                name = assignee['B731']['PARTY-US']['NAM']['FNM']['PDAT'] + ' ' + assignee['B731']['PARTY-US']['NAM']['SNM']['STEXT']['PDAT']
-                            elif 'SNM' in assignee['B731']['PARTY-US']['NAM']:
-                                name = assignee['B731']['PARTY-US']['NAM']['SNM']['STEXT']['PDAT']
-                            elif 'FNM' in assignee['B731']['PARTY-US']['NAM']:
-                                name = assignee['B731']['PARTY-US']['NAM']['FNM']['PDAT']
-
-                            if 'ADR' in assignee['B731']['PARTY-US']:
-                                if 'CITY' in assignee['B731']['PARTY-US']['ADR']:
-                                    city = assignee['B731']['PARTY-US']['ADR']['CITY']['PDAT']
-                                if 'STATE' in assignee['B731']['PARTY-US']['ADR']:
-                                    state = assignee['B731']['PARTY-US']['ADR']['STATE']['PDAT']
-                                if 'CTRY' in assignee['B731']['PARTY-US']['ADR']:
-                                    country = assignee['B731']['PARTY-US']['ADR']['CTRY']['PDAT']
-                                else:
-                                    country = 'US'
-                            grantee_type = assignee['B732US']['PDAT']
-                            db_cursor.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, name, city, state, country, grantee_type))
-                    else:
-                        name = 'null'
-                        city = 'null'
-                        state = 'null'
-                        country = 'null'
-
-                        # company's name or individual's name
-                        if 'ONM' in assignees['B731']['PARTY-US']['NAM']:
-                            name = assignees['B731']['PARTY-US']['NAM']['ONM']['STEXT']['PDAT']
-                        elif 'FNM' in assignees['B731']['PARTY-US']['NAM'] and 'SNM' in assignees['B731']['PARTY-US']['NAM']:
-                            name = assignees['B731']['PARTY-US']['NAM']['FNM']['PDAT'] + ' ' + assignees['B731']['PARTY-US']['NAM']['SNM']['STEXT']['PDAT']
-                        elif 'SNM' in assignees['B731']['PARTY-US']['NAM']:
-                            name = assignees['B731']['PARTY-US']['NAM']['SNM']['STEXT']['PDAT']
-                        elif 'FNM' in assignees['B731']['PARTY-US']['NAM']:
-                            name = assignees['B731']['PARTY-US']['NAM']['FNM']['PDAT']
-                        if type(name) is list:
-                            name = " ".join(name)
-
-                        if 'ADR' in assignees['B731']['PARTY-US']:
-                            if 'CITY' in assignees['B731']['PARTY-US']['ADR']:
-                                city = assignees['B731']['PARTY-US']['ADR']['CITY']['PDAT']
-                            if 'STATE' in assignees['B731']['PARTY-US']['ADR']:
-                                state = assignees['B731']['PARTY-US']['ADR']['STATE']['PDAT']
-                            if 'CTRY' in assignees['B731']['PARTY-US']['ADR']:
-                                country = assignees['B731']['PARTY-US']['ADR']['CTRY']['PDAT']
-                            else:
-                                country = 'US'
-                        grantee_type = assignees['B732US']['PDAT']
-                        db_cursor.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, name, city, state, country, grantee_type))
-        print("Patent records in year " + year + " imported into database successfully...")
-
+    sql = """CREATE TABLE IF NOT EXISTS ingest_manifest (
+        week TEXT PRIMARY KEY,
+        filename TEXT,
+        size INTEGER,
+        sha256 TEXT,
+        patents INTEGER,
+        inventors INTEGER,
+        grantees INTEGER,
+        completed_at TEXT
+    )"""
+    db_cursor.execute(sql)
+    print("Table ingest_manifest created successfully...")
     connection.commit()
     connection.close()
 
-# populate the database with patent records from year 2005 through 2012
+# PRAGMA user_version is the version stamp of the database, result caches keyed by it are invalidated by every import
+def bump_database_version(connection):
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    connection.execute(f"PRAGMA user_version = {version + 1}")
+    connection.commit()
+
+# weekly files that were not populated into the database due to format error
+SKIPPED_FILES = ['pgb20020430', 'pgb20020528', 'ipgb20050920']
+
+# name of the week a file holds, without directory, extension or suffix (e.g. xml/2002/pgb20020430_wk18.xml -> pgb20020430)
+# the json and xml files of the same week share it, so a week is never imported twice
+def week_of(filename):
+    return os.path.basename(filename).split('.')[0].split('_')[0]
+
+# list the weekly files of a year, source is either 'json' (converted by scripts/xml_to_json.py) or 'xml' (raw USPTO bulk files)
+# the files are read from the directory <source>/<year>/, where they may be .gz or .zip compressed,
+# or without that directory from the members <dir>/<year>/* of the archive <source>.zip (see archive_files.py)
+# a week found both compressed and uncompressed is listed once
+def list_weekly_files(source, year):
+    files = []
+    if os.path.isdir(source + '/' + year):
+        candidates = [source + '/' + year + '/' + filename for filename in sorted(os.listdir(source + '/' + year))]
+    elif os.path.isfile(source + '.zip'):
+        candidates = list_archive_members(source + '.zip', year)
+    else:
+        return files
+    weeks = set()
+    for filename in candidates:
+        if os.path.basename(filename) == '.DS_Store' or week_of(filename) in SKIPPED_FILES or week_of(filename) in weeks:
+            continue
+        weeks.add(week_of(filename))
+        files.append(filename)
+    return files
+
+# weeks recorded in the ingest manifest, mapped to the file, size and SHA-256 they were imported from
+def imported_weeks(connection):
+    sql = "SELECT week, filename, size, sha256 FROM ingest_manifest"
+    return {week: (filename, size, sha256) for week, filename, size, sha256 in connection.execute(sql).fetchall()}
+
+# drop the files whose week was already imported
+# an imported file is checked for changes by its size, and with verify also by its SHA-256, which reads the whole file
+# and so is not done by default: an incremental import would otherwise read every week it imported before
+def pending_files(files, imported, verify=False):
+    pending = []
+    for filename in files:
+        week = week_of(filename)
+        if week not in imported:
+            pending.append(filename)
+        elif imported[week][0] == filename and (imported[week][1] != file_size(filename) or
+                                                verify and imported[week][2] != file_digest(filename)[1]):
+            print("Warning: " + filename + " changed since it was imported, delete its week from ingest_manifest and its records to reload it")
+    return pending
+
+# read all patent records of a weekly json file
+def read_json_patents(filename, sha256=None):
+    with open_text(filename, sha256=sha256) as f:
+        data = json.load(f)
+    return data
+
+# xml files are parsed one patent document at a time, so memory stays bounded by the largest patent
+# keep is the element the extract function reads (see field_extractor.py), only that part of an xml document is parsed
+# with sha256 (a hashlib object), the file is hashed while it is parsed, its digest is complete once all records are read
+def read_patents(source, filename, keep=None, sha256=None):
+    if source == 'xml':
+        return read_xml_patents(filename, keep, sha256)
+    return read_json_patents(filename, sha256)
+
+def populate(first_year, last_year, extract, source, loader, verify=False):
+    imported = imported_weeks(loader.connection)
+    for i in range(first_year, last_year + 1):
+        year = str(i)
+        for filename in pending_files(list_weekly_files(source, year), imported, verify):
+            sha256 = hashlib.sha256()
+            for patent in read_patents(source, filename, extract.keep_element, sha256):
+                loader.add(extract(patent))
+            loader.end_file(week_of(filename), filename, file_size(filename), sha256.hexdigest())
+        print("Patent records in year " + year + " imported into database successfully... (" + str(round(loader.rows_per_second())) + " rows/sec)")
+
+# field mappings of the three eras of the USPTO grant formats, made into extract functions by field_extractor.py
+# (see there for the column notation), a new format version is a new mapping
+# every extract function returns the patents, inventors and grantees rows of one patent record
+
+# the patents columns after document_number: SIR_flag, document_kind, document_date, application_filing_data,
+# national_main_classifications, title_of_invention, not_new_invention_flag
+# the inventors columns after document_number: first_name, surname, city, state, country
+# the grantees columns after document_number: name, city, state, country, type
+
+# year 2002 through 2004
+# uses special encoding (e.g. B110, B220) in the xml file 
+# to learn more about the encoding, refer to the Grant Red Book provided by the USPTO Office of Information Dissemination Service 
+# https://www.uspto.gov/sites/default/files/products/PatentGrantSGMLv19-Documentation.pdf
+# Note: the data in pgb20020430.json and pgb20020528.json were not populated into the database due to format error
+FIELDS_2002_THROUGH_2004 = {
+    'root': 'PATDOC/SDOBI',
+    'document_number': 'B100/B110/DNUM/PDAT',
+    'patent': [
+        ('present', 'B100/B122US'),
+        'B100/B130/PDAT',
+        'B100/B140/DATE/PDAT',
+        'B200/B220/DATE/PDAT',
+        'B500/B520/B521/PDAT',
+        ('text', 'B500/B540/STEXT/PDAT'),
+        # reissues, reexaminations, continuations and divisions
+        ('or', ('any', 'B600', ['B640', 'B641US', 'B645', 'B645US', 'B660']), ('any', 'B600/B630', ['B631', 'B632', 'B633'])),
+    ],
+    # every patent must have at least one inventor
+    'inventors': 'B700/B720/B721',
+    'inventor': [
+        ('text', 'PARTY-US/NAM/FNM/PDAT'),
+        'PARTY-US/NAM/SNM/STEXT/PDAT',
+        ('text', 'PARTY-US/ADR/CITY/PDAT'),
+        'PARTY-US/ADR/STATE/PDAT',
+        ('country', 'PARTY-US/ADR', 'CTRY/PDAT'),
+    ],
+    # not every patent has an assignee, the assignee is a company or an individual
+    'grantees': 'B700/B730',
+    'grantee': [
+        ('first', ('join', 'B731/PARTY-US/NAM/ONM/STEXT/PDAT'),
+                  ('join', 'B731/PARTY-US/NAM/FNM/PDAT', 'B731/PARTY-US/NAM/SNM/STEXT/PDAT'),
+                  ('join', 'B731/PARTY-US/NAM/SNM/STEXT/PDAT'),
+                  ('join', 'B731/PARTY-US/NAM/FNM/PDAT')),
+        'B731/PARTY-US/ADR/CITY/PDAT',
+        'B731/PARTY-US/ADR/STATE/PDAT',
+        ('country', 'B731/PARTY-US/ADR', 'CTRY/PDAT'),
+        'B732US/PDAT',
+    ],
+    'no_grantee': None,
+}
+
+# year 2005 through 2012
 # did not use special encoding (e.g. B110, B220) in the xml file anymore, but replaced by more straightforward terms 
 # to learn more about the new encoding, refer to Patent Grant Full Text Data/XML Version 4.2 ICE  (JAN 2007 – DEC 2012)  
 # https://bulkdata.uspto.gov/data/patent/grant/redbook/2007/PatentGrantXMLv4.2Documentation.doc
 # Note: the data in ipgb20050920.json was not populated into the database due to format error
-def populate2005Through2012():
-    connection = get_database("patents.db")
-    db_cursor = connection.cursor()
-    for i in range(2005, 2013):
-        year = str(i)
-        for filename in os.listdir('json/' + year):
-            if filename == '.DS_Store' or filename == 'ipgb20050920.json':
-                continue
-            filename = 'json/' + year + '/' + filename
-            with open(filename, 'r') as f:
-                data = json.load(f)
-            for i in range(len(data)):
-
-                # patents
-                patent = data[i]
-                document_number = patent['us-patent-grant']['us-bibliographic-data-grant']['publication-reference']['document-id']['doc-number']
-                SIR_flag = 'us-sir-flag' in patent['us-patent-grant']['us-bibliographic-data-grant']
-                document_kind = patent['us-patent-grant']['us-bibliographic-data-grant']['publication-reference']['document-id']['kind']
-                document_date = patent['us-patent-grant']['us-bibliographic-data-grant']['publication-reference']['document-id']['date']
-                application_filing_date = patent['us-patent-grant']['us-bibliographic-data-grant']['application-reference']['document-id']['date']
-                national_main_classification = patent['us-patent-grant']['us-bibliographic-data-grant']['classification-national']['main-classification']
-                if '#text' in patent['us-patent-grant']['us-bibliographic-data-grant']['invention-title']:
-                    title_of_invention = patent['us-patent-grant']['us-bibliographic-data-grant']['invention-title']['#text']
-                else:
-                    title_of_invention = 'null'
-                if 'us-related-documents' not in patent['us-patent-grant']['us-bibliographic-data-grant']:
-                    not_new_invention_flag = False
-                else:
-                    not_new_invention_flag = \
-                    'reissue' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'us-divisional-reissue' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'reexamination' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'us-reexamination-reissue-merger' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'substitution' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'continuation' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'continuation-in-part' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'continuing-reissue' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents']
-                if type(title_of_invention) is not str:
-                    title_of_invention = 'null'
-                db_cursor.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (document_number, SIR_flag, document_kind, document_date, application_filing_date, national_main_classification, title_of_invention, not_new_invention_flag))
-
-                # inventors (every patent must have at least one inventor)
-                inventors = patent['us-patent-grant']['us-bibliographic-data-grant']['parties']['applicants']['applicant']
-                if type(inventors) is list:
-                    for inventor in inventors:
-                        first_name = 'null'
-                        last_name = 'null'
-                        city = 'null'
-                        state = 'null'
-                        country = 'null'
-                        if 'addressbook' in inventor:
-                            if 'first-name' in inventor['addressbook']:
-                                first_name = inventor['addressbook']['first-name']
-                            if 'last-name' in inventor['addressbook']:
-                                last_name = inventor['addressbook']['last-name']
-                            if 'address' in inventor['addressbook']:
-                                if 'city' in inventor['addressbook']['address']:
-                                    city = inventor['addressbook']['address']['city']
-                                if 'state' in inventor['addressbook']['address']:
-                                    state = inventor['addressbook']['address']['state']
-                                if 'country' in inventor['addressbook']['address']:
-                                    country = inventor['addressbook']['address']['country']
-                                else:
-                                    country = 'US'
-                            if type(first_name) is not str:
-                                first_name = 'null'
-                            if type(city) is not str:
-                                city = 'null'
-                        db_cursor.execute("INSERT INTO inventors VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, first_name, last_name, city, state, country))
-                else:
-                    first_name = 'null'
-                    last_name = 'null'
-                    city = 'null'
-                    state = 'null'
-                    country = 'null'
-                    if 'addressbook' in inventors:
-                        if 'first-name' in inventors['addressbook']:
-                            first_name = inventors['addressbook']['first-name']
-                        if 'last-name' in inventors['addressbook']:
-                            last_name = inventors['addressbook']['last-name']
-                        if 'address' in inventors['addressbook']:
-                                if 'city' in inventors['addressbook']['address']:
-                                    city = inventors['addressbook']['address']['city']
-                                if 'state' in inventors['addressbook']['address']:
-                                    state = inventors['addressbook']['address']['state']
-                                if 'country' in inventors['addressbook']['address']:
-                                    country = inventors['addressbook']['address']['country']
-                                else:
-                                    country = 'US'
-                    db_cursor.execute("INSERT INTO inventors VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, first_name, last_name, city, state, country))
-
-                # assignees (every patent has an assignee)
-                if 'assignees' in patent['us-patent-grant']['us-bibliographic-data-grant']:
-                    assignees = patent['us-patent-grant']['us-bibliographic-data-grant']['assignees']['assignee']
-                    if type(assignees) is list:
-                        for assignee in assignees:
-                            name = 'null'
-                            city = 'null'
-                            state = 'null'
-                            country = 'null'
-                            grantee_type = 'null'
-
-                            # company's name or individual's name
-                            if 'addressbook' in assignee:
-                                if 'orgname' in assignee['addressbook']:
-                                    name = assignee['addressbook']['orgname']
-
-                                if 'address' in assignee['addressbook']:
-                                    if 'city' in assignee['addressbook']['address']:
-                                        city = assignee['addressbook']['address']['city']
-                                    if 'state' in assignee['addressbook']['address']:
-                                        state = assignee['addressbook']['address']['state']
-                                    if 'country' in assignee['addressbook']['address']:
-                                        country = assignee['addressbook']['address']['country']
-                                    else:
-                                        country = 'US'
-                                grantee_type = assignee['addressbook']['role']
-                            db_cursor.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, name, city, state, country, grantee_type))
-                    else:
-                        name = 'null'
-                        city = 'null'
-                        state = 'null'
-                        country = 'null'
-                        grantee_type = 'null'
-
-                        # company's name or individual's name
-                        if 'addressbook' in assignees:
-                            if 'orgname' in assignees['addressbook']:
-                                    name = assignees['addressbook']['orgname']
-
-                            if 'address' in assignees['addressbook']:
-                                if 'city' in assignees['addressbook']['address']:
-                                    city = assignees['addressbook']['address']['city']
-                                if 'state' in assignees['addressbook']['address']:
-                                    state = assignees['addressbook']['address']['state']
-                                if 'country' in assignees['addressbook']['address']:
-                                    country = assignees['addressbook']['address']['country']
-                                else:
-                                    country = 'US'
-                            grantee_type = assignees['addressbook']['role']
-                        db_cursor.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, name, city, state, country, grantee_type))
-
-                else:
-                    db_cursor.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, 'null', 'null', 'null', 'null', 'null'))
-        print("Patent records in year " + year + " imported into database successfully...")
-    connection.commit()
-    connection.close()
-
-# populate the database with patent records from year 2013 through 2022
+FIELDS_2005_THROUGH_2012 = {
+    'root': 'us-patent-grant/us-bibliographic-data-grant',
+    'document_number': 'publication-reference/document-id/doc-number',
+    'patent': [
+        ('present', 'us-sir-flag'),
+        'publication-reference/document-id/kind',
+        'publication-reference/document-id/date',
+        'application-reference/document-id/date',
+        'classification-national/main-classification',
+        ('text', 'invention-title/#text'),
+        ('any', 'us-related-documents', ['reissue', 'us-divisional-reissue', 'reexamination', 'us-reexamination-reissue-merger',
+                                         'substitution', 'continuation', 'continuation-in-part', 'continuing-reissue']),
+    ],
+    # every patent must have at least one inventor
+    'inventors': 'parties/applicants/applicant',
+    'inventor': [
+        ('text', 'addressbook/first-name'),
+        'addressbook/last-name',
+        ('text', 'addressbook/address/city'),
+        'addressbook/address/state',
+        ('country', 'addressbook/address', 'country'),
+    ],
+    # a patent without assignee gets a grantee row of nulls
+    'grantees': 'assignees/assignee',
+    'grantee': [
+        'addressbook/orgname',
+        'addressbook/address/city',
+        'addressbook/address/state',
+        ('country', 'addressbook/address', 'country'),
+        'addressbook/role',
+    ],
+    'no_grantee': ['null', 'null', 'null', 'null', 'null'],
+}
+
+# year 2013 through 2022
 # slight changes to encoding structure compared to year 2005-2012
-# e.g. a patent might not have an assignee
-def populate2013Through2022():
-    connection = get_database("patents.db")
-    db_cursor = connection.cursor() 
-    for i in range(2013, 2023):
-        year = str(i)
-        for filename in os.listdir('json/' + year):
-            if filename == '.DS_Store':
-                continue
-            filename = 'json/' + year + '/' + filename
-            with open(filename, 'r') as f:
-                data = json.load(f)
-            for i in range(len(data)):
-
-                # patents
-                patent = data[i]
-                document_number = patent['us-patent-grant']['us-bibliographic-data-grant']['publication-reference']['document-id']['doc-number']
-                SIR_flag = 'us-sir-flag' in patent['us-patent-grant']['us-bibliographic-data-grant']
-                document_kind = patent['us-patent-grant']['us-bibliographic-data-grant']['publication-reference']['document-id']['kind']
-                document_date = patent['us-patent-grant']['us-bibliographic-data-grant']['publication-reference']['document-id']['date']
-                application_filing_date = patent['us-patent-grant']['us-bibliographic-data-grant']['application-reference']['document-id']['date']
-                if 'classification-national' in patent['us-patent-grant']['us-bibliographic-data-grant']:
-                    national_main_classification = patent['us-patent-grant']['us-bibliographic-data-grant']['classification-national']['main-classification']
-                else:
-                    national_main_classification = 'null'
-                if '#text' in patent['us-patent-grant']['us-bibliographic-data-grant']['invention-title']:
-                    title_of_invention = patent['us-patent-grant']['us-bibliographic-data-grant']['invention-title']['#text']
-                else:
-                    title_of_invention = 'null'
-                if 'us-related-documents' not in patent['us-patent-grant']['us-bibliographic-data-grant']:
-                    not_new_invention_flag = False
-                else:
-                    not_new_invention_flag = \
-                    'reissue' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'us-divisional-reissue' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'reexamination' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'us-reexamination-reissue-merger' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'substitution' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'continuation' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'continuation-in-part' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents'] or \
-                    'continuing-reissue' in patent['us-patent-grant']['us-bibliographic-data-grant']['us-related-documents']
-                if type(title_of_invention) is not str:
-                    title_of_invention = 'null'
-                db_cursor.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (document_number, SIR_flag, document_kind, document_date, application_filing_date, national_main_classification, title_of_invention, not_new_invention_flag))
-
-                # inventors (every patent must have at least one inventor)
-                if 'us-parties' in patent['us-patent-grant']['us-bibliographic-data-grant']:
-                    inventors = patent['us-patent-grant']['us-bibliographic-data-grant']['us-parties']['us-applicants']['us-applicant']
-                elif 'parties' in patent['us-patent-grant']['us-bibliographic-data-grant']:
-                    inventors = patent['us-patent-grant']['us-bibliographic-data-grant']['parties']['applicants']['applicant']
-                if type(inventors) is list:
-                    for inventor in inventors:
-                        first_name = 'null'
-                        last_name = 'null'
-                        city = 'null'
-                        state = 'null'
-                        country = 'null'
-                        if 'addressbook' in inventor:
-                            if 'first-name' in inventor['addressbook']:
-                                first_name = inventor['addressbook']['first-name']
-                            if 'last-name' in inventor['addressbook']:
-                                last_name = inventor['addressbook']['last-name']
-                            if 'address' in inventor['addressbook']:
-                                if 'city' in inventor['addressbook']['address']:
-                                    city = inventor['addressbook']['address']['city']
-                                if 'state' in inventor['addressbook']['address']:
-                                    state = inventor['addressbook']['address']['state']
-                                if 'country' in inventor['addressbook']['address']:
-                                    country = inventor['addressbook']['address']['country']
-                                else:
-                                    country = 'US'
-                            # print(document_number, first_name, last_name, city, state, country)
-                            if type(first_name) is not str:
-                                first_name = 'null'
-                            if type(city) is not str:
-                                city = 'null'
-                        db_cursor.execute("INSERT INTO inventors VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, first_name, last_name, city, state, country))
-                else:
-                    first_name = 'null'
-                    last_name = 'null'
-                    city = 'null'
-                    state = 'null'
-                    country = 'null'
-                    if 'addressbook' in inventors:
-                        if 'first-name' in inventors['addressbook']:
-                            first_name = inventors['addressbook']['first-name']
-                        if 'last-name' in inventors['addressbook']:
-                            last_name = inventors['addressbook']['last-name']
-                        if 'address' in inventors['addressbook']:
-                                if 'city' in inventors['addressbook']['address']:
-                                    city = inventors['addressbook']['address']['city']
-                                if 'state' in inventors['addressbook']['address']:
-                                    state = inventors['addressbook']['address']['state']
-                                if 'country' in inventors['addressbook']['address']:
-                                    country = inventors['addressbook']['address']['country']
-                                else:
-                                    country = 'US'
-                    db_cursor.execute("INSERT INTO inventors VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, first_name, last_name, city, state, country))
-
-                # assignees (a patent might not have an assignee)
-                if 'assignees' in patent['us-patent-grant']['us-bibliographic-data-grant']:
-                    assignees = patent['us-patent-grant']['us-bibliographic-data-grant']['assignees']['assignee']
-                    if type(assignees) is list:
-                        for assignee in assignees:
-                            name = 'null'
-                            city = 'null'
-                            state = 'null'
-                            country = 'null'
-                            grantee_type = 'null'
-
-                            # company's name or individual's name
-                            if 'addressbook' in assignee:
-                                if 'orgname' in assignee['addressbook']:
-                                    name = assignee['addressbook']['orgname']
-
-                                if 'address' in assignee['addressbook']:
-                                    if 'city' in assignee['addressbook']['address']:
-                                        city = assignee['addressbook']['address']['city']
-                                    if 'state' in assignee['addressbook']['address']:
-                                        state = assignee['addressbook']['address']['state']
-                                    if 'country' in assignee['addressbook']['address']:
-                                        country = assignee['addressbook']['address']['country']
-                                    else:
-                                        country = 'US'
-                                grantee_type = assignee['addressbook']['role']
-                            db_cursor.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, name, city, state, country, grantee_type))
-                    else:
-                        name = 'null'
-                        city = 'null'
-                        state = 'null'
-                        country = 'null'
-                        grantee_type = 'null'
-
-                        # company's name or individual's name
-                        if 'addressbook' in assignees:
-                            if 'orgname' in assignees['addressbook']:
-                                    name = assignees['addressbook']['orgname']
-
-                            if 'address' in assignees['addressbook']:
-                                if 'city' in assignees['addressbook']['address']:
-                                    city = assignees['addressbook']['address']['city']
-                                if 'state' in assignees['addressbook']['address']:
-                                    state = assignees['addressbook']['address']['state']
-                                if 'country' in assignees['addressbook']['address']:
-                                    country = assignees['addressbook']['address']['country']
-                                else:
-                                    country = 'US'
-                            grantee_type = assignees['addressbook']['role']
-                        db_cursor.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, name, city, state, country, grantee_type))
-
-                else:
-                    db_cursor.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (document_number, 'null', 'null', 'null', 'null', 'null'))
-        print("Patent records in year " + year + " imported into database successfully...")
-    connection.commit()
-    connection.close()
+# e.g. a patent might not have an assignee, and the inventors are listed under us-parties
+FIELDS_2013_THROUGH_2022 = dict(FIELDS_2005_THROUGH_2012, inventors=['us-parties/us-applicants/us-applicant', 'parties/applicants/applicant'])
+
+extract2002Through2004 = make_extractor(FIELDS_2002_THROUGH_2004)
+extract2005Through2012 = make_extractor(FIELDS_2005_THROUGH_2012)
+extract2013Through2022 = make_extractor(FIELDS_2013_THROUGH_2022)
+
+def populate2002Through2004(loader, source='json'):
+    populate(2002, 2004, extract2002Through2004, source, loader)
+
+def populate2005Through2012(loader, source='json'):
+    populate(2005, 2012, extract2005Through2012, source, loader)
 
-create_table_patents()
-create_table_inventors()
-create_table_grantees()
+def populate2013Through2022(loader, source='json'):
+    populate(2013, 2022, extract2013Through2022, source, loader)
 
-populate2002Through2004()
-populate2005Through2012()
-populate2013Through2022()
+# the years of each extract function
+ERAS = [(2002, 2004), (2005, 2012), (2013, 2022)]
 
-print("Database import is complete.")
\ No newline at end of file
+def extractor_for_year(year):
+    if year <= 2004:
+        return extract2002Through2004
+    if year <= 2012:
+        return extract2005Through2012
+    return extract2013Through2022
+
+# parse and extract the rows of one weekly file in a worker process, the rows are put into rows_queue in batches of
+# about batch_size rows (as the loader counts them) and the end of the file is marked by None, also when the file fails
+def extract_file(task):
+    source, filename, year, batch_size, rows_queue = task
+    try:
+        extract = extractor_for_year(year)
+        sha256 = hashlib.sha256()
+        rows = []
+        batched = 0
+        for patent in read_patents(source, filename, extract.keep_element, sha256):
+            rows.append(extract(patent))
+            _, inventor_rows, grantee_rows = rows[-1]
+            batched += 1 + len(inventor_rows) + len(grantee_rows)
+            if batched >= batch_size:
+                rows_queue.put(rows)
+                rows = []
+                batched = 0
+        if rows:
+            rows_queue.put(rows)
+    finally:
+        rows_queue.put(None)
+    return filename, file_size(filename), sha256.hexdigest()
+
+# weekly files are parsed and extracted concurrently by a pool of worker processes,
+# while this process stays the only sqlite writer and inserts the files' rows in the order the files were listed,
+# each file in its own transaction; every file in flight has its own queue of at most two batches, so a worker
+# waits when the writer falls behind and memory stays bounded by batches, not by whole files
+# at most two files per worker are in flight, the oldest of them is always being parsed or done
+# the manager is shut down first on an error, so a worker waiting on a full queue fails instead of blocking the pool
+def populate_parallel(first_year, last_year, source, workers, loader, verify=False):
+    imported = imported_weeks(loader.connection)
+    tasks = []
+    for i in range(first_year, last_year + 1):
+        for filename in pending_files(list_weekly_files(source, str(i)), imported, verify):
+            tasks.append((source, filename, i))
+    tasks.reverse()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, Manager() as manager:
+        in_flight = deque()
+        while tasks or in_flight:
+            while tasks and len(in_flight) < 2 * workers:
+                rows_queue = manager.Queue(maxsize=2)
+                in_flight.append((rows_queue, pool.submit(extract_file, tasks.pop() + (loader.batch_size, rows_queue))))
+            rows_queue, future = in_flight.popleft()
+            for rows in iter(rows_queue.get, None):
+                for r in rows:
+                    loader.add(r)
+            filename, size, sha256 = future.result()
+            loader.end_file(week_of(filename), filename, size, sha256)
+            print("Patent records in " + filename + " imported into database successfully... (" + str(round(loader.rows_per_second())) + " rows/sec)")
+
+# import first_year..last_year into the database at db_path and run the post-load stages on it
+# returns the rows, seconds and rows/sec of the load (see BulkLoader.finish)
+# after an incremental import the post-load stages only visit the patents loaded since they last ran (see bulk_loader.py)
+def import_database(db_path, first_year=2002, last_year=2022, source='json', workers=1, batch_size=50000, journal_mode='WAL', verify=False):
+    with instrumentation.stage('create_tables'):
+        create_table_patents(db_path)
+        create_table_inventors(db_path)
+        create_table_grantees(db_path)
+        create_table_ingest_manifest(db_path)
+
+    connection = get_database(db_path)
+    instrumentation.trace(connection)
+    loader = BulkLoader(connection, batch_size=batch_size, journal_mode=journal_mode)
+    loader.start()
+    with instrumentation.stage('populate'):
+        if workers > 1:
+            populate_parallel(first_year, last_year, source, workers, loader, verify)
+        else:
+            for era_first, era_last in ERAS:
+                if max(first_year, era_first) <= min(last_year, era_last):
+                    populate(max(first_year, era_first), min(last_year, era_last), extractor_for_year(era_first), source, loader, verify)
+    with instrumentation.stage('finish_load'):
+        load = loader.finish()
+    incremental = not loader.full_load
+    # also after an incremental import: an import resumed after a crash is not a full load, but the crashed run
+    # may have dropped the deferred indexes before building any, and the missing indexes are created
+    with instrumentation.stage('build_indexes'):
+        build_indexes.create_indexes(connection, incremental)
+    with instrumentation.stage('build_organizations'):
+        build_organizations.build_organizations(connection, incremental)
+    with instrumentation.stage('build_name_keys'):
+        build_name_keys.build_name_keys(connection, incremental)
+    with instrumentation.stage('build_patent_families'):
+        build_patent_families.build_patent_families(connection, incremental)
+    with instrumentation.stage('build_coinventors'):
+        build_coinventors.build_coinventors(connection, incremental)
+    clear_pending_patents(connection)
+    bump_database_version(connection)
+    connection.close()
+    return load
+
+# one shard per grant year, e.g. shards/patents_2013.db, each a complete database with its own manifest and indexes
+def shard_path(shard_dir, year):
+    return os.path.join(shard_dir, 'patents_' + str(year) + '.db')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create and populate patents.db')
+    parser.add_argument('--source', choices=['json', 'xml'], default='json',
+                        help="'json' reads json/<year>/ (converted by scripts/xml_to_json.py), 'xml' streams the raw USPTO files in xml/<year>/")
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes that parse weekly files in parallel (default: 1, no parallelism)')
+    parser.add_argument('--batch-size', type=int, default=50000,
+                        help='number of buffered rows written per executemany batch (default: 50000)')
+    parser.add_argument('--journal-mode', choices=['WAL', 'OFF'], default='WAL',
+                        help='journal mode used while loading, OFF is faster but a crash can corrupt the database (default: WAL)')
+    parser.add_argument('--profile', metavar='REPORT',
+                        help='write stage timings, per-file rows/sec and bytes/sec and SQL statement durations to this JSON file')
+    parser.add_argument('--shards', metavar='DIR',
+                        help='import every grant year into its own database DIR/patents_<year>.db instead of patents.db')
+    parser.add_argument('--verify', action='store_true',
+                        help='also compare the SHA-256 of the already imported files with the manifest to find changed files (reads every file)')
+    parser.add_argument('--first-year', type=int, default=2002)
+    parser.add_argument('--last-year', type=int, default=2022)
+    args = parser.parse_args()
+    if args.profile:
+        instrumentation.enable()
+
+    if args.shards:
+        os.makedirs(args.shards, exist_ok=True)
+        for year in range(args.first_year, args.last_year + 1):
+            if not list_weekly_files(args.source, str(year)):
+                continue
+            sqlite3.connect(shard_path(args.shards, year)).close()
+            import_database(shard_path(args.shards, year), year, year, args.source, args.workers, args.batch_size, args.journal_mode, args.verify)
+    else:
+        import_database("patents.db", args.first_year, args.last_year, args.source, args.workers, args.batch_size, args.journal_mode, args.verify)
+
+    print("Database import is complete.")
+    if args.profile:
+        instrumentation.write_report(args.profile)
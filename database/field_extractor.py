@@ -0,0 +1,141 @@
+# turns the declarative field mappings of database_setup.py (one per era of the USPTO grant formats)
+# into extract functions that turn a parsed patent record into its patents, inventors and grantees rows
+#
+# a mapping names where each column is found, as '/'-separated key paths below the era's root element:
+#   'root'             path of the bibliographic data, e.g. 'us-patent-grant/us-bibliographic-data-grant'
+#   'document_number'  path of the document number, a record without one is an error
+#   'patent'           the 7 patents columns after the document number, in table order
+#   'inventors'        path of the inventor elements, or a list of paths of which the first present one is used
+#   'inventor'         the 5 inventors columns (first_name, surname, city, state, country), below one inventor element
+#   'grantees'         path of the assignee elements
+#   'grantee'          the 5 grantees columns (name, city, state, country, type), below one assignee element
+#   'no_grantee'       row written for a patent without assignee, None to write no row
+#
+# a column is one of:
+#   'a/b/c'                        the value at the path, 'null' when missing
+#   ('text', path)                 same, but 'null' when the value is not a string (e.g. an element with mixed content)
+#   ('present', path)              whether the path exists
+#   ('any', path, [keys])          whether the element at the path has one of the keys
+#   ('or', column, column, ...)    the first true value of the columns
+#   ('first', column, column, ...) the first value of the columns that is not 'null'
+#   ('join', path, path, ...)      the values at all paths joined by spaces (list values included), 'null' if one is missing
+#   ('country', path, key)         the country below the address at path, 'US' when the address has none, 'null' without address
+#
+# each column becomes a small function when the extract function is made, so the mapping is read once
+# and only the lookups of its paths run per record
+# an element holding a single child instead of a list of them is read the same way as a list
+NULL = 'null'
+
+# stands for a missing element, an empty element (parsed as None) is not missing but has no children
+MISSING = object()
+
+def lookup(element, keys):
+    for key in keys:
+        if type(element) is not dict or key not in element:
+            return MISSING
+        element = element[key]
+    return element
+
+def as_list(value):
+    if value is MISSING or value is None:
+        return []
+    return value if type(value) is list else [value]
+
+def split_path(path):
+    return tuple(path.split('/'))
+
+# the function that reads the column from an element, with the paths of the column split into keys
+def column_getter(column):
+    if isinstance(column, str):
+        keys = split_path(column)
+        def value(element):
+            value = lookup(element, keys)
+            return value if value is not MISSING else NULL
+        return value
+    kind = column[0]
+    if kind == 'text':
+        keys = split_path(column[1])
+        def text(element):
+            value = lookup(element, keys)
+            return value if type(value) is str else NULL
+        return text
+    if kind == 'present':
+        keys = split_path(column[1])
+        return lambda element: lookup(element, keys) is not MISSING
+    if kind == 'any':
+        keys = split_path(column[1])
+        children = column[2]
+        def has_any(element):
+            value = lookup(element, keys)
+            return type(value) is dict and any(child in value for child in children)
+        return has_any
+    if kind == 'or':
+        getters = [column_getter(c) for c in column[1:]]
+        return lambda element: any(get(element) for get in getters)
+    if kind == 'first':
+        getters = [column_getter(c) for c in column[1:]]
+        def first(element):
+            for get in getters:
+                value = get(element)
+                if value != NULL:
+                    return value
+            return NULL
+        return first
+    if kind == 'join':
+        paths = [split_path(path) for path in column[1:]]
+        def join(element):
+            parts = []
+            for keys in paths:
+                value = lookup(element, keys)
+                if value is MISSING or value is None:
+                    return NULL
+                parts.extend(value if type(value) is list else [value])
+            return ' '.join(parts)
+        return join
+    if kind == 'country':
+        address = split_path(column[1])
+        country_keys = split_path(column[2])
+        def country(element):
+            element = lookup(element, address)
+            if element is MISSING:
+                return NULL
+            value = lookup(element, country_keys)
+            return value if value is not MISSING else 'US'
+        return country
+    raise ValueError("unknown column kind: " + str(kind))
+
+def row_values(number, element, getters):
+    return (number,) + tuple([get(element) for get in getters])
+
+def make_extractor(mapping):
+    root = split_path(mapping['root'])
+    document_number = split_path(mapping['document_number'])
+    patent_columns = [column_getter(c) for c in mapping['patent']]
+    inventors = mapping['inventors']
+    inventor_paths = [split_path(path) for path in ([inventors] if isinstance(inventors, str) else inventors)]
+    inventor_columns = [column_getter(c) for c in mapping['inventor']]
+    grantee_path = split_path(mapping['grantees'])
+    grantee_columns = [column_getter(c) for c in mapping['grantee']]
+    no_grantee = tuple(mapping['no_grantee']) if mapping['no_grantee'] is not None else None
+    missing_number = 'patent record without ' + mapping['document_number']
+
+    def extract(patent):
+        record = lookup(patent, root)
+        number = lookup(record, document_number)
+        if number is MISSING:
+            raise KeyError(missing_number)
+        patent_row = row_values(number, record, patent_columns)
+
+        # the first inventors path that holds inventors, the last one otherwise
+        for keys in inventor_paths:
+            inventor_elements = lookup(record, keys)
+            if inventor_elements is not MISSING and inventor_elements is not None:
+                break
+        inventor_rows = [row_values(number, element, inventor_columns) for element in as_list(inventor_elements)]
+        grantee_rows = [row_values(number, element, grantee_columns) for element in as_list(lookup(record, grantee_path))]
+        if not grantee_rows and no_grantee is not None:
+            grantee_rows.append((number,) + no_grantee)
+        return (patent_row, inventor_rows, grantee_rows)
+    # every column is found below this element, the rest of a document does not need to be parsed
+    extract.keep_element = root[-1]
+    return extract
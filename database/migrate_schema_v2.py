@@ -0,0 +1,244 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from search_patents import schema_version, schema_sql
+from search_session import PatentSearchSession
+import build_indexes
+import build_name_keys
+import build_organizations
+import build_patent_families
+import build_coinventors
+
+# schema v2 of patents.db:
+# - patents get an integer surrogate key, inventors and grantees reference it by patent_id instead of the TEXT document_number
+# - document_date and application_filing_data are YYYYMMDD integers
+# - missing values are NULL instead of the string 'null' written by database_setup.py
+# - the lookup tables keyed by text (ingest_manifest, organization_aliases) are WITHOUT ROWID,
+#   so a lookup is one b-tree search instead of an index search followed by a table search
+#   the other hot lookup tables already are one b-tree search and stay rowid tables: patent_families is keyed by the
+#   integer patent_id, which is its rowid, and the unique (normalized_name) index of organizations and
+#   (surname_key, first_key) index of inventor_identities hold the integer id a lookup returns (see LOOKUPS)
+# database_setup.py still imports into schema v1, this script converts a finished v1 database into a new v2 file
+SCHEMA_V2_SQL = """
+    CREATE TABLE patents (
+        id INTEGER PRIMARY KEY,
+        document_number TEXT NOT NULL UNIQUE,
+        SIR_flag BOOLEAN,
+        document_kind TEXT,
+        document_date INTEGER,
+        application_filing_data INTEGER,
+        national_main_classifications TEXT,
+        title_of_invention TEXT,
+        not_new_invention_flag BOOLEAN
+    );
+    CREATE TABLE inventors (
+        id INTEGER PRIMARY KEY,
+        patent_id INTEGER NOT NULL REFERENCES patents(id),
+        first_name TEXT,
+        surname TEXT,
+        city TEXT,
+        state TEXT,
+        country TEXT,
+        first_key TEXT,
+        first_initial TEXT,
+        first_soundex TEXT,
+        surname_key TEXT,
+        surname_soundex TEXT
+    );
+    CREATE TABLE organizations (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        normalized_name TEXT UNIQUE
+    );
+    CREATE TABLE grantees (
+        id INTEGER PRIMARY KEY,
+        patent_id INTEGER NOT NULL REFERENCES patents(id),
+        name TEXT,
+        city TEXT,
+        state TEXT,
+        country TEXT,
+        type TEXT,
+        org_id INTEGER REFERENCES organizations(id)
+    );
+    CREATE TABLE organization_aliases (
+        alias TEXT PRIMARY KEY,
+        org_id INTEGER REFERENCES organizations(id)
+    ) WITHOUT ROWID;
+    CREATE TABLE ingest_manifest (
+        week TEXT PRIMARY KEY,
+        filename TEXT,
+        size INTEGER,
+        sha256 TEXT,
+        patents INTEGER,
+        inventors INTEGER,
+        grantees INTEGER,
+        completed_at TEXT
+    ) WITHOUT ROWID;
+"""
+
+# the search indexes of database/build_indexes.py, by patent_id
+INDEXES_V2 = [
+    "CREATE INDEX idx_inventors_surname ON inventors (surname, first_name, patent_id, city, state)",
+    "CREATE INDEX idx_inventors_patent_id ON inventors (patent_id)",
+    "CREATE INDEX idx_grantees_patent_id ON grantees (patent_id, name)",
+    "CREATE INDEX idx_patents_document_date ON patents (document_date)",
+    "CREATE INDEX idx_patents_classification ON patents (national_main_classifications)",
+]
+
+def text(column):
+    return f"NULLIF({column}, 'null')"
+
+def date(column):
+    return f"CASE WHEN {column} GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]' THEN CAST({column} AS INTEGER) END"
+
+def columns(connection, schema, table):
+    return [row[1] for row in connection.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+def has_table(connection, schema, table):
+    return connection.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = ?", (table,)).fetchone() is not None
+
+# copy a v1 database into a new v2 file, the row ids of inventors and grantees are kept
+def convert(source_path, target_path):
+    if os.path.exists(target_path):
+        raise FileExistsError(target_path + " already exists")
+    connection = sqlite3.connect(target_path)
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.executescript(SCHEMA_V2_SQL)
+    connection.execute("ATTACH DATABASE ? AS v1", (os.path.abspath(source_path),))
+
+    connection.execute(f"""
+        INSERT INTO patents (document_number, SIR_flag, document_kind, document_date, application_filing_data,
+                             national_main_classifications, title_of_invention, not_new_invention_flag)
+        SELECT document_number, SIR_flag, {text('document_kind')}, {date('document_date')}, {date('application_filing_data')},
+               {text('national_main_classifications')}, {text('title_of_invention')}, not_new_invention_flag
+        FROM v1.patents ORDER BY document_number
+        """)
+    keys = ['first_key', 'first_initial', 'first_soundex', 'surname_key', 'surname_soundex']
+    if 'surname_key' not in columns(connection, 'v1', 'inventors'):
+        keys = []
+    connection.execute(f"""
+        INSERT INTO inventors (id, patent_id, first_name, surname, city, state, country{''.join(', ' + k for k in keys)})
+        SELECT i.id, p.id, {text('i.first_name')}, {text('i.surname')}, {text('i.city')}, {text('i.state')}, {text('i.country')}{''.join(', i.' + k for k in keys)}
+        FROM v1.inventors i INNER JOIN patents p ON p.document_number = i.document_number
+        """)
+    # the copied keys keep the version they were filled under, the co-inventor graph is rebuilt below
+    if keys and has_table(connection, 'v1', 'derived_versions'):
+        connection.execute(build_name_keys.DERIVED_VERSIONS_SQL)
+        connection.execute("INSERT INTO derived_versions SELECT * FROM v1.derived_versions WHERE stage = 'name_keys'")
+    org_id = 'g.org_id' if 'org_id' in columns(connection, 'v1', 'grantees') else 'NULL'
+    if has_table(connection, 'v1', 'organizations'):
+        connection.execute("INSERT INTO organizations SELECT id, name, normalized_name FROM v1.organizations")
+        connection.execute("INSERT INTO organization_aliases SELECT alias, org_id FROM v1.organization_aliases")
+    connection.execute(f"""
+        INSERT INTO grantees (id, patent_id, name, city, state, country, type, org_id)
+        SELECT g.id, p.id, {text('g.name')}, {text('g.city')}, {text('g.state')}, {text('g.country')}, {text('g.type')}, {org_id}
+        FROM v1.grantees g INNER JOIN patents p ON p.document_number = g.document_number
+        """)
+    if has_table(connection, 'v1', 'ingest_manifest'):
+        connection.execute("INSERT INTO ingest_manifest SELECT * FROM v1.ingest_manifest")
+    version = connection.execute("PRAGMA v1.user_version").fetchone()[0]
+    connection.commit()
+    connection.execute("DETACH DATABASE v1")
+
+    for sql in INDEXES_V2:
+        connection.execute(sql)
+    build_indexes.create_grantees_fts(connection)
+    # fills in whatever the v1 database did not have yet
+    build_organizations.build_organizations(connection)
+    build_name_keys.build_name_keys(connection)
+    build_patent_families.build_patent_families(connection)
+    build_coinventors.build_coinventors(connection)
+    connection.execute(f"PRAGMA user_version = {version + 1}")
+    connection.execute("ANALYZE")
+    connection.commit()
+    connection.execute("VACUUM")
+    connection.close()
+
+# sample of inventor names spread over the whole table, used as the namelist of the latency comparison
+def sample_names(db_path, size):
+    connection = sqlite3.connect(db_path)
+    total = connection.execute("SELECT max(id) FROM inventors").fetchone()[0] or 0
+    step = max(total // size, 1)
+    rows = connection.execute("SELECT first_name, surname FROM inventors WHERE id % ? = 0 AND surname IS NOT NULL AND surname != 'null' LIMIT ?", (step, size)).fetchall()
+    connection.close()
+    return [(first_name if first_name not in (None, 'null') else '', surname) for first_name, surname in rows]
+
+def measure(db_path, names, university_name, repeats=5):
+    with PatentSearchSession(db_path) as session:
+        session.search(names, university_name)
+        timings = []
+        for _ in range(repeats):
+            started_at = time.perf_counter()
+            results = session.search(names, university_name)
+            timings.append(time.perf_counter() - started_at)
+        version = schema_version(session.connection)
+    return {'schema_version': version, 'bytes': os.path.getsize(db_path), 'results': len(results), 'join_ms': statistics.median(timings) * 1000}
+
+# the hot lookup tables, by the key columns a lookup searches and the lookup itself
+LOOKUPS = {
+    'patent_families': ("{ref}", "SELECT family_id FROM patent_families WHERE {ref} = ?"),
+    'inventor_identities': ("surname_key, first_key", "SELECT id FROM inventor_identities WHERE surname_key = ? AND first_key = ?"),
+    'organizations': ("normalized_name", "SELECT id FROM organizations WHERE normalized_name = ?"),
+    'organization_aliases': ("alias", "SELECT org_id FROM organization_aliases WHERE alias = ?"),
+    'ingest_manifest': ("week", "SELECT filename FROM ingest_manifest WHERE week = ?"),
+}
+
+# bytes of a table and its indexes, None when sqlite was built without the dbstat table
+def table_bytes(connection, table):
+    sql = "SELECT sum(pgsize) FROM dbstat WHERE name = ? OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?)"
+    try:
+        return connection.execute(sql, (table, table)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+# rows, bytes and mean latency of a point lookup of each lookup table, over a random sample of its keys
+def measure_lookups(db_path, lookups=1000):
+    connection = sqlite3.connect(db_path)
+    report = {}
+    for table, (key, sql) in LOOKUPS.items():
+        if not has_table(connection, 'main', table):
+            continue
+        key, sql = key.format(**schema_sql(connection)), sql.format(**schema_sql(connection))
+        keys = connection.execute(f"SELECT {key} FROM {table} ORDER BY random() LIMIT ?", (lookups,)).fetchall()
+        started_at = time.perf_counter()
+        for k in keys:
+            connection.execute(sql, k).fetchone()
+        elapsed = time.perf_counter() - started_at
+        report[table] = {'rows': connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0], 'bytes': table_bytes(connection, table),
+                         'lookup_us': elapsed / len(keys) * 1000000 if keys else None}
+    connection.close()
+    return report
+
+# database size and search latency of both files, the search runs the same sampled namelist on both,
+# and the size and lookup latency of their lookup tables
+def compare(v1_path, v2_path, university_name='University', names=100):
+    sample = sample_names(v1_path, names)
+    report = {'names': len(sample), 'university': university_name, 'v1': measure(v1_path, sample, university_name), 'v2': measure(v2_path, sample, university_name)}
+    for name, path in [('v1', v1_path), ('v2', v2_path)]:
+        report[name]['lookups'] = measure_lookups(path)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert patents.db into schema v2 and compare size and search latency.")
+    parser.add_argument('source', nargs='?', default='patents.db')
+    parser.add_argument('target', nargs='?', default='patents_v2.db')
+    parser.add_argument('--university', default='University', help="university keyword of the latency comparison (default: University)")
+    parser.add_argument('--names', type=int, default=100, help="sampled inventor names in the latency comparison (default: 100)")
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    convert(args.source, args.target)
+    print("Converted " + args.source + " into " + args.target + " in " + str(round(time.perf_counter() - started_at, 1)) + " s")
+    report = compare(args.source, args.target, args.university, args.names)
+    for name in ['v1', 'v2']:
+        print(name + ": " + str(report[name]['bytes']) + " bytes, " + str(round(report[name]['join_ms'], 2)) + " ms per search (" + str(report[name]['results']) + " results)")
+        for table, lookup in report[name]['lookups'].items():
+            latency = str(round(lookup['lookup_us'], 1)) + " us per lookup" if lookup['lookup_us'] is not None else "empty"
+            print("    " + table + ": " + str(lookup['rows']) + " rows, " + str(lookup['bytes']) + " bytes, " + latency)
@@ -0,0 +1,44 @@
+import xmltodict
+from xml.parsers.expat import ExpatError
+from archive_files import open_text
+
+# split a weekly USPTO bulk file into its patent documents (<PATDOC> or <us-patent-grant>)
+# every patent document in the file starts with its own xml declaration,
+# so the file is read line by line and only one document is held in memory at a time
+def iter_xml_documents(xml_file):
+    lines = []
+    for line in xml_file:
+        if line.startswith('<?xml version') and lines:
+            yield ''.join(lines)
+            lines = []
+        if line.strip() == '' and not lines:
+            continue
+        lines.append(line)
+    if lines:
+        yield ''.join(lines)
+
+# drop everything between the end of the element `keep` and the closing tag of the document, e.g. the abstract,
+# description and claims after the bibliographic data, which are most of a grant but never extracted
+# the prologue and the root element stay, so the parsed dict has the same paths, only without the dropped elements
+def prune_document(xml_string, keep):
+    end = xml_string.find('</' + keep + '>')
+    root_end = xml_string.rfind('</')
+    if end < 0 or root_end <= end:
+        return xml_string
+    return xml_string[:end + len(keep) + 3] + xml_string[root_end:]
+
+# parse each patent document of a weekly xml file into the same dict structure
+# that scripts/xml_to_json.py used to write into the json files
+# a malformed document is skipped instead of failing the whole weekly file
+# the file may be compressed (see archive_files.py), it is then decompressed as it is read
+# with keep, only the document up to the end of that element is parsed (see prune_document)
+# with sha256, the file is hashed as it is read (see archive_files.open_text)
+def read_xml_patents(xml_filename, keep=None, sha256=None):
+    with open_text(xml_filename, sha256=sha256) as f:
+        for xml_string in iter_xml_documents(f):
+            if keep is not None:
+                xml_string = prune_document(xml_string, keep)
+            try:
+                yield xmltodict.parse(xml_string)
+            except ExpatError as e:
+                print('Skipping malformed patent document in ' + xml_filename + ': ' + str(e))
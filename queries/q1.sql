@@ -1,7 +1,9 @@
 -- select patent records with University of Illinois as grantee
+-- the grantee names are matched through the trigram index grantees_fts (built by database/build_indexes.py)
 
 SELECT g.name, p.document_number, p.document_date, p.title_of_invention
-FROM patents p
-INNER JOIN grantees g ON g.document_number = p.document_number
-WHERE g.name LIKE '%University of Illinois%'
+FROM grantees_fts
+CROSS JOIN grantees g ON g.id = grantees_fts.rowid
+INNER JOIN patents p ON g.document_number = p.document_number
+WHERE grantees_fts.name LIKE '%University of Illinois%'
 ORDER BY p.document_number ASC;
\ No newline at end of file
@@ -1,6 +1,12 @@
 -- select universities which were granted at least a patent
+-- the grantee names are matched through the trigram index grantees_fts (built by database/build_indexes.py)
 
-SELECT DISTINCT name 
-FROM grantees
-WHERE country = 'US' AND (name LIKE '%University%' OR name LIKE '%College%') 
-ORDER BY name ASC;
\ No newline at end of file
+SELECT DISTINCT g.name
+FROM (
+    SELECT rowid FROM grantees_fts WHERE grantees_fts.name LIKE '%University%'
+    UNION
+    SELECT rowid FROM grantees_fts WHERE grantees_fts.name LIKE '%College%'
+) m
+CROSS JOIN grantees g ON g.id = m.rowid
+WHERE g.country = 'US'
+ORDER BY g.name ASC;
\ No newline at end of file
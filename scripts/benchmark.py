@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import database_setup
+import instrumentation
+from generate_corpus import generate_corpus
+from process_namelist import process_file
+from search_session import PatentSearchSession
+from parallel_search import ParallelSearch
+from inventor_snapshot import InventorSnapshot, write_snapshot
+from search_patents import open_database
+
+NAMELIST_SIZES = [1, 10, 100, 500]
+
+def timed(function, *args):
+    started_at = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started_at
+
+# the import stages of database_setup.import_database reported by benchmark, by the name of their stage timer
+INGEST_STAGES = {
+    'build_indexes': 'indexes', 'build_organizations': 'organizations', 'build_name_keys': 'name_keys',
+    'build_patent_families': 'patent_families', 'build_coinventors': 'coinventors',
+}
+
+# import the corpus in <directory>/xml into <directory>/patents.db with database_setup.import_database, timing each
+# stage by the stage timers of the instrumentation, which is on for the import only
+def run_ingest(directory, workers=1, batch_size=50000, journal_mode='WAL'):
+    cwd = os.getcwd()
+    os.chdir(directory)
+    instrumentation.enable()
+    try:
+        sqlite3.connect('patents.db').close()
+        load = database_setup.import_database('patents.db', source='xml', workers=workers, batch_size=batch_size, journal_mode=journal_mode)
+    finally:
+        profile = instrumentation.disable()
+        os.chdir(cwd)
+    seconds = {name: stage['wall_seconds'] for name, stage in profile.stages.items()}
+    stages = {'ingest': {'seconds': seconds['populate'] + seconds['finish_load'], 'rows': load['rows'], 'rows_per_second': load['rows_per_second']}}
+    for name, key in INGEST_STAGES.items():
+        stages[key] = seconds[name]
+    stages['database_bytes'] = os.path.getsize(os.path.join(directory, 'patents.db'))
+    return stages
+
+# latency of searching the first n faculty names for every n in sizes:
+# the first search of a size on a fresh session (cold) and the median and worst of `repeats` more (warm)
+# with search_workers > 1 the names are split over a ParallelSearch of that many connections,
+# with a snapshot directory the names are searched in the inventor snapshot exported there (see inventor_snapshot.py)
+def run_searches(db_path, faculty, sizes=NAMELIST_SIZES, repeats=5, university_name='University of Illinois', search_workers=1, snapshot=None):
+    searches = []
+    for size in sizes:
+        names = faculty[:size]
+        if snapshot is not None:
+            search = InventorSnapshot(snapshot)
+        else:
+            search = PatentSearchSession(db_path) if search_workers == 1 else ParallelSearch(db_path, search_workers)
+        with search:
+            results, cold = timed(search.search, names, university_name)
+            warm = [timed(search.search, names, university_name)[1] for _ in range(repeats)]
+        searches.append({
+            'names': len(names),
+            'results': len(results),
+            'cold_ms': cold * 1000,
+            'median_ms': statistics.median(warm) * 1000,
+            'max_ms': max(warm) * 1000,
+        })
+    return searches
+
+# export the inventor snapshot of <directory>/patents.db into <directory>/snapshot, returns the seconds it took
+def run_snapshot_export(directory):
+    connection = open_database(os.path.join(directory, 'patents.db'))
+    try:
+        return timed(write_snapshot, connection, os.path.join(directory, 'snapshot'))[1]
+    finally:
+        connection.close()
+
+# with snapshot, the searches are also timed on the inventor snapshot, with the same names as on patents.db
+def run_benchmark(directory, grants, seed=0, weeks_per_year=52, workers=1, sizes=NAMELIST_SIZES, repeats=5, search_workers=1, compression=None, snapshot=False):
+    corpus, generate_seconds = timed(generate_corpus, directory, grants, 2002, 2022, weeks_per_year, max(sizes), 0.02, seed, compression)
+    stages = run_ingest(directory, workers)
+    stages['generate'] = generate_seconds
+    faculty = process_file(os.path.join(directory, 'faculty.txt'))
+    report = {
+        'corpus': corpus,
+        'environment': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'stages': stages,
+        'search_workers': search_workers,
+        'searches': run_searches(os.path.join(directory, 'patents.db'), faculty, sizes, repeats, search_workers=search_workers),
+    }
+    if snapshot:
+        stages['snapshot_export'] = run_snapshot_export(directory)
+        report['snapshot_searches'] = run_searches(None, faculty, sizes, repeats, snapshot=os.path.join(directory, 'snapshot'))
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus, import it and time ingest, index build and search latency.")
+    parser.add_argument('--grants', type=int, default=10000, help="number of synthetic grants (default: 10000)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--weeks-per-year', type=int, default=52)
+    parser.add_argument('--workers', type=int, default=1, help="ingest worker processes, see database_setup.py --workers")
+    parser.add_argument('--compression', choices=['gz', 'zip'], help="generate the weekly files compressed and import them without extracting")
+    parser.add_argument('--search-workers', type=int, default=1, help="connections a search is split over, see find_all_patents.py --workers")
+    parser.add_argument('--snapshot', action='store_true', help="also export the inventor snapshot and time the same searches on it")
+    parser.add_argument('--repeats', type=int, default=5, help="warm searches per namelist size (default: 5)")
+    parser.add_argument('--directory', help="where to write the corpus and patents.db (default: a temporary directory)")
+    parser.add_argument('--output', default='benchmark_results.json', help="machine-readable results (default: benchmark_results.json)")
+    args = parser.parse_args()
+
+    if args.directory:
+        os.makedirs(args.directory, exist_ok=True)
+        report = run_benchmark(args.directory, args.grants, args.seed, args.weeks_per_year, args.workers, repeats=args.repeats, search_workers=args.search_workers, compression=args.compression, snapshot=args.snapshot)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            report = run_benchmark(directory, args.grants, args.seed, args.weeks_per_year, args.workers, repeats=args.repeats, search_workers=args.search_workers, compression=args.compression, snapshot=args.snapshot)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("Ingest: " + str(round(report['stages']['ingest']['rows_per_second'])) + " rows/sec, index build: " + str(round(report['stages']['indexes'], 2)) + " s")
+    for search in report['searches']:
+        print(str(search['names']) + " names: " + str(search['results']) + " results, " + str(round(search['median_ms'], 2)) + " ms median")
+    for search in report.get('snapshot_searches', []):
+        print(str(search['names']) + " names on the snapshot: " + str(search['results']) + " results, " + str(round(search['median_ms'], 2)) + " ms median")
+    print("Results written to " + args.output)
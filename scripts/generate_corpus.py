@@ -0,0 +1,203 @@
+import argparse
+import datetime
+import gzip
+import os
+import random
+import shutil
+import zipfile
+from xml.sax.saxutils import escape
+
+# deterministic synthetic USPTO weekly grant files, written like the raw bulk files into <output>/xml/<year>/
+# so database/database_setup.py --source xml can import them:
+# 2002-2004 use the PATDOC (SGML-derived, Red Book v2.5) layout, 2005-2012 the us-patent-grant v4.x layout with
+# parties/applicants, and 2013-2022 the us-patent-grant v4.4 layout with us-parties/us-applicants
+# the same seed and arguments always produce byte-identical files
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth',
+    'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Wei', 'Li', 'Jian', 'Ming', 'Hui', 'Yong', 'Kevin', 'Bin', 'Rajesh', 'Priya', 'Sanjay', 'Anil',
+    'Hiroshi', 'Takashi', 'Yuki', 'Jae', 'Min', 'Hans', 'Klaus', 'Pierre', 'Marie', 'Giovanni', 'Maria',
+]
+SURNAME_SYLLABLES = [
+    'an', 'ber', 'chen', 'dal', 'el', 'fer', 'gan', 'har', 'ito', 'jo', 'kim', 'lee', 'mor', 'nak', 'ol',
+    'par', 'quin', 'ros', 'sat', 'tan', 'ur', 'van', 'wang', 'xu', 'yam', 'zhao', 'son', 'man', 'ley', 'ton',
+]
+CITIES = [
+    ('Urbana', 'IL'), ('Champaign', 'IL'), ('Chicago', 'IL'), ('Berkeley', 'CA'), ('San Jose', 'CA'),
+    ('Palo Alto', 'CA'), ('Ann Arbor', 'MI'), ('Detroit', 'MI'), ('Austin', 'TX'), ('Seattle', 'WA'),
+    ('Boston', 'MA'), ('Cambridge', 'MA'), ('New York', 'NY'), ('Armonk', 'NY'), ('Redmond', 'WA'),
+]
+UNIVERSITIES = [
+    'The Board of Trustees of the University of Illinois',
+    'University of Illinois',
+    'The Regents of the University of California',
+    'The Regents of the University of Michigan',
+    'Stanford University',
+]
+COMPANY_WORDS = ['Acme', 'Global', 'Micro', 'Data', 'Systems', 'Networks', 'Semiconductor', 'Devices', 'Labs', 'Dynamics']
+COMPANY_SUFFIXES = ['Inc.', 'Corporation', 'LLC', 'Ltd.', 'Co.']
+TITLE_WORDS = [
+    'method', 'system', 'apparatus', 'device', 'query', 'interface', 'network', 'memory', 'circuit', 'signal',
+    'processing', 'database', 'wireless', 'optical', 'sensor', 'data', 'image', 'control', 'storage', 'compiler',
+]
+
+GRANT_2002 = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE PATDOC SYSTEM "ST32-US-Grant-025xml.dtd" [ ]>
+<PATDOC DTD="2.5" STATUS="Build 20020101">
+<SDOBI>
+<B100><B110><DNUM><PDAT>{number}</PDAT></DNUM></B110><B130><PDAT>B1</PDAT></B130><B140><DATE><PDAT>{date}</PDAT></DATE></B140><B190><PDAT>US</PDAT></B190></B100>
+<B200><B210><DNUM><PDAT>{application}</PDAT></DNUM></B210><B220><DATE><PDAT>{filed}</PDAT></DATE></B220></B200>
+<B500><B520><B521><PDAT>{classification}</PDAT></B521></B520><B540><STEXT><PDAT>{title}</PDAT></STEXT></B540></B500>
+<B700><B720>
+{inventors}</B720>
+{assignees}</B700>
+</SDOBI>
+</PATDOC>
+"""
+INVENTOR_2002 = "<B721><PARTY-US><NAM><FNM><PDAT>{first_name}</PDAT></FNM><SNM><STEXT><PDAT>{surname}</PDAT></STEXT></SNM></NAM><ADR><CITY><PDAT>{city}</PDAT></CITY><STATE><PDAT>{state}</PDAT></STATE></ADR></PARTY-US></B721>\n"
+ASSIGNEE_2002 = "<B730><B731><PARTY-US><NAM><ONM><STEXT><PDAT>{name}</PDAT></STEXT></ONM></NAM><ADR><CITY><PDAT>{city}</PDAT></CITY><STATE><PDAT>{state}</PDAT></STATE></ADR></PARTY-US></B731><B732US><PDAT>02</PDAT></B732US></B730>\n"
+
+GRANT_2005 = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE us-patent-grant SYSTEM "{dtd}" [ ]>
+<us-patent-grant lang="EN" id="us-patent-grant" country="US">
+<us-bibliographic-data-grant>
+<publication-reference><document-id><country>US</country><doc-number>{number}</doc-number><kind>B2</kind><date>{date}</date></document-id></publication-reference>
+<application-reference appl-type="utility"><document-id><country>US</country><doc-number>{application}</doc-number><date>{filed}</date></document-id></application-reference>
+<classification-national><country>US</country><main-classification>{classification}</main-classification></classification-national>
+<invention-title id="d0e53">{title}</invention-title>
+<{parties}><{applicants}>
+{inventors}</{applicants}></{parties}>
+{assignees}</us-bibliographic-data-grant>
+</us-patent-grant>
+"""
+INVENTOR_2005 = '<{applicant} sequence="{sequence:03d}" app-type="applicant-inventor" designation="us-only"><addressbook><last-name>{surname}</last-name><first-name>{first_name}</first-name><address><city>{city}</city><state>{state}</state><country>US</country></address></addressbook></{applicant}>\n'
+ASSIGNEES_2005 = "<assignees><assignee><addressbook><orgname>{name}</orgname><role>02</role><address><city>{city}</city><state>{state}</state><country>US</country></address></addressbook></assignee></assignees>\n"
+
+# the weeks of the bulk files that database_setup.py skips because of their format errors
+SKIPPED_WEEKS = ['20020430', '20020528', '20050920']
+
+def surname(rng):
+    return ''.join(rng.choice(SURNAME_SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize()
+
+def company(rng):
+    return rng.choice(COMPANY_WORDS) + ' ' + rng.choice(COMPANY_WORDS) + ' ' + rng.choice(COMPANY_SUFFIXES)
+
+# the weekly issue dates of a year are Tuesdays, as in the bulk files
+def issue_dates(year, weeks_per_year):
+    day = datetime.date(year, 1, 1)
+    day += datetime.timedelta(days=(1 - day.weekday()) % 7)
+    dates = []
+    while day.year == year and len(dates) < weeks_per_year:
+        if day.strftime('%Y%m%d') not in SKIPPED_WEEKS:
+            dates.append(day.strftime('%Y%m%d'))
+        day += datetime.timedelta(days=7)
+    return dates
+
+def weekly_filename(year, date):
+    return ('pgb' if year <= 2004 else 'ipgb') + date + '.xml'
+
+# render one grant in the layout of its year
+def render_grant(year, fields, inventors, assignee):
+    if year <= 2004:
+        inventor_xml = ''.join(INVENTOR_2002.format(first_name=fn, surname=ln, city=city, state=state) for fn, ln, city, state in inventors)
+        assignee_xml = ASSIGNEE_2002.format(name=assignee[0], city=assignee[1], state=assignee[2]) if assignee else ''
+        return GRANT_2002.format(inventors=inventor_xml, assignees=assignee_xml, **fields)
+    if year <= 2012:
+        dtd, parties, applicants, applicant = 'us-patent-grant-v42-2006-08-23.dtd', 'parties', 'applicants', 'applicant'
+    else:
+        dtd, parties, applicants, applicant = 'us-patent-grant-v44-2013-05-16.dtd', 'us-parties', 'us-applicants', 'us-applicant'
+    inventor_xml = ''.join(INVENTOR_2005.format(applicant=applicant, sequence=n + 1, first_name=fn, surname=ln, city=city, state=state)
+                           for n, (fn, ln, city, state) in enumerate(inventors))
+    assignee_xml = ASSIGNEES_2005.format(name=assignee[0], city=assignee[1], state=assignee[2]) if assignee else ''
+    return GRANT_2005.format(dtd=dtd, parties=parties, applicants=applicants, inventors=inventor_xml, assignees=assignee_xml, **fields)
+
+# faculty: (first_name, surname) pairs of the planted university inventors, written to faculty.txt
+def make_faculty(rng, faculty_size):
+    faculty = set()
+    while len(faculty) < faculty_size:
+        faculty.add((rng.choice(FIRST_NAMES), surname(rng)))
+    return sorted(faculty)
+
+# replace a weekly file by its .gz, or by a .zip holding it like the USPTO bulk downloads, returns the new file name
+def compress_file(filename, compression):
+    if compression == 'gz':
+        with open(filename, 'rb') as f, gzip.open(filename + '.gz', 'wb') as gz:
+            shutil.copyfileobj(f, gz)
+        compressed = filename + '.gz'
+    else:
+        compressed = filename[:-len('.xml')] + '.zip'
+        with zipfile.ZipFile(compressed, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.write(filename, os.path.basename(filename))
+    os.remove(filename)
+    return compressed
+
+# write `grants` grants spread evenly over the weekly files of first_year..last_year,
+# a faculty_share of them is granted to a university with one of the faculty among the inventors
+# compression is None, 'gz' or 'zip', the weekly files are then written compressed
+# returns a summary of the written corpus, bytes is the size of the files on disk
+def generate_corpus(output, grants, first_year=2002, last_year=2022, weeks_per_year=52, faculty_size=500, faculty_share=0.02, seed=0, compression=None):
+    rng = random.Random(seed)
+    faculty = make_faculty(rng, faculty_size)
+    with open(os.path.join(output, 'faculty.txt'), 'w') as f:
+        for fn, ln in faculty:
+            f.write(fn + ' ' + ln + '\n')
+
+    weeks = [(year, date) for year in range(first_year, last_year + 1) for date in issue_dates(year, weeks_per_year)]
+    summary = {'grants': 0, 'inventors': 0, 'files': len(weeks), 'bytes': 0, 'faculty': len(faculty), 'seed': seed}
+    number = 6000000
+    for n, (year, date) in enumerate(weeks):
+        os.makedirs(os.path.join(output, 'xml', str(year)), exist_ok=True)
+        filename = os.path.join(output, 'xml', str(year), weekly_filename(year, date))
+        count = grants // len(weeks) + (1 if n < grants % len(weeks) else 0)
+        with open(filename, 'w') as f:
+            for _ in range(count):
+                number += 1
+                inventors = []
+                for _ in range(rng.randint(1, 4)):
+                    city, state = rng.choice(CITIES)
+                    inventors.append((rng.choice(FIRST_NAMES), surname(rng), city, state))
+                if rng.random() < faculty_share:
+                    fn, ln = rng.choice(faculty)
+                    inventors[0] = (fn, ln, 'Urbana', 'IL')
+                    assignee = (rng.choice(UNIVERSITIES), 'Urbana', 'IL')
+                elif rng.random() < 0.8:
+                    city, state = rng.choice(CITIES)
+                    assignee = (company(rng), city, state)
+                else:
+                    assignee = None
+                fields = {
+                    'number': '%08d' % number,
+                    'date': date,
+                    'application': '%08d' % rng.randint(9000000, 13999999),
+                    'filed': str(year - rng.randint(1, 4)) + date[4:],
+                    'classification': '%03d%03d' % (rng.randint(1, 999), rng.randint(1, 999)),
+                    'title': escape(' '.join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(3, 8))).capitalize()),
+                }
+                inventors = [(escape(fn), escape(ln), escape(city), state) for fn, ln, city, state in inventors]
+                if assignee:
+                    assignee = (escape(assignee[0]), escape(assignee[1]), assignee[2])
+                f.write(render_grant(year, fields, inventors, assignee))
+                summary['inventors'] += len(inventors)
+        if compression is not None:
+            filename = compress_file(filename, compression)
+        summary['grants'] += count
+        summary['bytes'] += os.path.getsize(filename)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic USPTO weekly grant files in xml/<year>/ and a faculty.txt namelist.")
+    parser.add_argument('output', help="directory to write into, e.g. database/")
+    parser.add_argument('--grants', type=int, default=10000, help="number of grants, from 10k to 10M (default: 10000)")
+    parser.add_argument('--first-year', type=int, default=2002)
+    parser.add_argument('--last-year', type=int, default=2022)
+    parser.add_argument('--weeks-per-year', type=int, default=52)
+    parser.add_argument('--faculty', type=int, default=500, help="number of planted faculty names (default: 500)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compression', choices=['gz', 'zip'], help="write the weekly files compressed, as .xml.gz or .zip")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    summary = generate_corpus(args.output, args.grants, args.first_year, args.last_year, args.weeks_per_year, args.faculty, seed=args.seed, compression=args.compression)
+    print("Generated " + str(summary['grants']) + " grants in " + str(summary['files']) + " weekly files (" + str(summary['bytes']) + " bytes)")
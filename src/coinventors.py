@@ -0,0 +1,76 @@
+from name_keys import exact_keys
+from search_patents import has_table, schema_sql
+
+# neighborhood queries on the co-inventor graph built by database/build_coinventors.py, used to confirm an ambiguous
+# match (e.g. a common surname) by whether the matched inventor also patents with other faculty members
+
+def has_coinventors(connection):
+    return has_table(connection, "coinventors")
+
+# identities a faculty name matches, by the exact name match of search_patents: same surname key, and same first
+# name key unless the faculty first name has none
+# identities have no first initial, those of a faculty first name that is only an initial are found by the
+# identities of the inventors with that initial
+def name_identities(connection, first_name, surname):
+    first_key, first_initial, surname_key = exact_keys(first_name, surname)
+    if len(first_key) == 1:
+        sql = "SELECT DISTINCT identity_id FROM inventors WHERE surname_key = ? AND first_initial = ? AND identity_id != 0"
+        return [row[0] for row in connection.execute(sql, (surname_key, first_initial)).fetchall()]
+    sql = "SELECT id FROM inventor_identities WHERE surname_key = ? AND (first_key = ? OR ? = '')"
+    return [row[0] for row in connection.execute(sql, (surname_key, first_key, first_key)).fetchall()]
+
+# identity id -> the faculty names (first name, surname) it matches
+def faculty_identities(connection, clean_namelist):
+    faculty = {}
+    for first_name, surname in clean_namelist:
+        for identity_id in name_identities(connection, first_name, surname):
+            faculty.setdefault(identity_id, set()).add((first_name, surname))
+    return faculty
+
+# co-inventor identities of an identity with the number of patents they share, most shared first
+def neighbors(connection, identity_id, min_patents=1):
+    sql = "SELECT coinventor_id, patents FROM coinventors WHERE identity_id = ? AND patents >= ? ORDER BY patents DESC, coinventor_id"
+    return connection.execute(sql, (identity_id, min_patents)).fetchall()
+
+ROW_IDENTITIES_SQL = """
+        SELECT i.identity_id FROM patents p CROSS JOIN inventors i ON i.{ref} = p.{key}
+        WHERE p.document_number = ? AND i.first_name IS ?
+        """
+
+# identity of the inventor a search result row was matched to: the inventor of its patent with its first name
+# whose identity is one of the identities the row's faculty name matches
+def row_identity(connection, row, faculty_name_identities, sql=None):
+    sql = sql or ROW_IDENTITIES_SQL.format(**schema_sql(connection))
+    identities = [r[0] for r in connection.execute(sql, (row[6], row[0])).fetchall()]
+    for identity_id in identities:
+        if identity_id in faculty_name_identities:
+            return identity_id
+    return identities[0] if identities else None
+
+# (row, faculty co-inventors) for every search result row: the other faculty names of the list whose identities
+# share at least min_patents patents with the row's inventor, the faculty name the row matched is not counted
+# rows are read as they come, so results streamed from iter_search stay streamed
+def faculty_coinventors(connection, rows, clean_namelist, min_patents=1):
+    if not has_coinventors(connection):
+        raise ValueError("the database has no co-inventor graph, run database/build_coinventors.py")
+    faculty = faculty_identities(connection, clean_namelist)
+    name_ids = {}
+    for identity_id, names in faculty.items():
+        for name in names:
+            name_ids.setdefault(name, set()).add(identity_id)
+    sql = ROW_IDENTITIES_SQL.format(**schema_sql(connection))
+    found = {}
+    for row in rows:
+        identity_id = row_identity(connection, row, name_ids.get((row[1], row[2]), set()), sql)
+        if identity_id not in found:
+            found[identity_id] = set()
+            if identity_id is not None:
+                for coinventor_id, _ in neighbors(connection, identity_id, min_patents):
+                    found[identity_id] |= faculty.get(coinventor_id, set())
+        yield row, sorted(found[identity_id] - {(row[1], row[2])})
+
+# the search result rows whose inventor has at least one other faculty member among its co-inventors
+def with_faculty_coinventors(connection, rows, clean_namelist, min_patents=1):
+    for row, coinventors in faculty_coinventors(connection, rows, clean_namelist, min_patents):
+        if coinventors:
+            yield row
@@ -0,0 +1,26 @@
+import hashlib
+import re
+import unicodedata
+from organizations import normalize_org_name
+
+# a patent family groups a grant with its reissues and continuations: they keep the title and the assignee
+# of the original grant, so the family is keyed by the normalized title and the normalized first grantee name
+# (the bibliographic fields read at import mark reissues and continuations with not_new_invention_flag
+# but do not say which grant they continue)
+
+# lowercase ascii words, punctuation and repeated spaces removed
+# e.g. "Method and apparatus for  Data-Mining." -> "method and apparatus for data mining"
+def normalize_title(title):
+    title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', title.lower()).split())
+
+# 64-bit family id hashed from the family key, so the same family gets the same id in every database and year shard
+# grants without a title cannot be grouped and form a family of their own
+def family_id(title, grantee_name, document_number=None):
+    title_key = normalize_title(title) if title not in (None, 'null') else ''
+    if not title_key:
+        key = 'patent:' + str(document_number)
+    else:
+        grantee_key = normalize_org_name(grantee_name) if grantee_name not in (None, 'null') else ''
+        key = title_key + '|' + grantee_key
+    return int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big', signed=True)
@@ -1,25 +1,146 @@
+from search_session import PatentSearchSession
+from result_cache import CACHE_PATH
+from result_writers import RESULT_COLUMNS, WRITERS, write_results
+from sharded_search import ShardedSearch
+from parallel_search import ParallelSearch
+from inventor_snapshot import InventorSnapshot
+from coinventors import with_faculty_coinventors
 from process_namelist import process_file
-from search_patents import create_faculty_database, populate_faculty_database, search_patents, remove_temp_table
-import sys
-
-def find_all_patents(faculty_namelist, university_name):
-    clean_namelist = process_file(faculty_namelist)
-    dbname = create_faculty_database(university_name)
-    populate_faculty_database(dbname, clean_namelist)
-    results = search_patents(dbname, university_name)
-    remove_temp_table(dbname)
-
-    print("Patent Records:")
-    print("(inventor_first_name, faculty_first_name, faculty_last_name, inventor_city, inventor_state, grantee_name, patent_document_number, document_date, title_of_invention)")
-    for r in results:
-        print(r)
-    print("Number of patents found: " + str(len(results)))
-
-
-if len(sys.argv) != 3:
-    print("Usage: python main.py [faculty_namelist_file] [university_name]")
-    exit()
-
-faculty_namelist_file = sys.argv[1]
-university_name = sys.argv[2]
-find_all_patents(faculty_namelist_file, university_name)
\ No newline at end of file
+import instrumentation
+import argparse
+import csv
+
+# pass a PatentSearchSession to run many searches over the same warm connection
+# without one, results are cached in database/search_cache.db until the next import
+# first_date and last_date (YYYYMMDD) limit the grant dates, classifications the national main classification prefixes
+# with min_shared_patents, only the matches whose inventor shares at least that many patents with another faculty
+# member of the list are kept (see src/coinventors.py)
+def find_all_patents(faculty_namelist, university_name, session=None, first_date=None, last_date=None, classifications=None, min_shared_patents=None):
+    if session is None:
+        with PatentSearchSession(cache_path=CACHE_PATH) as session:
+            return find_all_patents(faculty_namelist, university_name, session, first_date, last_date, classifications, min_shared_patents)
+    if min_shared_patents is None:
+        results = session.search_file(faculty_namelist, university_name, first_date, last_date, classifications)
+    else:
+        clean_namelist = process_file(faculty_namelist)
+        results = session.search(clean_namelist, university_name, first_date, last_date, classifications)
+        results = list(with_faculty_coinventors(session.connection, results, clean_namelist, min_shared_patents))
+    print_results(results)
+    return results
+
+def print_results(results):
+    write_results(results, 'text')
+
+# stream the results straight into an output file (stdout when output is None) in one of the formats of
+# result_writers.py, without holding them in memory, returns the number of rows written
+def export_patents(faculty_namelist, university_name, output_format='csv', output=None, session=None, first_date=None, last_date=None, classifications=None,
+                   min_shared_patents=None):
+    if session is None:
+        with PatentSearchSession(cache_path=CACHE_PATH) as session:
+            return export_patents(faculty_namelist, university_name, output_format, output, session, first_date, last_date, classifications, min_shared_patents)
+    if min_shared_patents is None:
+        rows = session.iter_search_file(faculty_namelist, university_name, first_date, last_date, classifications)
+    else:
+        clean_namelist = process_file(faculty_namelist)
+        rows = session.iter_search(clean_namelist, university_name, first_date, last_date, classifications)
+        rows = with_faculty_coinventors(session.connection, rows, clean_namelist, min_shared_patents)
+    return write_results(rows, output_format, output)
+
+# jobs file: one "faculty_namelist_file,university_name" pair per line
+def read_jobs(jobs_file):
+    jobs = []
+    with open(jobs_file, 'r', newline='') as f:
+        for row in csv.reader(f):
+            if len(row) == 2 and not row[0].startswith('#'):
+                jobs.append((row[0].strip(), row[1].strip()))
+    return jobs
+
+# run all jobs of a jobs file in one pass over the patent tables, returns the results of each job in job order
+def find_all_patents_batch(jobs_file, session=None):
+    if session is None:
+        with PatentSearchSession() as session:
+            return find_all_patents_batch(jobs_file, session)
+    jobs = read_jobs(jobs_file)
+    all_results = session.search_batch_files(jobs)
+    for (faculty_namelist, university_name), results in zip(jobs, all_results):
+        print("== " + faculty_namelist + " (" + university_name + ")")
+        print_results(results)
+    return all_results
+
+# write the results of all jobs into one output file, each row prefixed by the namelist file and university of its job
+def export_patents_batch(jobs_file, output_format='csv', output=None, session=None):
+    if session is None:
+        with PatentSearchSession() as session:
+            return export_patents_batch(jobs_file, output_format, output, session)
+    jobs = read_jobs(jobs_file)
+    all_results = session.search_batch_files(jobs)
+    rows = (job + tuple(r) for job, results in zip(jobs, all_results) for r in results)
+    return write_results(rows, output_format, output, ['faculty_namelist', 'university_name'] + RESULT_COLUMNS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find the patents granted to a university whose inventors are on a faculty name list.")
+    parser.add_argument('faculty_namelist', nargs='?', help="faculty name list file, one name per line")
+    parser.add_argument('university_name', nargs='?', help="university system name or alias, e.g. \"University of Illinois\"")
+    parser.add_argument('--batch', metavar='JOBS_FILE', help="search every faculty_namelist_file,university_name pair of a jobs file")
+    parser.add_argument('--format', choices=list(WRITERS), default='text',
+                        help="text prints the result tuples; csv, jsonl and columnar stream the rows into --output (default: text)")
+    parser.add_argument('--output', help="output file, stdout if omitted (the columnar format needs a file)")
+    parser.add_argument('--profile', metavar='REPORT', help="write a JSON report of stage timings, SQL statements and query plans")
+    parser.add_argument('--shards', metavar='DIR', help="search the year shards written by database_setup.py --shards instead of patents.db")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="split the name list by surname over this many read-only connections searched in parallel (default: 1)")
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help="search the memory-mapped inventor snapshot written by inventor_snapshot.py instead of patents.db")
+    parser.add_argument('--first-year', type=int, help="only search the shards of this grant year and later")
+    parser.add_argument('--last-year', type=int, help="only search the shards of this grant year and earlier")
+    parser.add_argument('--from-date', help="only patents granted on or after this date, YYYYMMDD or YYYY-MM-DD")
+    parser.add_argument('--to-date', help="only patents granted on or before this date, YYYYMMDD or YYYY-MM-DD")
+    parser.add_argument('--classification', action='append', metavar='PREFIX',
+                        help="only patents whose national main classification starts with PREFIX, may be repeated")
+    parser.add_argument('--faculty-coinventors', type=int, nargs='?', const=1, metavar='N',
+                        help="only matches whose inventor shares at least N patents (default: 1) with another faculty member of the list")
+    args = parser.parse_args()
+    filters = (args.from_date, args.to_date, args.classification)
+    if args.batch is None and (args.faculty_namelist is None or args.university_name is None):
+        parser.print_usage()
+        exit()
+    if args.format == 'columnar' and args.output is None:
+        parser.error("--format columnar writes a file, it needs --output")
+    if args.shards is None and (args.first_year is not None or args.last_year is not None):
+        parser.error("--first-year and --last-year need --shards, use --from-date and --to-date on patents.db")
+    if args.batch is not None and any(f is not None for f in filters):
+        parser.error("--from-date, --to-date and --classification do not apply to --batch")
+    if args.batch is not None and args.workers > 1:
+        parser.error("--workers does not apply to --batch")
+    if args.snapshot is not None and (args.batch is not None or args.shards is not None or args.workers > 1):
+        parser.error("--snapshot does not apply to --batch, --shards or --workers")
+    if args.faculty_coinventors is not None and (args.batch is not None or args.shards is not None or args.workers > 1 or args.snapshot is not None):
+        parser.error("--faculty-coinventors only applies to a search of patents.db")
+    if args.profile:
+        instrumentation.enable()
+
+    if args.shards is not None:
+        with ShardedSearch(args.shards) as sharded:
+            results = sharded.search_file(args.faculty_namelist, args.university_name, args.first_year, args.last_year, *filters)
+        write_results(results, args.format, args.output)
+    elif args.snapshot is not None:
+        with InventorSnapshot(args.snapshot) as snapshot:
+            if snapshot.is_stale():
+                parser.error(args.snapshot + " was exported before the last import into patents.db, export it again with inventor_snapshot.py")
+            results = snapshot.search_file(args.faculty_namelist, args.university_name, *filters)
+        write_results(results, args.format, args.output)
+    elif args.workers > 1:
+        with ParallelSearch(workers=args.workers) as parallel:
+            results = parallel.search_file(args.faculty_namelist, args.university_name, *filters)
+        write_results(results, args.format, args.output)
+    elif args.batch is not None and args.format == 'text' and args.output is None:
+        find_all_patents_batch(args.batch)
+    elif args.batch is not None:
+        export_patents_batch(args.batch, args.format, args.output)
+    elif args.format == 'text' and args.output is None:
+        find_all_patents(args.faculty_namelist, args.university_name, None, *filters, args.faculty_coinventors)
+    else:
+        export_patents(args.faculty_namelist, args.university_name, args.format, args.output, None, *filters, args.faculty_coinventors)
+    if args.profile:
+        instrumentation.write_report(args.profile)
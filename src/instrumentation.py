@@ -0,0 +1,148 @@
+import contextlib
+import datetime
+import json
+import re
+import time
+
+# opt-in instrumentation of ingest and search, off unless enable() is called (e.g. by a --profile option)
+# while it is off every hook below is a no-op, so the instrumented code pays nothing for it
+# the collected data is written as one JSON report per run:
+# - stages: wall and CPU seconds of each named stage (e.g. populate_faculty_database, search_patents)
+# - files: rows/sec and bytes/sec of every weekly file committed during ingest
+# - statements: run count and duration of every SQL text executed on a traced connection
+# - query_plans: EXPLAIN QUERY PLAN of the search SQL
+
+# the progress handler runs every this many SQLite virtual machine instructions
+PROGRESS_STEPS = 1000
+
+# the trace callback gets the SQL with its parameters filled in, statements are grouped with the literals taken out again
+def statement_text(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    return re.sub(r"\b\d+(?:\.\d+)?\b", '?', sql)
+
+class Profile:
+    def __init__(self):
+        self.started_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self.wall_started_at = time.perf_counter()
+        self.cpu_started_at = time.process_time()
+        self.stages = {}
+        self.files = []
+        self.statements = {}
+        self.query_plans = {}
+        self.running = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {'count': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            stage['count'] += 1
+            stage['wall_seconds'] += time.perf_counter() - wall
+            stage['cpu_seconds'] += time.process_time() - cpu
+
+    def record_file(self, week, filename, rows, size, seconds):
+        self.files.append({
+            'week': week,
+            'filename': filename,
+            'rows': rows,
+            'bytes': size,
+            'seconds': seconds,
+            'rows_per_second': rows / seconds if seconds > 0 else 0.0,
+            'bytes_per_second': size / seconds if seconds > 0 else 0.0,
+        })
+
+    # a statement runs from its trace callback until the last progress callback seen before the next statement starts,
+    # so durations are exact to PROGRESS_STEPS instructions and statements shorter than that count as 0
+    def trace(self, connection):
+        running = {'sql': None}
+        self.running.append(running)
+
+        def on_statement(sql):
+            self.end_statement(running)
+            running.update(sql=statement_text(sql), started_at=time.perf_counter(), last_step_at=None, steps=0)
+
+        def on_progress():
+            running['steps'] += PROGRESS_STEPS
+            running['last_step_at'] = time.perf_counter()
+            return 0
+
+        connection.set_trace_callback(on_statement)
+        connection.set_progress_handler(on_progress, PROGRESS_STEPS)
+
+    def end_statement(self, running):
+        if running['sql'] is None:
+            return
+        seconds = running['last_step_at'] - running['started_at'] if running['last_step_at'] else 0.0
+        statement = self.statements.setdefault(running['sql'], {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'vm_steps': 0})
+        statement['count'] += 1
+        statement['seconds'] += seconds
+        statement['max_seconds'] = max(statement['max_seconds'], seconds)
+        statement['vm_steps'] += running['steps']
+        running['sql'] = None
+
+    def explain(self, connection, sql, parameters=()):
+        if sql in self.query_plans:
+            return
+        rows = connection.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        self.query_plans[sql] = [{'id': r[0], 'parent': r[1], 'detail': r[3]} for r in rows]
+
+    def report(self):
+        for running in self.running:
+            self.end_statement(running)
+        statements = [dict(sql=sql, **s) for sql, s in self.statements.items()]
+        statements.sort(key=lambda s: s['seconds'], reverse=True)
+        return {
+            'started_at': self.started_at,
+            'wall_seconds': time.perf_counter() - self.wall_started_at,
+            'cpu_seconds': time.process_time() - self.cpu_started_at,
+            'stages': self.stages,
+            'files': self.files,
+            'statements': statements,
+            'query_plans': [{'sql': sql, 'plan': plan} for sql, plan in self.query_plans.items()],
+        }
+
+profile = None
+
+def enable():
+    global profile
+    profile = Profile()
+    return profile
+
+def enabled():
+    return profile is not None
+
+def stage(name):
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.stage(name)
+
+def record_file(week, filename, rows, size, seconds):
+    if profile is not None:
+        profile.record_file(week, filename, rows, size, seconds)
+
+def trace(connection):
+    if profile is not None:
+        profile.trace(connection)
+
+def explain(connection, sql, parameters=()):
+    if profile is not None:
+        profile.explain(connection, sql, parameters)
+
+# turn the instrumentation off again and return the profile it collected, for callers that read it themselves
+def disable():
+    global profile
+    finished, profile = profile, None
+    return finished
+
+# write the report of the run and turn the instrumentation off again
+def write_report(path):
+    global profile
+    report = profile.report()
+    profile = None
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Profile report written to " + path)
+    return report
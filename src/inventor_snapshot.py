@@ -0,0 +1,387 @@
+import argparse
+import array
+from bisect import bisect_left, bisect_right
+import json
+import mmap
+import os
+import shutil
+import sys
+import time
+import zlib
+import numpy
+from name_keys import exact_keys
+from organizations import normalize_org_name
+from process_namelist import process_file
+from result_cache import database_version
+from search_patents import DATABASE_PATH, open_database, has_table, schema_sql, family_sql, normalize_date, check_classification, result_order
+
+SNAPSHOT_DIR = "database/snapshot"
+SNAPSHOT_FORMAT = 'inventor-snapshot'
+SNAPSHOT_VERSION = 2
+
+# read-only snapshot of the columns a search needs, one row per inventor and organization grantee of a patent,
+# exported from patents.db into a directory of flat files that are memory-mapped instead of loaded:
+# - <column>.codes      int32 per row, the code of the row's value in the column's dictionary (-1 for NULL)
+# - <column>.strings    the sorted distinct values of a column, each followed by a newline
+# - <column>.offsets    int64 start of every value in .strings, and the end of the last one
+# - <column>.hash       open-addressing hash table of the value codes, by CRC-32 of the value (looked up columns only)
+# - surname_rows.offsets  rows are sorted by surname key and first name key, the rows of surname key code c are
+#                          surname_rows[c] to surname_rows[c + 1]
+# - family.values, grant_date.values   int64 patent family id and int32 YYYYMMDD grant date (-1 when unknown)
+# - snapshot.json       row count, database version the snapshot was taken from, byte order and university aliases
+# every process searching the snapshot maps the same files, so they share one copy of its pages in the page cache
+# and opening it reads nothing but snapshot.json
+SNAPSHOT_SQL = """
+        SELECT i.surname_key AS surname_key, i.first_key AS first_key, i.first_initial AS first_initial, i.first_name AS first_name,
+               i.city AS city, i.state AS state, g.name AS grantee, o.normalized_name AS organization,
+               p.document_number AS document_number, {document_date} AS document_date, p.title_of_invention AS title,
+               p.national_main_classifications AS classification, {family} AS family
+        FROM inventors i
+        CROSS JOIN grantees g ON g.{ref} = i.{ref}
+        INNER JOIN organizations o ON o.id = g.org_id
+        INNER JOIN patents p ON p.{key} = i.{ref}
+        {family_join}
+        WHERE i.surname_key IS NOT NULL
+        """
+
+# the columns of a snapshot row, in the order SNAPSHOT_SQL selects them, mapped to whether values are looked up
+STRING_COLUMNS = {
+    'surname_key': True, 'first_key': True, 'first_initial': True, 'first_name': False, 'city': False, 'state': False,
+    'grantee': False, 'organization': False, 'document_number': False, 'document_date': False, 'title': False,
+    'classification': False,
+}
+
+def string_hash(value):
+    return zlib.crc32(value.encode('utf-8'))
+
+def write_array(path, typecode, values):
+    with open(path, 'wb') as f:
+        array.array(typecode, values).tofile(f)
+
+def hash_table(strings):
+    size = 8
+    while size < 2 * len(strings):
+        size *= 2
+    table = array.array('i', [-1]) * size
+    for code, value in enumerate(strings):
+        slot = string_hash(value) & (size - 1)
+        while table[slot] >= 0:
+            slot = (slot + 1) & (size - 1)
+        table[slot] = code
+    return table
+
+def write_strings(directory, name, strings, indexed):
+    offsets = [0]
+    with open(os.path.join(directory, name + '.strings'), 'wb') as f:
+        for value in strings:
+            data = value.encode('utf-8') + b'\n'
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    write_array(os.path.join(directory, name + '.offsets'), 'q', offsets)
+    if indexed:
+        write_array(os.path.join(directory, name + '.hash'), 'i', hash_table(strings))
+
+# the sorted distinct values of a column of the snapshot rows, sorted by SQLite: text compares by the bytes of its
+# UTF-8 encoding, which is the code point order Python compares strings by
+def distinct_values(connection, sql, name):
+    return [row[0] for row in connection.execute(f"SELECT DISTINCT {name} FROM ({sql}) WHERE {name} IS NOT NULL ORDER BY 1")]
+
+def family_value(family, title_code):
+    return family if isinstance(family, int) else title_code
+
+def grant_date(document_date):
+    text = str(document_date)
+    return int(text) if len(text) == 8 and text.isdigit() else -1
+
+# export the snapshot of patents.db into directory, replacing an older snapshot there
+# (a process still searching the old one keeps its mapped files until it closes them)
+# only the column dictionaries are held in memory: the rows come sorted from SQLite, which walks the inventors in the
+# order of idx_inventors_name_key, and are encoded and appended to the column files chunk_size rows at a time
+def write_snapshot(connection, directory=SNAPSHOT_DIR, chunk_size=10000):
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(inventors)").fetchall()]
+    if 'surname_key' not in columns:
+        raise ValueError("the snapshot needs the inventor name keys of database/build_name_keys.py")
+    if not has_table(connection, 'organizations'):
+        raise ValueError("the snapshot needs the organizations of database/build_organizations.py")
+    family = family_sql(connection)
+    if family['family'] == 'p.title_of_invention':
+        family = {'family_join': '', 'family': 'NULL'}
+    sql = SNAPSHOT_SQL.format(**schema_sql(connection), **family)
+
+    tmp = directory + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    code_of = {}
+    for name, indexed in STRING_COLUMNS.items():
+        strings = distinct_values(connection, sql, name)
+        write_strings(tmp, name, strings, indexed)
+        code_of[name] = {value: code for code, value in enumerate(strings)}
+    # rows of a surname key start where the key first appears, counted while the rows stream by
+    surname_rows = array.array('q', [0]) * (len(code_of['surname_key']) + 1)
+    names = list(STRING_COLUMNS)
+    date_index = names.index('document_date')
+    files = {name: open(os.path.join(tmp, name + '.codes'), 'wb') for name in names if name != 'surname_key'}
+    files['family'] = open(os.path.join(tmp, 'family.values'), 'wb')
+    files['grant_date'] = open(os.path.join(tmp, 'grant_date.values'), 'wb')
+    rows = 0
+    try:
+        cursor = connection.execute(sql + " ORDER BY i.surname_key, i.first_key")
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            codes = {}
+            for index, name in enumerate(names):
+                values = code_of[name]
+                codes[name] = array.array('i', [values[r[index]] if r[index] is not None else -1 for r in chunk])
+            for code in codes['surname_key']:
+                surname_rows[code + 1] += 1
+            for name in names[1:]:
+                codes[name].tofile(files[name])
+            # without patent_families, duplicates are removed per title like in search_patents
+            array.array('q', [family_value(r[-1], code) for r, code in zip(chunk, codes['title'])]).tofile(files['family'])
+            array.array('i', [grant_date(r[date_index]) for r in chunk]).tofile(files['grant_date'])
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+    for code in range(len(surname_rows) - 1):
+        surname_rows[code + 1] += surname_rows[code]
+    write_array(os.path.join(tmp, 'surname_rows.offsets'), 'q', surname_rows)
+
+    aliases = dict(connection.execute("""
+        SELECT a.alias, o.normalized_name FROM organization_aliases a INNER JOIN organizations o ON o.id = a.org_id
+        """).fetchall())
+    with open(os.path.join(tmp, 'snapshot.json'), 'w') as f:
+        json.dump({'format': SNAPSHOT_FORMAT, 'version': SNAPSHOT_VERSION, 'rows': rows, 'database_version': database_version(connection),
+                   'byteorder': sys.byteorder, 'aliases': aliases}, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    return rows
+
+# a memory-mapped file viewed as an array of typecode, an empty file cannot be mapped and is an empty array
+# view reads single values, array is the numpy array over the same mapped pages for whole-column operations
+class MappedArray:
+    def __init__(self, path, typecode):
+        self.map = None
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map).cast(typecode) if self.map is not None else memoryview(array.array(typecode))
+        self.array = numpy.frombuffer(self.view, dtype=typecode)
+
+    def close(self):
+        self.array = None
+        self.view.release()
+        if self.map is not None:
+            self.map.close()
+
+# the dictionary of a string column, a value's code is its position in sorted order
+class StringColumn:
+    def __init__(self, directory, name, indexed):
+        self.files = [MappedArray(os.path.join(directory, name + '.strings'), 'B'),
+                      MappedArray(os.path.join(directory, name + '.offsets'), 'q')]
+        if indexed:
+            self.files.append(MappedArray(os.path.join(directory, name + '.hash'), 'i'))
+        self.data = self.files[0].map
+        self.offsets = self.files[1].view
+        self.hash = self.files[2].view if indexed else None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def string(self, code):
+        if code < 0:
+            return None
+        return self.data[self.offsets[code]:self.offsets[code + 1] - 1].decode('utf-8')
+
+    # code of a value, -1 when the column does not have it
+    def lookup(self, value):
+        mask = len(self.hash) - 1
+        slot = string_hash(value) & mask
+        while True:
+            code = self.hash[slot]
+            if code < 0 or self.string(code) == value:
+                return code
+            slot = (slot + 1) & mask
+
+    # first code whose value is not less than value
+    def lower_bound(self, value):
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(middle) < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # codes of the values starting with prefix, a range since the values are sorted
+    def prefix_range(self, prefix):
+        return range(self.lower_bound(prefix), self.lower_bound(prefix + '\U0010ffff'))
+
+    # codes of the values containing text, found by searching the mapped values at once
+    def codes_containing(self, text):
+        if text == '':
+            return set(range(len(self)))
+        found = set()
+        needle = text.encode('utf-8')
+        position = self.data.find(needle) if self.data is not None else -1
+        while position >= 0:
+            code = bisect_right(self.offsets, position) - 1
+            found.add(code)
+            # the next match can only be in a later value
+            position = self.data.find(needle, self.offsets[code + 1])
+        return found
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+# searches a snapshot written by write_snapshot with the same results as PatentSearchSession.search with the
+# exact name match (same surname key, and same first name key unless the faculty first name has none or only an
+# initial): each faculty name is one hash lookup of its surname key, and bisections of the first name keys within
+# that surname's rows; the organization, date and classification filters run on numpy arrays of all matched rows
+# at once, only the rows that pass them are read one by one
+class InventorSnapshot:
+    def __init__(self, directory=SNAPSHOT_DIR):
+        with open(os.path.join(directory, 'snapshot.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(directory + " is not an inventor snapshot")
+        if meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(directory + " was written by another version of inventor_snapshot.py, export it again")
+        if meta['byteorder'] != sys.byteorder:
+            raise ValueError(directory + " was written on a machine of another byte order")
+        self.rows = meta['rows']
+        self.database_version = meta['database_version']
+        self.aliases = meta['aliases']
+        self.strings = {name: StringColumn(directory, name, indexed) for name, indexed in STRING_COLUMNS.items()}
+        self.arrays = {name: MappedArray(os.path.join(directory, name + '.codes'), 'i') for name in STRING_COLUMNS if name != 'surname_key'}
+        self.arrays['surname_rows'] = MappedArray(os.path.join(directory, 'surname_rows.offsets'), 'q')
+        self.arrays['family'] = MappedArray(os.path.join(directory, 'family.values'), 'q')
+        self.arrays['grant_date'] = MappedArray(os.path.join(directory, 'grant_date.values'), 'i')
+        self.codes = {name: f.view for name, f in self.arrays.items()}
+        self.columns = {name: f.array for name, f in self.arrays.items()}
+        self.org_codes = {}
+        self.org_masks = {}
+
+    # whether db_path was imported into after the snapshot was exported from it, so that the snapshot misses patents
+    # and still has the name keys and organizations of the older import; a missing db_path cannot be checked
+    def is_stale(self, db_path=DATABASE_PATH):
+        if not os.path.exists(db_path):
+            return False
+        connection = open_database(db_path)
+        try:
+            return database_version(connection) != self.database_version
+        finally:
+            connection.close()
+
+    # university names are resolved like src/organizations.py: every organization whose normalized name contains
+    # the normalized input, or the normalized name of the organization an alias stands for
+    def resolve(self, university_name):
+        if university_name not in self.org_codes:
+            key = normalize_org_name(university_name)
+            codes = self.strings['organization'].codes_containing(key)
+            if key in self.aliases:
+                codes |= self.strings['organization'].codes_containing(self.aliases[key])
+            self.org_codes[university_name] = codes
+        return self.org_codes[university_name]
+
+    # whether a row's organization code is one of the university's, indexed by the code; -1 (no organization)
+    # indexes the last entry, which is False
+    def organization_mask(self, university_name):
+        if university_name not in self.org_masks:
+            mask = numpy.zeros(len(self.strings['organization']) + 1, dtype=bool)
+            mask[list(self.resolve(university_name))] = True
+            self.org_masks[university_name] = mask
+        return self.org_masks[university_name]
+
+    # rows of the inventors matching one faculty name: (start, end, initial), the rows start to end of its surname key
+    # and first name key, of which only those with first initial code initial are kept when initial is not -1
+    def name_range(self, first_name, surname):
+        first_key, first_initial, surname_key = exact_keys(first_name, surname)
+        surname_code = self.strings['surname_key'].lookup(surname_key)
+        if surname_code < 0:
+            return 0, 0, -1
+        start, end = self.codes['surname_rows'][surname_code], self.codes['surname_rows'][surname_code + 1]
+        if first_key == '':
+            return start, end, -1
+        if len(first_key) == 1:
+            # a faculty first name that is only an initial matches by first initial, which rows are not sorted by
+            initial_code = self.strings['first_initial'].lookup(first_initial)
+            return (start, end, initial_code) if initial_code >= 0 else (0, 0, -1)
+        first_code = self.strings['first_key'].lookup(first_key)
+        first_keys = self.codes['first_key']
+        return bisect_left(first_keys, first_code, start, end), bisect_right(first_keys, first_code, start, end), -1
+
+    def value(self, name, row):
+        return self.strings[name].string(self.codes[name][row])
+
+    def result_row(self, row, first_name, surname):
+        return (self.value('first_name', row), first_name, surname, self.value('city', row), self.value('state', row),
+                self.value('grantee', row), self.value('document_number', row), self.value('document_date', row), self.value('title', row))
+
+    def search(self, clean_namelist, university_name, first_date=None, last_date=None, classifications=None):
+        # the rows of every faculty name, in namelist order, and the namelist entry of each row
+        ranges = numpy.array([self.name_range(first_name, surname) for first_name, surname in clean_namelist], dtype=numpy.int64).reshape(-1, 3)
+        starts, ends, initials = ranges[:, 0], ranges[:, 1], ranges[:, 2]
+        lengths = ends - starts
+        names = numpy.repeat(numpy.arange(len(ranges)), lengths)
+        rows = numpy.arange(len(names)) + numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths)
+
+        keep = self.organization_mask(university_name)[self.columns['organization'][rows]]
+        initial = initials[names]
+        keep &= (initial < 0) | (self.columns['first_initial'][rows] == initial)
+        if first_date is not None or last_date is not None:
+            first = normalize_date(first_date) if first_date is not None else 0
+            last = normalize_date(last_date) if last_date is not None else 99999999
+            dates = self.columns['grant_date'][rows]
+            keep &= (dates >= first) & (dates <= last)
+        if classifications:
+            codes = self.columns['classification'][rows]
+            classified = numpy.zeros(len(rows), dtype=bool)
+            for prefix in classifications:
+                prefix_codes = self.strings['classification'].prefix_range(check_classification(prefix))
+                classified |= (codes >= prefix_codes.start) & (codes < prefix_codes.stop)
+            keep &= classified
+
+        # one row per patent family and faculty surname, like the GROUP BY of search_patents
+        family = self.codes['family']
+        found = {}
+        for row, name in zip(rows[keep].tolist(), names[keep].tolist()):
+            first_name, surname = clean_namelist[name]
+            key = (family[row], surname)
+            if key not in found:
+                found[key] = self.result_row(row, first_name, surname)
+        return sorted(found.values(), key=result_order)
+
+    def search_file(self, faculty_namelist, university_name, first_date=None, last_date=None, classifications=None):
+        return self.search(process_file(faculty_namelist), university_name, first_date, last_date, classifications)
+
+    def close(self):
+        self.columns = {}
+        self.codes = {}
+        for f in self.arrays.values():
+            f.close()
+        for column in self.strings.values():
+            column.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the memory-mapped inventor snapshot searched by find_all_patents.py --snapshot.")
+    parser.add_argument('db_path', nargs='?', default=DATABASE_PATH)
+    parser.add_argument('directory', nargs='?', default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    connection = open_database(args.db_path)
+    rows = write_snapshot(connection, args.directory)
+    connection.close()
+    print("Exported " + str(rows) + " rows into " + args.directory + " in " + str(round(time.perf_counter() - started_at, 1)) + " s")
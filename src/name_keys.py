@@ -0,0 +1,78 @@
+import hashlib
+import json
+import re
+import unicodedata
+
+# nicknames mapped to the given name they stand for, used so that "Bill" matches "William"
+# nicknames shared by several given names (e.g. "Al", "Chris") are left out on purpose
+NICKNAMES = {
+    'abe': 'abraham', 'alex': 'alexander', 'andy': 'andrew', 'ben': 'benjamin', 'bernie': 'bernard',
+    'bill': 'william', 'billy': 'william', 'bob': 'robert', 'bobby': 'robert', 'brad': 'bradley',
+    'charlie': 'charles', 'chuck': 'charles', 'dan': 'daniel', 'danny': 'daniel', 'dave': 'david',
+    'dick': 'richard', 'doug': 'douglas', 'ed': 'edward', 'eddie': 'edward', 'fred': 'frederick',
+    'greg': 'gregory', 'hank': 'henry', 'jack': 'john', 'jake': 'jacob', 'jim': 'james', 'jimmy': 'james',
+    'joe': 'joseph', 'jon': 'jonathan', 'ken': 'kenneth', 'kenny': 'kenneth', 'larry': 'lawrence',
+    'liz': 'elizabeth', 'matt': 'matthew', 'mike': 'michael', 'mickey': 'michael', 'nick': 'nicholas',
+    'pat': 'patrick', 'pete': 'peter', 'phil': 'philip', 'rick': 'richard', 'rich': 'richard',
+    'rob': 'robert', 'ron': 'ronald', 'russ': 'russell', 'sam': 'samuel', 'steve': 'steven',
+    'stephen': 'steven', 'ted': 'theodore', 'tim': 'timothy', 'tom': 'thomas', 'tommy': 'thomas',
+    'tony': 'anthony', 'vince': 'vincent', 'walt': 'walter', 'will': 'william', 'zach': 'zachary',
+    'kathy': 'katherine', 'kate': 'katherine', 'catherine': 'katherine', 'sue': 'susan', 'jenny': 'jennifer',
+    'jen': 'jennifer', 'becky': 'rebecca', 'peggy': 'margaret', 'maggie': 'margaret', 'meg': 'margaret',
+}
+
+# bumped when name_keys changes how a name is keyed; together with NICKNAMES it makes up the version of the keys
+NAME_KEYS_FORMAT = 1
+
+# version of the keys name_keys computes, a database keyed under another version is re-keyed (see build_name_keys.py)
+def name_keys_version():
+    return hashlib.sha256(json.dumps([NAME_KEYS_FORMAT, sorted(NICKNAMES.items())]).encode('utf-8')).hexdigest()[:16]
+
+SOUNDEX_CODES = {}
+for letters, code in [('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')]:
+    for letter in letters:
+        SOUNDEX_CODES[letter] = code
+
+# lowercase ascii letters only, accents removed (e.g. "José" -> "jose", "O'Brien" -> "obrien")
+def normalize_token(s):
+    s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z]', '', s.lower())
+
+# American Soundex code, e.g. "Robert" and "Rupert" -> "r163"
+def soundex(name):
+    name = normalize_token(name)
+    if name == '':
+        return ''
+    code = name[0]
+    previous = SOUNDEX_CODES.get(name[0], '')
+    for letter in name[1:]:
+        digit = SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+        if letter not in 'hw':
+            previous = digit
+    return (code + '000')[:4]
+
+# first given-name token of a first name, skipping a leading initial ("J. Kevin" -> "kevin")
+def first_token(first_name):
+    tokens = [normalize_token(t) for t in re.split(r'[\s.\-]+', first_name)]
+    tokens = [t for t in tokens if t != '']
+    if len(tokens) > 1 and len(tokens[0]) == 1:
+        return tokens[1]
+    return tokens[0] if tokens else ''
+
+# (first_key, first_initial, first_soundex, surname_key, surname_soundex) of a name
+# first_key is the first token with nicknames replaced by the given name they stand for
+def name_keys(first_name, surname):
+    if first_name is None or first_name == 'null':
+        first_name = ''
+    if surname is None or surname == 'null':
+        surname = ''
+    token = first_token(first_name)
+    first_key = NICKNAMES.get(token, token)
+    return (first_key, normalize_token(first_name)[:1], soundex(first_key), normalize_token(surname), soundex(surname))
+
+# (first_key, first_initial, surname_key) of a name, the keys of the exact name match without the phonetic ones
+def exact_keys(first_name, surname):
+    first_key, first_initial, _, surname_key, _ = name_keys(first_name, surname)
+    return first_key, first_initial, surname_key
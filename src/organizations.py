@@ -0,0 +1,64 @@
+import re
+
+# legal-form prefixes and suffixes that do not tell organizations apart
+# e.g. "The Board of Trustees of the University of Illinois" and "University of Illinois" are the same organization
+NAME_PREFIXES = [
+    'the board of trustees of the ',
+    'board of trustees of the ',
+    'the board of regents of the ',
+    'board of regents of the ',
+    'the regents of the ',
+    'regents of the ',
+    'the trustees of ',
+    'trustees of ',
+    'the ',
+]
+NAME_SUFFIXES = [' the', ' inc', ' incorporated', ' llc', ' ltd', ' corp', ' corporation', ' co']
+
+# names people use for a university, mapped to the normalized name of its university system
+ORGANIZATION_ALIASES = {
+    'uiuc': 'university of illinois',
+    'university of illinois urbana champaign': 'university of illinois',
+    'university of illinois at urbana champaign': 'university of illinois',
+    'ucb': 'university of california',
+    'uc berkeley': 'university of california',
+    'university of california berkeley': 'university of california',
+    'umich': 'university of michigan',
+    'university of michigan ann arbor': 'university of michigan',
+}
+
+def normalize_org_name(name):
+    name = name.lower().replace('&', ' and ')
+    name = ' '.join(re.sub(r'[^a-z0-9]+', ' ', name).split())
+    changed = True
+    while changed:
+        changed = False
+        for prefix in NAME_PREFIXES:
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+                changed = True
+        for suffix in NAME_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                changed = True
+    return name
+
+# ids of the organizations a university name refers to: every organization whose normalized name
+# contains the normalized input (or the university system an alias stands for)
+def resolve_organizations(connection, university_name):
+    key = normalize_org_name(university_name)
+    sql = """
+        SELECT o.id FROM organizations o WHERE o.normalized_name LIKE '%' || ? || '%'
+        UNION
+        SELECT o.id FROM organization_aliases a
+        INNER JOIN organizations t ON t.id = a.org_id
+        INNER JOIN organizations o ON o.normalized_name LIKE '%' || t.normalized_name || '%'
+        WHERE a.alias = ?
+        """
+    return [row[0] for row in connection.execute(sql, (key, key)).fetchall()]
+
+# returns None when the database has no organizations table yet, the search then matches grantee names directly
+def resolve_university(connection, university_name):
+    if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'organizations'").fetchone() is None:
+        return None
+    return resolve_organizations(connection, university_name)
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import zlib
+from process_namelist import process_file
+from search_patents import DATABASE_PATH, result_order
+from search_session import PatentSearchSession
+
+# partitions with fewer names than this are not worth a thread of their own
+MIN_PARTITION_SIZE = 50
+
+# split the namelist into at most `partitions` lists by a hash of the surname, so all names sharing a surname
+# land in the same partition; duplicates are removed per family and faculty surname, so removing them within
+# each partition gives the same rows as removing them over the whole list
+def partition_namelist(clean_namelist, partitions):
+    parts = [[] for _ in range(partitions)]
+    for first_name, surname in clean_namelist:
+        parts[zlib.crc32(surname.encode('utf-8')) % partitions].append((first_name, surname))
+    return [part for part in parts if part]
+
+# the rows of the partitions in the order search_patents returns them
+def merge_partitions(partition_results):
+    results = [r for rows in partition_results for r in rows]
+    results.sort(key=result_order)
+    return results
+
+# searches one database with the namelist split over a pool of worker threads: each worker keeps its own
+# PatentSearchSession (a read-only connection with its own faculty TEMP table), and sqlite3 releases the GIL while
+# a statement runs, so the partitions are searched at the same time
+class ParallelSearch:
+    def __init__(self, db_path=DATABASE_PATH, workers=4, name_match=None, min_partition_size=MIN_PARTITION_SIZE):
+        self.db_path = db_path
+        self.workers = workers
+        self.name_match = name_match
+        self.min_partition_size = min_partition_size
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='partition')
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = PatentSearchSession(self.db_path, name_match=self.name_match)
+        return self.local.session
+
+    def search_partition(self, clean_namelist, university_name, first_date=None, last_date=None, classifications=None):
+        return self.session().search(clean_namelist, university_name, first_date, last_date, classifications)
+
+    def search(self, clean_namelist, university_name, first_date=None, last_date=None, classifications=None):
+        partitions = max(1, min(self.workers, len(clean_namelist) // self.min_partition_size))
+        futures = [self.executor.submit(self.search_partition, part, university_name, first_date, last_date, classifications)
+                   for part in partition_namelist(clean_namelist, partitions)]
+        return merge_partitions(future.result() for future in futures)
+
+    def search_file(self, faculty_namelist, university_name, first_date=None, last_date=None, classifications=None):
+        return self.search(process_file(faculty_namelist), university_name, first_date, last_date, classifications)
+
+    # the sessions belong to the worker threads, so each worker closes its own (see ShardedSearch.close)
+    def close(self):
+        barrier = threading.Barrier(self.workers)
+
+        def close_session():
+            if hasattr(self.local, 'session'):
+                self.local.session.close()
+                del self.local.session
+            barrier.wait()
+
+        for future in [self.executor.submit(close_session) for _ in range(self.workers)]:
+            future.result()
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,190 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import json
+import queue
+import threading
+from process_namelist import clean_list
+from search_patents import DATABASE_PATH
+from search_session import PatentSearchSession
+from result_cache import CACHE_PATH, database_version
+
+# a long-running local service in front of the search: each worker thread of the pool owns one PatentSearchSession,
+# i.e. one read-only connection to patents.db whose page cache stays warm between requests
+# requests are answered by whichever worker is free, so up to `workers` searches run at the same time
+class SearchPool:
+    def __init__(self, db_path=DATABASE_PATH, workers=4, cache_path=CACHE_PATH):
+        self.db_path = db_path
+        self.cache_path = cache_path
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search', initializer=self.open_session)
+
+    # runs once in every worker thread, sqlite3 connections stay in the thread that opened them
+    def open_session(self):
+        self.local.session = PatentSearchSession(self.db_path, cache_path=self.cache_path)
+
+    def run(self, function, *args):
+        return self.executor.submit(lambda: function(self.local.session, *args)).result()
+
+    def search(self, clean_namelist, university_name):
+        return self.run(lambda session: session.search(clean_namelist, university_name))
+
+    # the rows of a search in chunks of chunk_size as the worker fetches them: the worker thread owns the connection,
+    # so it runs session.iter_search and hands the chunks over a bounded queue, and stops at its next chunk once the
+    # returned generator is closed (e.g. the client went away); an error of the search is raised from the generator
+    def iter_search(self, clean_namelist, university_name, chunk_size=1000):
+        chunks = queue.Queue(maxsize=4)
+        stopped = threading.Event()
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce(session):
+            rows = session.iter_search(clean_namelist, university_name, chunk_size=chunk_size)
+            try:
+                chunk = []
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) == chunk_size:
+                        if not put(chunk):
+                            return
+                        chunk = []
+                if not chunk or put(chunk):
+                    put(None)
+            except Exception as e:
+                put(e)
+            finally:
+                rows.close()
+
+        future = self.executor.submit(lambda: produce(self.local.session))
+        try:
+            while True:
+                item = chunks.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+            future.result()
+
+    def status(self):
+        def status(session):
+            result = {'status': 'ok', 'database_version': database_version(session.connection)}
+            if session.cache is not None:
+                result['cache'] = session.cache.stats()
+            return result
+        return self.run(status)
+
+    def close(self):
+        self.executor.shutdown()
+
+class SearchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    pool = None
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # GET /status: database version stamp and result cache counters
+    def do_GET(self):
+        if self.path != '/status':
+            self.send_json(404, {'error': 'unknown path ' + self.path})
+            return
+        self.send_json(200, self.pool.status())
+
+    # POST /search {"names": ["Chang, Kevin", "Bin He", ...], "university": "University of Illinois", "stream": false}
+    # names are cleaned like the lines of a faculty namelist file
+    # the results are the rows of find_all_patents, either as one json document or, with "stream", as one json array
+    # per line written while the rows are fetched
+    # a request that is not of this form gets a 400, a search that fails a 500 (or, once streaming, a cut response)
+    def do_POST(self):
+        if self.path != '/search':
+            self.send_json(404, {'error': 'unknown path ' + self.path})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            names = request['names']
+            university_name = request['university']
+            if not isinstance(names, list) or not all(isinstance(name, str) for name in names) or not isinstance(university_name, str):
+                raise ValueError("names must be a list of strings and university a string")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': 'bad request: ' + str(e)})
+            return
+        if request.get('stream'):
+            self.stream_search(clean_list(names), university_name)
+            return
+        try:
+            results = self.pool.search(clean_list(names), university_name)
+            if results is None:
+                raise ValueError("invalid query")
+        except Exception as e:
+            self.send_json(500, {'error': 'search failed: ' + str(e)})
+            return
+        self.send_json(200, {'count': len(results), 'results': results})
+
+    def write_chunk(self, rows):
+        data = b''.join((json.dumps(r) + '\n').encode('utf-8') for r in rows)
+        if data:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    # the first chunk is fetched before the response starts, so a search that fails at once still gets its 500
+    def stream_search(self, clean_namelist, university_name):
+        chunks = self.pool.iter_search(clean_namelist, university_name)
+        try:
+            try:
+                first = next(chunks, [])
+            except Exception as e:
+                self.send_json(500, {'error': 'search failed: ' + str(e)})
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                self.write_chunk(first)
+                for chunk in chunks:
+                    self.write_chunk(chunk)
+            except Exception:
+                # without the terminating chunk the client sees the response is incomplete
+                self.close_connection = True
+                return
+            self.wfile.write(b'0\r\n\r\n')
+        finally:
+            chunks.close()
+
+def make_server(host='127.0.0.1', port=8765, pool=None):
+    handler = type('BoundSearchHandler', (SearchHandler,), {'pool': pool})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve patent searches over HTTP/JSON on a local port.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', default=DATABASE_PATH, help="path to patents.db")
+    parser.add_argument('--workers', type=int, default=4, help="number of read-only connections, i.e. concurrent searches")
+    parser.add_argument('--no-cache', action='store_true', help="do not keep results in database/search_cache.db")
+    args = parser.parse_args()
+
+    pool = SearchPool(args.db, args.workers, None if args.no_cache else CACHE_PATH)
+    server = make_server(args.host, args.port, pool)
+    print("Serving patent searches on http://" + args.host + ":" + str(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    pool.close()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+CACHE_PATH = "database/search_cache.db"
+
+CACHE_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS search_cache (
+        database TEXT,
+        namelist_digest TEXT,
+        university TEXT,
+        name_match TEXT,
+        version INTEGER,
+        results TEXT,
+        size INTEGER,
+        last_used INTEGER,
+        PRIMARY KEY (database, namelist_digest, university, name_match, version)
+    );
+    CREATE INDEX IF NOT EXISTS idx_search_cache_last_used ON search_cache (last_used);
+    CREATE TABLE IF NOT EXISTS cache_stats (
+        name TEXT PRIMARY KEY,
+        value INTEGER
+    );
+    INSERT OR IGNORE INTO cache_stats VALUES ('hits', 0), ('misses', 0);
+    """
+
+# entries past the newest max_size_mb of results, counted from the most recently used one
+EVICT_SQL = """
+    DELETE FROM search_cache WHERE rowid IN (
+        SELECT rowid FROM (
+            SELECT rowid, sum(size) OVER (ORDER BY last_used DESC) AS total FROM search_cache
+        ) WHERE total > ?
+    )
+    """
+
+# version stamp of patents.db, database_setup.py bumps it after every import
+def database_version(connection):
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+# identity of the database file a search runs on: its absolute path, and its device and inode so that a database
+# rebuilt at the same path, which starts over at the same version stamps, is another database
+def database_identity(db_path):
+    stat = os.stat(db_path)
+    return os.path.abspath(db_path) + ':' + str(stat.st_dev) + ':' + str(stat.st_ino)
+
+# filters is the patent_filter SQL of a filtered search, folded into the digest so it needs no column of its own
+def namelist_digest(clean_namelist, filters=None):
+    key = clean_namelist if filters is None else [clean_namelist, filters]
+    return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+# search results kept in a side SQLite file, since searches only open patents.db read-only
+# entries are keyed by the database file, the cleaned namelist, the university string, the name matching mode and the
+# database version, so a new import invalidates every entry of its database and sessions on different databases can
+# share one cache file; last_used is a counter bumped on every hit, and the least recently used
+# entries are evicted past max_size_mb
+# a lookup does not write: the hit and miss counts and the entries used since the last flush are kept in memory and
+# written in one transaction every flush_every lookups, before a put (whose eviction needs last_used), and on close
+class ResultCache:
+    def __init__(self, cache_path=CACHE_PATH, max_size_mb=64, flush_every=100):
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        # cache files written before entries were keyed by database are emptied
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(search_cache)").fetchall()]
+        if columns and 'database' not in columns:
+            self.connection.execute("DROP TABLE search_cache")
+        self.connection.executescript(CACHE_TABLES_SQL)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.flush_every = flush_every
+        # not yet flushed: hit and miss counts, and the keys of the entries hit, least recently used first
+        self.unflushed = {'hits': 0, 'misses': 0}
+        self.used = {}
+
+    # returns None on a miss
+    def get(self, database, clean_namelist, university_name, name_match, version, filters=None):
+        key = (database, namelist_digest(clean_namelist, filters), university_name, str(name_match), version)
+        row = self.connection.execute("""SELECT results FROM search_cache
+            WHERE database = ? AND namelist_digest = ? AND university = ? AND name_match = ? AND version = ?""", key).fetchone()
+        if row is None:
+            self.misses += 1
+            self.unflushed['misses'] += 1
+        else:
+            self.hits += 1
+            self.unflushed['hits'] += 1
+            self.used.pop(key, None)
+            self.used[key] = True
+        if self.unflushed['hits'] + self.unflushed['misses'] >= self.flush_every:
+            self.flush()
+        return [tuple(r) for r in json.loads(row[0])] if row is not None else None
+
+    # write the counts and the last_used of the entries hit since the last flush
+    def flush(self):
+        if self.unflushed['hits'] + self.unflushed['misses'] == 0:
+            return
+        self.connection.executemany("UPDATE cache_stats SET value = value + ? WHERE name = ?", [(n, name) for name, n in self.unflushed.items()])
+        last_used = self.connection.execute("SELECT coalesce(max(last_used), 0) FROM search_cache").fetchone()[0]
+        self.connection.executemany("""UPDATE search_cache SET last_used = ?
+            WHERE database = ? AND namelist_digest = ? AND university = ? AND name_match = ? AND version = ?""",
+                                    [(last_used + n,) + key for n, key in enumerate(self.used, 1)])
+        self.connection.commit()
+        self.unflushed = {'hits': 0, 'misses': 0}
+        self.used = {}
+
+    def put(self, database, clean_namelist, university_name, name_match, version, results, filters=None):
+        self.flush()
+        data = json.dumps(results)
+        # entries of older versions of the database can never hit again
+        self.connection.execute("DELETE FROM search_cache WHERE database = ? AND version != ?", (database, version))
+        self.connection.execute("""INSERT OR REPLACE INTO search_cache
+            VALUES (?, ?, ?, ?, ?, ?, ?, (SELECT coalesce(max(last_used), 0) + 1 FROM search_cache))""",
+                                (database, namelist_digest(clean_namelist, filters), university_name, str(name_match), version, data, len(data)))
+        self.connection.execute(EVICT_SQL, (self.max_size,))
+        self.connection.commit()
+
+    # hit and miss counts over the lifetime of the cache file
+    def stats(self):
+        self.flush()
+        stats = dict(self.connection.execute("SELECT name, value FROM cache_stats").fetchall())
+        stats['entries'], stats['size'] = self.connection.execute("SELECT count(*), coalesce(sum(size), 0) FROM search_cache").fetchone()
+        return stats
+
+    def clear(self):
+        self.connection.execute("DELETE FROM search_cache")
+        self.connection.commit()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
@@ -0,0 +1,91 @@
+import csv
+import gzip
+import json
+import sys
+
+# columns of a search result row, in the order search_patents returns them
+RESULT_COLUMNS = [
+    'inventor_first_name', 'faculty_first_name', 'faculty_last_name', 'inventor_city', 'inventor_state',
+    'grantee_name', 'patent_document_number', 'document_date', 'title_of_invention',
+]
+
+COLUMNAR_FORMAT = 'patent-columns'
+
+# every writer takes an iterable of rows and writes them as they come, so memory does not grow with the results
+# each returns the number of rows written
+
+# the original console output: one tuple per line between a header and a count
+def write_text(rows, f, columns=RESULT_COLUMNS):
+    f.write("Patent Records:\n")
+    f.write("(" + ", ".join(columns) + ")\n")
+    count = 0
+    for r in rows:
+        f.write(str(tuple(r)) + "\n")
+        count += 1
+    f.write("Number of patents found: " + str(count) + "\n")
+    return count
+
+def write_csv(rows, f, columns=RESULT_COLUMNS):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for r in rows:
+        writer.writerow(r)
+        count += 1
+    return count
+
+# one json object per line
+def write_jsonl(rows, f, columns=RESULT_COLUMNS):
+    count = 0
+    for r in rows:
+        f.write(json.dumps(dict(zip(columns, r))) + "\n")
+        count += 1
+    return count
+
+# compact columnar export: a gzip file of json lines, a header line with the column names followed by one line per
+# row group of up to row_group_size rows, holding one list of values per column (like the row groups of Parquet)
+# values of a column repeat a lot (names, cities, grantees), which the compression takes advantage of
+def write_columnar(rows, f, columns=RESULT_COLUMNS, row_group_size=10000):
+    with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+        gz.write((json.dumps({'format': COLUMNAR_FORMAT, 'version': 1, 'columns': columns}) + "\n").encode('utf-8'))
+        group = [[] for _ in columns]
+        count = 0
+        for r in rows:
+            for values, value in zip(group, r):
+                values.append(value)
+            count += 1
+            if len(group[0]) == row_group_size:
+                gz.write((json.dumps({'rows': len(group[0]), 'columns': group}) + "\n").encode('utf-8'))
+                group = [[] for _ in columns]
+        if group[0]:
+            gz.write((json.dumps({'rows': len(group[0]), 'columns': group}) + "\n").encode('utf-8'))
+    return count
+
+# yields the rows of a file written by write_columnar, one row group in memory at a time
+def read_columnar(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != COLUMNAR_FORMAT:
+            raise ValueError(path + " is not a columnar export")
+        for line in f:
+            yield from zip(*json.loads(line)['columns'])
+
+WRITERS = {
+    'text': write_text,
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'columnar': write_columnar,
+}
+
+# write rows to the output file, or to stdout when output is None (not for the binary columnar format)
+def write_results(rows, output_format='text', output=None, columns=RESULT_COLUMNS):
+    writer = WRITERS[output_format]
+    if output is None:
+        if output_format == 'columnar':
+            raise ValueError("the columnar format needs an output file")
+        return writer(rows, sys.stdout, columns)
+    if output_format == 'columnar':
+        with open(output, 'wb') as f:
+            return writer(rows, f, columns)
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        return writer(rows, f, columns)
@@ -1,72 +1,315 @@
 import sqlite3
 import pathlib
-import random
-import string
+import re
+try:
+    from name_keys import name_keys
+    import instrumentation
+except ImportError:
+    from src.name_keys import name_keys
+    from src import instrumentation
 
-# get connection to database
-def get_database(dp_path: str) -> sqlite3.Connection:
+DATABASE_PATH = "database/patents.db"
+
+# get connection to database, mode is "rw" or "ro"
+def get_database(dp_path: str, mode="rw") -> sqlite3.Connection:
     path_to_lib = pathlib.Path(dp_path).absolute().as_uri()
     connection = None
     try:
-        connection = sqlite3.connect(f"{path_to_lib}?mode=rw", uri=True)
+        connection = sqlite3.connect(f"{path_to_lib}?mode={mode}", uri=True)
     except sqlite3.OperationalError:
         print("Error: Database not found")
         exit(1)
     return connection
 
-def create_faculty_database(college):
-    connection = get_database("database/patents.db")
+# searches only read patents.db, so any number of them can run at the same time without taking its write lock
+def open_database(db_path=DATABASE_PATH) -> sqlite3.Connection:
+    return get_database(db_path, mode="ro")
+
+# the faculty list lives in a TEMP table, which belongs to this connection only,
+# so nothing is written to patents.db and the table disappears with the connection even after a crash
+def create_faculty_database(connection, college):
     db_cursor = connection.cursor()
-    dbname = college.replace(' ', '').lower() + ''.join(random.choices(string.ascii_uppercase + string.digits, k=3))
-    sql = """CREATE TABLE IF NOT EXISTS {name} (
+    dbname = "faculty_" + re.sub(r'[^a-z0-9]', '', college.lower())
+    db_cursor.execute("DROP TABLE IF EXISTS temp.{name}".format(name=dbname))
+    sql = """CREATE TEMP TABLE {name} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             first_name TEXT,
-            surname TEXT
+            surname TEXT,
+            first_key TEXT,
+            first_initial TEXT,
+            first_soundex TEXT,
+            surname_key TEXT,
+            surname_soundex TEXT
             )"""
     db_cursor.execute(sql.format(name=dbname))
+    db_cursor.execute("CREATE INDEX temp.{name}_surname ON {name} (surname)".format(name=dbname))
+    db_cursor.execute("CREATE INDEX temp.{name}_surname_key ON {name} (surname_key, first_key)".format(name=dbname))
+    db_cursor.execute("CREATE INDEX temp.{name}_surname_soundex ON {name} (surname_soundex, first_soundex)".format(name=dbname))
     connection.commit()
-    connection.close()
     return dbname
 
-def populate_faculty_database(dbname, clean_name_list):
-    connection = get_database("database/patents.db")
+def populate_faculty_database(connection, dbname, clean_name_list):
     db_cursor = connection.cursor()
-    sql = """INSERT INTO {name} (first_name, surname) VALUES (?, ?)"""
-    db_cursor.executemany(sql.format(name=dbname), clean_name_list)
+    sql = """INSERT INTO temp.{name} (first_name, surname, first_key, first_initial, first_soundex, surname_key, surname_soundex)
+            VALUES (?, ?, ?, ?, ?, ?, ?)"""
+    db_cursor.executemany(sql.format(name=dbname), [(fn, ln) + name_keys(fn, ln) for fn, ln in clean_name_list])
     connection.commit()
-    connection.close() 
 
-def read_query(connection, query):
+def read_query(connection, query, parameters=()):
     cursor = connection.cursor()
     result = None
     try:
-        cursor.execute(query)
+        cursor.execute(query, parameters)
         result = cursor.fetchall()
     except sqlite3.OperationalError:
         print("Error: Invalid query")
     return result
 
-def search_patents(dbname, college):
-    connection = get_database("database/patents.db")
-    sql = """
-        SELECT i.first_name, f.first_name, f.surname, i.city, i.state, g.name, p.document_number, p.document_date, p.title_of_invention
+# like read_query, but yields the rows as they are fetched, chunk_size rows at a time, so memory stays bounded
+def iter_query(connection, query, chunk_size=1000, parameters=()):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, parameters)
+    except sqlite3.OperationalError:
+        print("Error: Invalid query")
+        return
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+# how a faculty name f is matched to an inventor i:
+# like     - same surname and the faculty first name is a substring of the inventor first name (databases without name keys)
+# exact    - same normalized surname and same first given name, nicknames included (e.g. Bill = William)
+# phonetic - same Soundex code for surname and first given name
+# a faculty first name that is only an initial (e.g. "W." of "Fuchs, W. Kent") has a one-letter first key, which
+# can only be the first key of inventors named by their initial, so it matches by first initial instead
+# the keys are computed at ingest by database/build_name_keys.py, so exact and phonetic are index equi-joins
+NAME_MATCH_SQL = {
+    'like': "f.surname = i.surname AND i.first_name LIKE '%' || f.first_name || '%'",
+    'exact': "f.surname_key = i.surname_key AND (f.first_key = i.first_key OR f.first_key = '' OR (length(f.first_key) = 1 AND f.first_initial = i.first_initial))",
+    'phonetic': "f.surname_soundex = i.surname_soundex AND (f.first_soundex = i.first_soundex OR f.first_key = '' OR (length(f.first_key) = 1 AND f.first_initial = i.first_initial))",
+}
+
+# how the tables of each schema version are joined (see database/migrate_schema_v2.py):
+# ref is the column of inventors and grantees that references a patent, key the patents column it references
+# schema v2 stores dates as integers, they are returned as text like in schema v1
+SCHEMA_SQL = {
+    1: {'ref': 'document_number', 'key': 'document_number', 'document_date': 'p.document_date'},
+    2: {'ref': 'patent_id', 'key': 'id', 'document_date': 'CAST(p.document_date AS TEXT)'},
+}
+
+# grant date and classification filters (see patent_filter_sql), the search SQL is formatted with NO_FILTER when there are none
+# patent_filter is a condition on the patents p, candidate_filter narrows the candidate grantees to the patents that pass it
+# before any inventor is looked up, through idx_patents_document_date or idx_patents_classification
+NO_FILTER = {'patent_filter': '1', 'candidate_filter': ''}
+
+# how duplicates are removed: one row per patent family (see database/build_patent_families.py) and faculty surname,
+# databases built before patent_families existed fall back to one row per title and faculty surname
+FAMILY_SQL = {
+    'family': {'family_join': "INNER JOIN patent_families pf ON pf.{ref} = p.{key}", 'family': 'pf.family_id'},
+    'title': {'family_join': '', 'family': 'p.title_of_invention'},
+}
+
+# the university string is bound as the :university parameter of the LIKE (see university_parameters), never
+# formatted into the SQL, so names with quotes like "Saint Mary's College" are searched as they are
+# CROSS JOIN keeps the faculty table as the outer loop so inventors are looked up by surname through
+# idx_inventors_surname (see database/build_indexes.py), the inner joins that follow already drop
+# faculty without a matching inventor, so the result is the same as with a LEFT JOIN
+SEARCH_SQL = """
+        SELECT i.first_name, f.first_name, f.surname, i.city, i.state, g.name, p.document_number, {document_date}, p.title_of_invention
         FROM {dbname} f
-        LEFT JOIN inventors i ON f.surname = i.surname AND i.first_name LIKE '%' || f.first_name || '%'
-        INNER JOIN grantees g ON i.document_number = g.document_number
-        INNER JOIN patents p ON g.document_number = p.document_number
-        WHERE g.name LIKE '%{c}%'
-        GROUP BY p.title_of_invention, f.surname
-        ORDER BY f.surname ASC;
+        CROSS JOIN inventors i ON {name_match}
+        INNER JOIN grantees g ON i.{ref} = g.{ref}
+        INNER JOIN patents p ON g.{ref} = p.{key}
+        {family_join}
+        WHERE g.name LIKE '%' || :university || '%' AND {patent_filter}
+        GROUP BY {family}, f.surname
+        ORDER BY f.surname ASC, p.title_of_invention;
+        """
+
+# same search, but the university keyword is first resolved into the candidate grantees through the
+# trigram index grantees_fts (see database/build_indexes.py), which answers LIKE '%...%' without
+# scanning every grantee, then only the inventors of those candidate patents are matched to the faculty
+SEARCH_FTS_SQL = """
+        WITH g AS MATERIALIZED (
+            SELECT grantees.{ref}, grantees.name
+            FROM grantees_fts CROSS JOIN grantees ON grantees.id = grantees_fts.rowid
+            WHERE grantees_fts.name LIKE '%' || :university || '%' {candidate_filter}
+        )
+        SELECT i.first_name, f.first_name, f.surname, i.city, i.state, g.name, p.document_number, {document_date}, p.title_of_invention
+        FROM g
+        CROSS JOIN inventors i ON i.{ref} = g.{ref}
+        INNER JOIN {dbname} f ON {name_match}
+        INNER JOIN patents p ON g.{ref} = p.{key}
+        {family_join}
+        GROUP BY {family}, f.surname
+        ORDER BY f.surname ASC, p.title_of_invention;
+        """
+
+# same search once the university was resolved into organization ids (see src/organizations.py),
+# the candidate grantees are then found by the integer org_id through idx_grantees_org_id
+SEARCH_ORG_SQL = """
+        WITH g AS MATERIALIZED (
+            SELECT {ref}, name FROM grantees WHERE org_id IN ({org_ids}) {candidate_filter}
+        )
+        SELECT i.first_name, f.first_name, f.surname, i.city, i.state, g.name, p.document_number, {document_date}, p.title_of_invention
+        FROM g
+        CROSS JOIN inventors i ON i.{ref} = g.{ref}
+        INNER JOIN {dbname} f ON {name_match}
+        INNER JOIN patents p ON g.{ref} = p.{key}
+        {family_join}
+        GROUP BY {family}, f.surname
+        ORDER BY f.surname ASC, p.title_of_invention;
+        """
+
+# batch search over many (faculty list, university) jobs in one pass: every university's candidate grantees
+# are collected once into batch_grantees, every faculty name is tagged with its job and university,
+# and the results are split per job by job_id
+BATCH_TABLES_SQL = """
+        DROP TABLE IF EXISTS temp.batch_faculty;
+        DROP TABLE IF EXISTS temp.batch_grantees;
+        CREATE TEMP TABLE batch_faculty (
+            job_id INTEGER,
+            university_id INTEGER,
+            first_name TEXT,
+            surname TEXT,
+            first_key TEXT,
+            first_initial TEXT,
+            first_soundex TEXT,
+            surname_key TEXT,
+            surname_soundex TEXT
+        );
+        CREATE INDEX temp.batch_faculty_surname ON batch_faculty (university_id, surname);
+        CREATE INDEX temp.batch_faculty_surname_key ON batch_faculty (university_id, surname_key, first_key);
+        CREATE INDEX temp.batch_faculty_surname_soundex ON batch_faculty (university_id, surname_soundex, first_soundex);
+        CREATE TEMP TABLE batch_grantees (
+            university_id INTEGER,
+            grantee_id INTEGER,
+            PRIMARY KEY (university_id, grantee_id)
+        ) WITHOUT ROWID;
         """
-    results = read_query(connection, sql.format(dbname=dbname, c=college))
-    connection.commit()
-    connection.close() 
-    return results 
 
-def remove_temp_table(dbname):
-    connection = get_database("database/patents.db")
+BATCH_SEARCH_SQL = """
+        SELECT f.job_id, i.first_name, f.first_name, f.surname, i.city, i.state, g.name, p.document_number, {document_date}, p.title_of_invention
+        FROM temp.batch_grantees b
+        CROSS JOIN grantees g ON g.id = b.grantee_id
+        CROSS JOIN inventors i ON i.{ref} = g.{ref}
+        INNER JOIN temp.batch_faculty f ON f.university_id = b.university_id AND {name_match}
+        INNER JOIN patents p ON g.{ref} = p.{key}
+        {family_join}
+        GROUP BY f.job_id, {family}, f.surname
+        ORDER BY f.job_id, f.surname ASC, p.title_of_invention;
+        """
+
+def has_table(connection, name):
+    sql = "SELECT 1 FROM sqlite_master WHERE name = ?"
+    return connection.execute(sql, (name,)).fetchone() is not None
+
+# databases built before grantees_fts existed fall back to the plain LIKE scan
+def search_sql(connection):
+    if has_table(connection, "grantees_fts"):
+        return SEARCH_FTS_SQL
+    return SEARCH_SQL
+
+def schema_version(connection):
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(inventors)").fetchall()]
+    return 2 if 'patent_id' in columns else 1
+
+def schema_sql(connection):
+    return SCHEMA_SQL[schema_version(connection)]
+
+def family_sql(connection):
+    ref = schema_sql(connection)
+    if has_table(connection, "patent_families"):
+        return {'family_join': FAMILY_SQL['family']['family_join'].format(**ref), 'family': FAMILY_SQL['family']['family']}
+    return FAMILY_SQL['title']
+
+# sort key of a result row in the ORDER BY of search_patents: by faculty surname, then title, NULL titles first
+# (SQLite text order is the code point order of Python strings), for the searches that merge rows in Python
+def result_order(row):
+    return (row[2], row[8] is not None, row[8] or '')
+
+# grant dates are YYYYMMDD, given as a number or as text with or without dashes (e.g. 20050101 or "2005-01-01")
+def normalize_date(date):
+    digits = re.sub(r'[-/]', '', str(date))
+    if not re.fullmatch(r'\d{8}', digits):
+        raise ValueError("invalid date: " + str(date))
+    return int(digits)
+
+# classification prefixes are put into the SQL, so only the characters of USPC and CPC symbols are allowed
+def check_classification(prefix):
+    if not re.fullmatch(r'[A-Za-z0-9 ./]+', prefix):
+        raise ValueError("invalid classification: " + prefix)
+    return prefix
+
+# first_date and last_date bound the grant date (both included), classifications is a list of
+# national main classification prefixes of which a patent must match one
+def patent_filter_sql(connection, first_date=None, last_date=None, classifications=None):
+    conditions = []
+    if first_date is not None or last_date is not None:
+        first = normalize_date(first_date) if first_date is not None else 0
+        last = normalize_date(last_date) if last_date is not None else 99999999
+        if schema_version(connection) == 1:
+            # TEXT dates, BETWEEN also leaves out the 'null' ones
+            conditions.append("p.document_date BETWEEN '%08d' AND '%08d'" % (first, last))
+        else:
+            conditions.append("p.document_date BETWEEN %d AND %d" % (first, last))
+    if classifications:
+        conditions.append("(" + " OR ".join("p.national_main_classifications GLOB '%s*'" % check_classification(prefix) for prefix in classifications) + ")")
+    if not conditions:
+        return NO_FILTER
+    patent_filter = " AND ".join(conditions)
+    ref = schema_sql(connection)
+    return {
+        'patent_filter': patent_filter,
+        'candidate_filter': "AND grantees.{ref} IN (SELECT p.{key} FROM patents p WHERE {f})".format(f=patent_filter, **ref),
+    }
+
+# name_match defaults to exact once the inventors have name keys, and falls back to like when they do not
+def name_match_sql(connection, name_match=None):
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(inventors)").fetchall()]
+    if 'surname_key' not in columns:
+        return NAME_MATCH_SQL['like']
+    return NAME_MATCH_SQL[name_match or 'exact']
+
+# the parameters of the search SQL for a university string
+def university_parameters(college):
+    return {'university': college}
+
+# ids of the grantees a university matches, resolved the same way as in search_patents
+# without org_ids, the university string is the :university parameter of university_parameters
+def candidate_grantees_sql(connection, org_ids=None):
+    if org_ids is not None:
+        return "SELECT id AS grantee_id FROM grantees WHERE org_id IN ({org_ids})".format(org_ids=', '.join(str(int(i)) for i in org_ids))
+    if has_table(connection, "grantees_fts"):
+        return "SELECT rowid AS grantee_id FROM grantees_fts WHERE grantees_fts.name LIKE '%' || :university || '%'"
+    return "SELECT id AS grantee_id FROM grantees WHERE name LIKE '%' || :university || '%'"
+
+# org_ids is None when the university could not be resolved into organizations
+def search_patents_sql(connection, dbname, college, org_ids=None, name_match=None, first_date=None, last_date=None, classifications=None):
+    match = name_match_sql(connection, name_match)
+    filters = patent_filter_sql(connection, first_date, last_date, classifications)
+    if org_ids is not None:
+        sql = SEARCH_ORG_SQL.format(dbname=dbname, org_ids=', '.join(str(int(i)) for i in org_ids), name_match=match, **schema_sql(connection), **family_sql(connection), **filters)
+    else:
+        sql = search_sql(connection).format(dbname=dbname, name_match=match, **schema_sql(connection), **family_sql(connection), **filters)
+    instrumentation.explain(connection, sql, university_parameters(college))
+    return sql
+
+def search_patents(connection, dbname, college, org_ids=None, name_match=None, first_date=None, last_date=None, classifications=None):
+    sql = search_patents_sql(connection, dbname, college, org_ids, name_match, first_date, last_date, classifications)
+    results = read_query(connection, sql, university_parameters(college))
+    return results
+
+# yields the rows of search_patents one at a time, the faculty table must not change until the generator is exhausted
+def iter_search_patents(connection, dbname, college, org_ids=None, name_match=None, first_date=None, last_date=None, classifications=None, chunk_size=1000):
+    sql = search_patents_sql(connection, dbname, college, org_ids, name_match, first_date, last_date, classifications)
+    yield from iter_query(connection, sql, chunk_size, university_parameters(college))
+
+def remove_temp_table(connection, dbname):
     db_cursor = connection.cursor()
-    sql = """DROP TABLE {name}"""
+    sql = """DROP TABLE IF EXISTS temp.{name}"""
     db_cursor.execute(sql.format(name=dbname))
-    connection.commit()
-    connection.close() 
\ No newline at end of file
+    connection.commit() 
\ No newline at end of file
@@ -0,0 +1,134 @@
+from process_namelist import process_file
+from search_patents import DATABASE_PATH, BATCH_TABLES_SQL, BATCH_SEARCH_SQL, open_database, create_faculty_database, populate_faculty_database, search_patents, iter_search_patents, remove_temp_table, candidate_grantees_sql, university_parameters, name_match_sql, schema_sql, family_sql, patent_filter_sql, NO_FILTER, read_query
+from organizations import resolve_university
+from name_keys import name_keys
+from result_cache import ResultCache, database_identity, database_version
+import instrumentation
+
+# keeps one read-only connection to patents.db open across many searches, so its page cache stays warm
+# the faculty TEMP table is created once and emptied between searches, which keeps the SQL text of a search
+# the same for every namelist of a university and lets sqlite3 reuse its prepared statement
+class PatentSearchSession:
+    # name_match is one of the keys of NAME_MATCH_SQL in search_patents.py, None picks the best the database supports
+    # with a cache_path, results are kept in a ResultCache file and repeated searches are answered from it
+    def __init__(self, db_path=DATABASE_PATH, cache_size_mb=512, mmap_size_mb=4096, name_match=None, cache_path=None):
+        self.connection = open_database(db_path)
+        instrumentation.trace(self.connection)
+        self.connection.execute(f"PRAGMA cache_size=-{cache_size_mb * 1024}")
+        self.connection.execute(f"PRAGMA mmap_size={mmap_size_mb * 1024 * 1024}")
+        self.connection.execute("PRAGMA temp_store=MEMORY")
+        self.dbname = create_faculty_database(self.connection, "session")
+        self.org_ids = {}
+        self.org_ids_version = None
+        self.name_match = name_match
+        self.cache = ResultCache(cache_path) if cache_path is not None else None
+        self.database = database_identity(db_path)
+
+    # university names are resolved into organization ids once per version of the database, since an import can add
+    # organizations a university name matches
+    def resolve(self, university_name):
+        version = database_version(self.connection)
+        if version != self.org_ids_version:
+            self.org_ids = {}
+            self.org_ids_version = version
+        if university_name not in self.org_ids:
+            self.org_ids[university_name] = resolve_university(self.connection, university_name)
+        return self.org_ids[university_name]
+
+    # the patent_filter SQL of a filtered search, None without filters, so unfiltered searches keep their cache entries
+    def filter_key(self, first_date=None, last_date=None, classifications=None):
+        filters = patent_filter_sql(self.connection, first_date, last_date, classifications)
+        return None if filters is NO_FILTER else filters['patent_filter']
+
+    # first_date, last_date and classifications are the grant date and classification filters of search_patents
+    def search(self, clean_namelist, university_name, first_date=None, last_date=None, classifications=None):
+        if self.cache is not None:
+            with instrumentation.stage('result_cache'):
+                version = database_version(self.connection)
+                filters = self.filter_key(first_date, last_date, classifications)
+                results = self.cache.get(self.database, clean_namelist, university_name, self.name_match, version, filters)
+            if results is not None:
+                return results
+        with instrumentation.stage('populate_faculty_database'):
+            self.connection.execute("DELETE FROM temp.{name}".format(name=self.dbname))
+            populate_faculty_database(self.connection, self.dbname, clean_namelist)
+        with instrumentation.stage('resolve_university'):
+            org_ids = self.resolve(university_name)
+        with instrumentation.stage('search_patents'):
+            results = search_patents(self.connection, self.dbname, university_name, org_ids, self.name_match, first_date, last_date, classifications)
+        # a failed query (None) is not cached
+        if self.cache is not None and results is not None:
+            with instrumentation.stage('result_cache'):
+                self.cache.put(self.database, clean_namelist, university_name, self.name_match, version, results, filters)
+        return results
+
+    # yields the rows of search() as they are fetched instead of building the whole list,
+    # cached results are replayed but streamed results are not added to the cache
+    # the session must not run another search until the generator is exhausted
+    def iter_search(self, clean_namelist, university_name, first_date=None, last_date=None, classifications=None, chunk_size=1000):
+        if self.cache is not None:
+            filters = self.filter_key(first_date, last_date, classifications)
+            results = self.cache.get(self.database, clean_namelist, university_name, self.name_match, database_version(self.connection), filters)
+            if results is not None:
+                yield from results
+                return
+        self.connection.execute("DELETE FROM temp.{name}".format(name=self.dbname))
+        populate_faculty_database(self.connection, self.dbname, clean_namelist)
+        yield from iter_search_patents(self.connection, self.dbname, university_name, self.resolve(university_name), self.name_match,
+                                       first_date, last_date, classifications, chunk_size)
+
+    def iter_search_file(self, faculty_namelist, university_name, first_date=None, last_date=None, classifications=None, chunk_size=1000):
+        with instrumentation.stage('process_file'):
+            clean_namelist = process_file(faculty_namelist)
+        yield from self.iter_search(clean_namelist, university_name, first_date, last_date, classifications, chunk_size)
+
+    def search_file(self, faculty_namelist, university_name, first_date=None, last_date=None, classifications=None):
+        with instrumentation.stage('process_file'):
+            clean_namelist = process_file(faculty_namelist)
+        return self.search(clean_namelist, university_name, first_date, last_date, classifications)
+
+    # search many (clean_namelist, university_name) jobs in one joined pass over the patent tables,
+    # jobs that resolve to the same grantees share them, returns the results of each job in job order
+    def search_batch(self, jobs):
+        with instrumentation.stage('populate_batch_tables'):
+            self.connection.executescript(BATCH_TABLES_SQL)
+            university_ids = {}
+            for job_id, (clean_namelist, university_name) in enumerate(jobs):
+                org_ids = self.resolve(university_name)
+                candidates = candidate_grantees_sql(self.connection, org_ids)
+                # grantees matched by the university string are only shared by the jobs of the same string
+                key = (candidates, university_name if org_ids is None else None)
+                if key not in university_ids:
+                    university_ids[key] = len(university_ids)
+                    sql = "INSERT INTO temp.batch_grantees SELECT :university_id, grantee_id FROM ({candidates})"
+                    self.connection.execute(sql.format(candidates=candidates), dict(university_parameters(university_name), university_id=university_ids[key]))
+                university_id = university_ids[key]
+                self.connection.executemany("INSERT INTO temp.batch_faculty VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                            [(job_id, university_id, fn, ln) + name_keys(fn, ln) for fn, ln in clean_namelist])
+            self.connection.commit()
+
+        results = [[] for _ in jobs]
+        sql = BATCH_SEARCH_SQL.format(name_match=name_match_sql(self.connection, self.name_match), **schema_sql(self.connection), **family_sql(self.connection))
+        instrumentation.explain(self.connection, sql)
+        with instrumentation.stage('search_batch'):
+            for row in read_query(self.connection, sql):
+                results[row[0]].append(row[1:])
+        return results
+
+    def search_batch_files(self, jobs):
+        with instrumentation.stage('process_file'):
+            jobs = [(process_file(faculty_namelist), university_name) for faculty_namelist, university_name in jobs]
+        return self.search_batch(jobs)
+
+    def close(self):
+        with instrumentation.stage('remove_temp_table'):
+            remove_temp_table(self.connection, self.dbname)
+        self.connection.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import re
+import threading
+from process_namelist import process_file
+from search_patents import family_sql, normalize_date, result_order
+from search_session import PatentSearchSession
+
+SHARD_DIR = "database/shards"
+
+# year shards written by database_setup.py --shards, mapped year -> path
+def list_shards(shard_dir=SHARD_DIR):
+    shards = {}
+    if not os.path.isdir(shard_dir):
+        return shards
+    for filename in os.listdir(shard_dir):
+        match = re.fullmatch(r'patents_(\d{4})\.db', filename)
+        if match:
+            shards[int(match.group(1))] = os.path.join(shard_dir, filename)
+    return shards
+
+# family of a result row as its shard stored it in patent_families (its title in databases without the table),
+# the family search_patents removed the duplicates of that shard by
+ROW_FAMILY_SQL = "SELECT {family} FROM patents p {family_join} WHERE p.document_number = ?"
+
+def row_families(connection, rows):
+    sql = ROW_FAMILY_SQL.format(**family_sql(connection))
+    return [connection.execute(sql, (r[6],)).fetchone()[0] for r in rows]
+
+# the same rows as search_patents over one database holding every year: a patent is reported once per family and
+# faculty surname, in the order of search_patents
+# shard_results are the (family, row) pairs of each shard; family ids are hashed from title and first grantee, so
+# grants of one family in different shards get the same id
+def merge_results(shard_results):
+    seen = set()
+    results = []
+    for pairs in shard_results:
+        for family, r in pairs:
+            key = (family, r[2])
+            if key not in seen:
+                seen.add(key)
+                results.append(r)
+    results.sort(key=result_order)
+    return results
+
+# searches the year shards in parallel: every worker thread keeps one PatentSearchSession (a read-only connection
+# with its own faculty TEMP table) per shard it has searched, and the shards outside the requested years are skipped
+class ShardedSearch:
+    def __init__(self, shard_dir=SHARD_DIR, workers=4):
+        self.shards = list_shards(shard_dir)
+        self.workers = workers
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shard')
+
+    def session(self, path):
+        if not hasattr(self.local, 'sessions'):
+            self.local.sessions = {}
+        if path not in self.local.sessions:
+            self.local.sessions[path] = PatentSearchSession(path)
+        return self.local.sessions[path]
+
+    def search_shard(self, path, clean_namelist, university_name, first_date=None, last_date=None, classifications=None):
+        session = self.session(path)
+        rows = session.search(clean_namelist, university_name, first_date, last_date, classifications)
+        return list(zip(row_families(session.connection, rows), rows))
+
+    def years(self, first_year=None, last_year=None):
+        return [year for year in sorted(self.shards)
+                if (first_year is None or year >= first_year) and (last_year is None or year <= last_year)]
+
+    # the grant date filters also skip the shards of the years outside them
+    def search(self, clean_namelist, university_name, first_year=None, last_year=None, first_date=None, last_date=None, classifications=None):
+        if first_date is not None:
+            first_year = max(first_year or 0, normalize_date(first_date) // 10000)
+        if last_date is not None:
+            last_year = min(last_year or 9999, normalize_date(last_date) // 10000)
+        futures = [self.executor.submit(self.search_shard, self.shards[year], clean_namelist, university_name, first_date, last_date, classifications)
+                   for year in self.years(first_year, last_year)]
+        return merge_results(future.result() for future in futures)
+
+    def search_file(self, faculty_namelist, university_name, first_year=None, last_year=None, first_date=None, last_date=None, classifications=None):
+        return self.search(process_file(faculty_namelist), university_name, first_year, last_year, first_date, last_date, classifications)
+
+    # the sessions belong to the worker threads, so each worker closes its own,
+    # the barrier keeps a worker from picking up a second close task before every worker has one
+    def close(self):
+        barrier = threading.Barrier(self.workers)
+
+        def close_sessions():
+            for session in getattr(self.local, 'sessions', {}).values():
+                session.close()
+            self.local.sessions = {}
+            barrier.wait()
+
+        for future in [self.executor.submit(close_sessions) for _ in range(self.workers)]:
+            future.result()
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
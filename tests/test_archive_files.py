@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+import zipfile
+
+import xmltodict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+import database_setup
+from archive_files import file_digest, open_text
+from test_xml_stream import GRANT
+
+def weekly_xml(first_number, count):
+    return ''.join(GRANT.format(number='%08d' % (first_number + n)) for n in range(count))
+
+class TestArchiveFiles(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs('xml/2013')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def patents(self):
+        connection = sqlite3.connect('patents.db')
+        numbers = [row[0] for row in connection.execute("SELECT document_number FROM patents ORDER BY document_number").fetchall()]
+        connection.close()
+        return numbers
+
+    def test_import_compressed_weekly_files(self):
+        with gzip.open('xml/2013/ipgb20130101.xml.gz', 'wt', encoding='utf-8') as f:
+            f.write(weekly_xml(8000001, 2))
+        with zipfile.ZipFile('xml/2013/ipgb20130108.zip', 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('ipg130108.xml', weekly_xml(8000101, 3))
+        # the uncompressed copy of a week that is also compressed is skipped
+        with open('xml/2013/ipgb20130108.xml', 'w') as f:
+            f.write(weekly_xml(8000101, 3))
+        files = database_setup.list_weekly_files('xml', '2013')
+        self.assertEqual([os.path.basename(f) for f in files], ['ipgb20130101.xml.gz', 'ipgb20130108.xml'])
+
+        with open_text('xml/2013/ipgb20130108.zip') as f:
+            self.assertEqual(f.read(), weekly_xml(8000101, 3))
+        os.remove('xml/2013/ipgb20130108.xml')
+        sqlite3.connect('patents.db').close()
+        database_setup.import_database('patents.db', 2013, 2013, source='xml')
+        self.assertEqual(self.patents(), ['08000001', '08000002', '08000101', '08000102', '08000103'])
+        # the manifest records the compressed file, its size on disk and the digest of the weekly file it holds
+        connection = sqlite3.connect('patents.db')
+        manifest = {filename: (size, sha256) for filename, size, sha256 in connection.execute("SELECT filename, size, sha256 FROM ingest_manifest")}
+        connection.close()
+        for filename, first_number, count in [('xml/2013/ipgb20130101.xml.gz', 8000001, 2), ('xml/2013/ipgb20130108.zip', 8000101, 3)]:
+            digest = hashlib.sha256(weekly_xml(first_number, count).encode('utf-8')).hexdigest()
+            self.assertEqual(manifest[filename], (os.path.getsize(filename), digest))
+            self.assertEqual(file_digest(filename), manifest[filename])
+
+    def test_import_from_source_archive(self):
+        os.rmdir('xml/2013')
+        os.rmdir('xml')
+        patents = [xmltodict.parse(GRANT.format(number='%08d' % n)) for n in (8000001, 8000002)]
+        with zipfile.ZipFile('json.zip', 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('json/2013/ipgb20130101.json', json.dumps(patents))
+            archive.writestr('json/2014/ipgb20140107.json', json.dumps([]))
+        self.assertEqual(database_setup.list_weekly_files('json', '2013'), ['json.zip!json/2013/ipgb20130101.json'])
+        sqlite3.connect('patents.db').close()
+        database_setup.import_database('patents.db', 2013, 2013, source='json')
+        self.assertEqual(self.patents(), ['08000001', '08000002'])
+        # a rerun finds the week in the manifest
+        connection = database_setup.get_database('patents.db')
+        self.assertEqual(database_setup.pending_files(database_setup.list_weekly_files('json', '2013'), database_setup.imported_weeks(connection)), [])
+        connection.close()
+
+if __name__ == '__main__':
+    unittest.main()
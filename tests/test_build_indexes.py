@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from build_indexes import create_indexes, explain_search
+from search_patents import NAME_MATCH_SQL, SCHEMA_SQL, FAMILY_SQL, NO_FILTER, SEARCH_SQL, SEARCH_FTS_SQL
+from test_bulk_loader import SCHEMA, patent_rows
+
+class TestBuildIndexes(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.executescript(SCHEMA.replace('CREATE INDEX idx_inventors_surname ON inventors (surname);', ''))
+
+    def tearDown(self):
+        self.connection.close()
+
+    def insert(self, n, grantee):
+        patent_row, inventor_rows, grantee_rows = patent_rows(n)
+        self.connection.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", patent_row)
+        self.connection.executemany("INSERT INTO inventors VALUES (NULL, ?, ?, ?, ?, ?, ?)", inventor_rows)
+        self.connection.execute("INSERT INTO grantees VALUES (NULL, ?, ?, ?, ?, ?, ?)", (patent_row[0], grantee, 'Urbana', 'IL', 'US', '02'))
+
+    def search(self, sql):
+        return sorted(self.connection.execute(sql.format(dbname='faculty', name_match=NAME_MATCH_SQL['like'], **SCHEMA_SQL[1], **FAMILY_SQL['title'], **NO_FILTER), {'university': 'University of Illinois'}).fetchall())
+
+    def test_search_uses_indexes(self):
+        create_indexes(self.connection)
+        plan = '\n'.join(explain_search(self.connection))
+        self.assertIn('SCAN grantees_fts VIRTUAL TABLE', plan)
+        self.assertIn('idx_inventors_document_number (document_number=?)', plan)
+        self.assertNotIn('SCAN i', plan)
+        self.assertNotIn('SCAN grantees ', plan)
+
+    def test_fts_search_matches_like_search(self):
+        self.insert(1, 'The Board of Trustees of the University of Illinois')
+        self.insert(2, 'Stanford University')
+        create_indexes(self.connection)
+        # rows inserted after the index was built are added by the triggers
+        self.insert(3, 'THE UNIVERSITY OF ILLINOIS FOUNDATION')
+        self.connection.execute("CREATE TEMP TABLE faculty (id INTEGER PRIMARY KEY AUTOINCREMENT, first_name TEXT, surname TEXT)")
+        self.connection.executemany("INSERT INTO faculty (first_name, surname) VALUES (?, ?)", [('Kevin', 'Chang'), ('Bin', 'He')])
+        expected = self.search(SEARCH_SQL)
+        self.assertEqual(len(expected), 4)
+        self.assertEqual(self.search(SEARCH_FTS_SQL), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+from bulk_loader import BulkLoader
+
+SCHEMA = """
+CREATE TABLE patents (document_number TEXT PRIMARY KEY, SIR_flag BOOLEAN, document_kind TEXT, document_date TEXT,
+    application_filing_data TEXT, national_main_classifications TEXT, title_of_invention TEXT, not_new_invention_flag BOOLEAN);
+CREATE TABLE inventors (id INTEGER PRIMARY KEY AUTOINCREMENT, document_number TEXT, first_name TEXT, surname TEXT, city TEXT, state TEXT, country TEXT);
+CREATE TABLE grantees (id INTEGER PRIMARY KEY AUTOINCREMENT, document_number TEXT, name TEXT, city TEXT, state TEXT, country TEXT, type TEXT);
+CREATE TABLE ingest_manifest (week TEXT PRIMARY KEY, filename TEXT, size INTEGER, sha256 TEXT, patents INTEGER, inventors INTEGER, grantees INTEGER, completed_at TEXT);
+CREATE INDEX idx_inventors_surname ON inventors (surname);
+"""
+
+def patent_rows(n):
+    number = '%08d' % n
+    return ((number, False, 'B2', '20130101', '20100101', '707706', 'Title ' + number, False),
+            [(number, 'Kevin', 'Chang', 'Champaign', 'IL', 'US'), (number, 'Bin', 'He', 'Urbana', 'IL', 'US')],
+            [(number, 'University of Illinois', 'Urbana', 'IL', 'US', '02')])
+
+class TestBulkLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.connection = sqlite3.connect(os.path.join(self.tmp.name, 'patents.db'))
+        self.connection.executescript(SCHEMA)
+
+    def tearDown(self):
+        self.connection.close()
+        self.tmp.cleanup()
+
+    def test_load(self):
+        loader = BulkLoader(self.connection, batch_size=10)
+        loader.start()
+        self.assertEqual(self.connection.execute("SELECT count(*) FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchone()[0], 0)
+        for n in range(25):
+            loader.add(patent_rows(n))
+        self.assertEqual(loader.rows_loaded, 96)
+        report = loader.finish()
+        self.assertEqual(report['rows'], 100)
+        self.assertEqual(self.connection.execute("SELECT count(*) FROM inventors").fetchone()[0], 50)
+        self.assertEqual(self.connection.execute("SELECT count(*) FROM grantees").fetchone()[0], 25)
+        self.assertEqual(self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall(), [('idx_inventors_surname',)])
+        self.assertEqual(self.connection.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+        self.assertEqual(self.connection.execute("PRAGMA synchronous").fetchone()[0], 2)
+
+    def test_file_transactions(self):
+        loader = BulkLoader(self.connection, batch_size=10)
+        loader.start()
+        for n in range(3):
+            loader.add(patent_rows(n))
+        loader.end_file('ipgb20130101', 'xml/2013/ipgb20130101.xml', 100, 'abc')
+        loader.add(patent_rows(3))
+        loader.connection.rollback()
+        self.assertEqual(self.connection.execute("SELECT count(*) FROM patents").fetchone()[0], 3)
+        self.assertEqual(self.connection.execute("SELECT week, patents, inventors, grantees FROM ingest_manifest").fetchall(), [('ipgb20130101', 3, 6, 3)])
+
+        # the tables are not empty anymore, so a second load keeps the indexes
+        loader = BulkLoader(self.connection)
+        loader.start()
+        self.assertFalse(loader.full_load)
+        self.assertEqual(loader.deferred_indexes, [])
+        loader.finish()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from build_coinventors import build_coinventors
+from build_indexes import create_indexes
+from build_name_keys import build_name_keys
+import name_keys
+from coinventors import faculty_coinventors, name_identities, neighbors, with_faculty_coinventors
+from search_patents import create_faculty_database, populate_faculty_database, search_patents
+from test_bulk_loader import SCHEMA
+
+PATENTS = {
+    '00000001': [('Kevin', 'Chang'), ('Bin', 'He')],
+    '00000002': [('Kevin', 'Chang'), ('Bin', 'He')],
+    '00000003': [('John', 'Smith'), ('Mary', 'Jones')],
+    '00000004': [('Jane', 'Smith'), ('Bill', 'Wu')],
+}
+
+class TestCoinventors(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.executescript(SCHEMA)
+        for number, inventors in PATENTS.items():
+            self.add_patent(number, inventors)
+        create_indexes(self.connection)
+        build_name_keys(self.connection)
+        build_coinventors(self.connection)
+        self.dbname = create_faculty_database(self.connection, 'University of Illinois')
+
+    def tearDown(self):
+        self.connection.close()
+
+    def add_patent(self, number, inventors):
+        self.connection.execute("INSERT INTO patents VALUES (?, 0, 'B2', '20130101', '20100101', '707706', ?, 0)", (number, 'Title ' + number))
+        self.connection.executemany("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, ?, ?, 'Urbana', 'IL', 'US')",
+                                    [(number, first_name, surname) for first_name, surname in inventors])
+        self.connection.execute("INSERT INTO grantees (document_number, name, city, state, country, type) VALUES (?, 'University of Illinois', 'Urbana', 'IL', 'US', '02')", (number,))
+
+    def search(self, names):
+        self.connection.execute("DELETE FROM temp.{name}".format(name=self.dbname))
+        populate_faculty_database(self.connection, self.dbname, names)
+        return search_patents(self.connection, self.dbname, 'University of Illinois', name_match='exact')
+
+    def shared(self, first, second):
+        [identity] = name_identities(self.connection, *first)
+        [coinventor] = name_identities(self.connection, *second)
+        return dict(neighbors(self.connection, identity)).get(coinventor)
+
+    # identities are keyed by the name keys, the graph is rebuilt when they are re-keyed
+    def test_rebuilt_after_rekey(self):
+        with mock.patch.dict(name_keys.NICKNAMES, {'bin': 'benjamin'}):
+            build_name_keys(self.connection)
+            build_coinventors(self.connection)
+            self.assertEqual(self.shared(('Kevin', 'Chang'), ('Ben', 'He')), 2)
+            self.assertEqual(self.connection.execute("SELECT count(*) FROM inventor_identities WHERE first_key = 'bin'").fetchone()[0], 0)
+            self.assertEqual(self.connection.execute("SELECT count(*) FROM coinventors").fetchone()[0], 6)
+
+    def test_graph(self):
+        self.assertEqual(self.shared(('Kevin', 'Chang'), ('Bin', 'He')), 2)
+        self.assertEqual(self.shared(('Bin', 'He'), ('Kevin', 'Chang')), 2)
+        # nicknames are one identity
+        self.assertEqual(self.shared(('William', 'Wu'), ('Jane', 'Smith')), 1)
+        self.assertIsNone(self.shared(('Kevin', 'Chang'), ('John', 'Smith')))
+        self.assertEqual(len(name_identities(self.connection, '', 'Smith')), 2)
+        # an initial-only first name matches the identities with that first initial
+        self.assertEqual(self.shared(('K', 'Chang'), ('B', 'He')), 2)
+        self.assertEqual(self.shared(('B', 'Wu'), ('Jane', 'Smith')), 1)
+        self.assertEqual(name_identities(self.connection, 'W', 'Wu'), [])
+        self.assertEqual(len(name_identities(self.connection, 'J', 'Smith')), 2)
+
+    def test_incremental(self):
+        self.add_patent('00000005', [('Kevin', 'Chang'), ('Bin', 'He'), ('John', 'Smith')])
+        build_coinventors(self.connection)
+        self.assertEqual(self.shared(('Kevin', 'Chang'), ('Bin', 'He')), 2)
+        build_name_keys(self.connection)
+        build_coinventors(self.connection)
+        self.assertEqual(self.shared(('Kevin', 'Chang'), ('Bin', 'He')), 3)
+        self.assertEqual(self.shared(('John', 'Smith'), ('Bin', 'He')), 1)
+        self.assertEqual(self.connection.execute("SELECT count(*) FROM inventor_identities").fetchone()[0], 6)
+
+    def test_faculty_coinventors(self):
+        names = [('Kevin', 'Chang'), ('Bin', 'He'), ('John', 'Smith'), ('William', 'Wu')]
+        results = self.search(names)
+        self.assertEqual(len(results), 6)
+        kept = list(with_faculty_coinventors(self.connection, results, names))
+        self.assertEqual(sorted((r[2], r[6]) for r in kept), [('Chang', '00000001'), ('Chang', '00000002'), ('He', '00000001'), ('He', '00000002')])
+        coinventors = dict((r[6] + r[2], c) for r, c in faculty_coinventors(self.connection, results, names))
+        self.assertEqual(coinventors['00000001Chang'], [('Bin', 'He')])
+        self.assertEqual(list(with_faculty_coinventors(self.connection, results, names, min_patents=3)), [])
+
+    def test_faculty_without_first_name(self):
+        names = [('', 'Smith'), ('William', 'Wu')]
+        kept = list(with_faculty_coinventors(self.connection, self.search(names), names))
+        # Jane Smith and Bill Wu share a patent, John Smith patents with no other faculty member
+        self.assertEqual(sorted((r[0], r[2], r[6]) for r in kept), [('Bill', 'Wu', '00000004'), ('Jane', 'Smith', '00000004')])
+
+if __name__ == '__main__':
+    unittest.main()
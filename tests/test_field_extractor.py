@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+
+import xmltodict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.dirname(__file__))
+from database_setup import FIELDS_2005_THROUGH_2012, extract2002Through2004, extract2005Through2012, extract2013Through2022
+from field_extractor import make_extractor
+from test_xml_stream import GRANT
+from xml_stream import prune_document
+
+PATDOC = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE PATDOC SYSTEM "ST32-US-Grant-025xml.dtd" [ ]>
+<PATDOC DTD="2.5" STATUS="Build 20020101">
+<SDOBI>
+<B100><B110><DNUM><PDAT>06334220</PDAT></DNUM></B110><B130><PDAT>B1</PDAT></B130><B140><DATE><PDAT>20020101</PDAT></DATE></B140></B100>
+<B200><B220><DATE><PDAT>19990615</PDAT></DATE></B220></B200>
+<B500><B520><B521><PDAT>002001</PDAT></B521></B520><B540><STEXT><PDAT>Glove with a pocket</PDAT></STEXT></B540></B500>
+<B600><B630><B632><PARENT-US><CDOC><DOC><DNUM><PDAT>09012345</PDAT></DNUM></DOC></CDOC></PARENT-US></B632></B630></B600>
+<B700>
+<B720><B721><PARTY-US><NAM><FNM><PDAT>Ann</PDAT></FNM><SNM><STEXT><PDAT>Lee</PDAT></STEXT></SNM></NAM><ADR><CITY><PDAT>Urbana</PDAT></CITY><STATE><PDAT>IL</PDAT></STATE></ADR></PARTY-US></B721></B720>
+<B730><B731><PARTY-US><NAM><FNM><PDAT>John</PDAT></FNM><SNM><STEXT><PDAT>Smith</PDAT></STEXT></SNM></NAM><ADR><CITY><PDAT>Paris</PDAT></CITY><CTRY><PDAT>FR</PDAT></CTRY></ADR></PARTY-US></B731><B732US><PDAT>04</PDAT></B732US></B730>
+</B700>
+</SDOBI>
+<SDOAB><BTEXT><PARA ID="P-00001"><PTEXT><PDAT>A glove.</PDAT></PTEXT></PARA></BTEXT></SDOAB>
+</PATDOC>
+"""
+
+class TestFieldExtractor(unittest.TestCase):
+    def test_2002_single_inventor_and_person_grantee(self):
+        patent_row, inventor_rows, grantee_rows = extract2002Through2004(xmltodict.parse(PATDOC))
+        self.assertEqual(patent_row, ('06334220', False, 'B1', '20020101', '19990615', '002001', 'Glove with a pocket', True))
+        # an address without country is in the US
+        self.assertEqual(inventor_rows, [('06334220', 'Ann', 'Lee', 'Urbana', 'IL', 'US')])
+        self.assertEqual(grantee_rows, [('06334220', 'John Smith', 'Paris', 'null', 'FR', '04')])
+
+    def test_2005_missing_values(self):
+        grant = GRANT.format(number='07000001').replace('us-parties>', 'parties>').replace('us-applicant', 'applicant')
+        grant = grant.replace('<first-name>Bin</first-name>', '<first-name>B<sup>2</sup>in</first-name>')
+        grant = grant.replace('<address><city>Urbana</city><state>IL</state><country>US</country></address></addressbook></applicant>', '</addressbook></applicant>')
+        grant = grant.replace('<classification-national><country>US</country><main-classification>707706</main-classification></classification-national>', '')
+        start = grant.index('<assignees>')
+        grant = grant[:start] + grant[grant.index('</assignees>') + len('</assignees>'):]
+        patent_row, inventor_rows, grantee_rows = extract2005Through2012(xmltodict.parse(grant))
+        self.assertEqual(patent_row[5], 'null')
+        self.assertEqual(inventor_rows[0][1:], ('Kevin Chen-Chuan', 'Chang', 'Champaign', 'IL', 'US'))
+        # a first name with markup and an inventor without address
+        self.assertEqual(inventor_rows[1][1:], ('null', 'He', 'null', 'null', 'null'))
+        self.assertEqual(grantee_rows, [('07000001', 'null', 'null', 'null', 'null', 'null')])
+
+    def test_2013_inventors_of_both_layouts(self):
+        grant = GRANT.format(number='08000001')
+        old_layout = grant.replace('us-parties>', 'parties>').replace('us-applicant', 'applicant')
+        self.assertEqual(extract2013Through2022(xmltodict.parse(grant)), extract2013Through2022(xmltodict.parse(old_layout)))
+
+    def test_empty_element(self):
+        grant = GRANT.format(number='08000001').replace('<us-parties><us-applicants>', '<us-parties><us-applicants/></us-parties><parties><applicants>')
+        grant = grant.replace('</us-applicants></us-parties>', '</applicants></parties>').replace('us-applicant ', 'applicant ').replace('</us-applicant>', '</applicant>')
+        self.assertEqual(len(extract2013Through2022(xmltodict.parse(grant))[1]), 2)
+
+    def test_record_without_document_number(self):
+        grant = GRANT.format(number='08000001').replace('<doc-number>08000001</doc-number>', '')
+        with self.assertRaises(KeyError):
+            extract2013Through2022(xmltodict.parse(grant))
+
+    def test_new_format_is_a_mapping(self):
+        extract = make_extractor(dict(FIELDS_2005_THROUGH_2012, grantee=['addressbook/orgname', 'addressbook/role'], no_grantee=None))
+        self.assertEqual(extract(xmltodict.parse(GRANT.format(number='08000001')))[2],
+                         [('08000001', 'The Board of Trustees of the University of Illinois', '02')])
+
+    def test_pruned_document(self):
+        grant = GRANT.format(number='08000001').replace('</us-bibliographic-data-grant>', '</us-bibliographic-data-grant>\n<abstract><p>An abstract &amp; more.</p></abstract>')
+        pruned = prune_document(grant, extract2013Through2022.keep_element)
+        self.assertNotIn('<abstract>', pruned)
+        self.assertEqual(extract2013Through2022(xmltodict.parse(pruned)), extract2013Through2022(xmltodict.parse(grant)))
+        self.assertEqual(extract2002Through2004(xmltodict.parse(prune_document(PATDOC, 'SDOBI'))), extract2002Through2004(xmltodict.parse(PATDOC)))
+
+if __name__ == '__main__':
+    unittest.main()
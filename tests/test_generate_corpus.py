@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import database_setup
+from benchmark import run_benchmark
+from generate_corpus import generate_corpus, issue_dates, weekly_filename
+
+class TestGenerateCorpus(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, directory, year, date):
+        with open(os.path.join(directory, 'xml', str(year), weekly_filename(year, date))) as f:
+            return f.read()
+
+    def test_deterministic(self):
+        first = os.path.join(self.tmp.name, 'first')
+        second = os.path.join(self.tmp.name, 'second')
+        os.makedirs(first)
+        os.makedirs(second)
+        self.assertEqual(generate_corpus(first, 300, weeks_per_year=1), generate_corpus(second, 300, weeks_per_year=1))
+        date = issue_dates(2010, 1)[0]
+        self.assertEqual(self.read(first, 2010, date), self.read(second, 2010, date))
+
+    def test_every_era_extracts(self):
+        summary = generate_corpus(self.tmp.name, 63, weeks_per_year=1)
+        self.assertEqual((summary['grants'], summary['files']), (63, 21))
+        for year in [2003, 2008, 2020]:
+            filename = os.path.join(self.tmp.name, 'xml', str(year), weekly_filename(year, issue_dates(year, 1)[0]))
+            patents = list(database_setup.read_patents('xml', filename))
+            self.assertEqual(len(patents), 3)
+            for patent in patents:
+                patent_row, inventor_rows, _ = database_setup.extractor_for_year(year)(patent)
+                self.assertEqual(patent_row[3][:4], str(year))
+                self.assertNotEqual(patent_row[6], 'null')
+                self.assertTrue(1 <= len(inventor_rows) <= 4)
+                self.assertNotIn('null', inventor_rows[0][1:3])
+
+    def test_skipped_weeks(self):
+        self.assertNotIn('20020430', issue_dates(2002, 52))
+        self.assertEqual(weekly_filename(2002, '20020507'), 'pgb20020507.xml')
+
+    def test_benchmark_report(self):
+        report = run_benchmark(self.tmp.name, 420, weeks_per_year=1, sizes=[1, 20], repeats=2)
+        self.assertGreater(report['stages']['ingest']['rows'], 420)
+        self.assertEqual([s['names'] for s in report['searches']], [1, 20])
+        json.dumps(report)
+
+if __name__ == '__main__':
+    unittest.main()
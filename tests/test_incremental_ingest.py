@@ -0,0 +1,119 @@
+import contextlib
+import io
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.dirname(__file__))
+import database_setup
+from bulk_loader import BulkLoader
+from test_xml_stream import GRANT
+
+class TestIncrementalIngest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs('xml/2013')
+        sqlite3.connect('patents.db').close()
+        database_setup.create_table_patents()
+        database_setup.create_table_inventors()
+        database_setup.create_table_grantees()
+        database_setup.create_table_ingest_manifest()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write_week(self, week, numbers):
+        with open('xml/2013/' + week + '.xml', 'w') as f:
+            for number in numbers:
+                f.write(GRANT.format(number=number))
+
+    def load(self):
+        connection = database_setup.get_database('patents.db')
+        loader = BulkLoader(connection)
+        loader.start()
+        database_setup.populate(2013, 2013, database_setup.extract2013Through2022, 'xml', loader)
+        loader.finish()
+        counts = connection.execute("SELECT count(*) FROM patents").fetchone()[0], connection.execute("SELECT count(*) FROM ingest_manifest").fetchone()[0]
+        connection.close()
+        return counts
+
+    def test_rerun_only_loads_new_weeks(self):
+        self.write_week('ipgb20130101', ['08000001', '08000002'])
+        self.assertEqual(self.load(), (2, 1))
+        self.assertEqual(self.load(), (2, 1))
+        self.write_week('ipgb20130108', ['08000003'])
+        self.assertEqual(self.load(), (3, 2))
+
+    # the first import dies after committing its first weekly file, the rerun resumes it
+    def test_resumed_import_builds_indexes(self):
+        self.write_week('ipgb20130101', ['08000001', '08000002'])
+        self.write_week('ipgb20130108', ['08000003'])
+        crash = """
+import os, sys
+sys.path.insert(0, {database!r})
+import database_setup
+from bulk_loader import BulkLoader
+end_file = BulkLoader.end_file
+def end_file_then_crash(self, *args):
+    end_file(self, *args)
+    os._exit(1)
+BulkLoader.end_file = end_file_then_crash
+database_setup.import_database('patents.db', 2013, 2013, source='xml')
+""".format(database=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database'))
+        self.assertEqual(subprocess.run([sys.executable, '-c', crash], capture_output=True).returncode, 1)
+        connection = sqlite3.connect('patents.db')
+        self.assertEqual(connection.execute("SELECT count(*) FROM ingest_manifest").fetchone()[0], 1)
+        connection.close()
+
+        database_setup.import_database('patents.db', 2013, 2013, source='xml')
+        connection = sqlite3.connect('patents.db')
+        self.assertEqual(connection.execute("SELECT count(*) FROM patents").fetchone()[0], 3)
+        names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+        for index in ['idx_inventors_surname', 'idx_inventors_document_number', 'idx_grantees_document_number', 'idx_patents_document_number',
+                      'idx_patents_document_date', 'idx_patents_classification', 'grantees_fts', 'sqlite_stat1']:
+            self.assertIn(index, names)
+        connection.close()
+
+    # the stages of an incremental import start at the rows of the new week, an old row without keys is not revisited
+    def test_incremental_stages_visit_new_rows(self):
+        self.write_week('ipgb20130101', ['08000001', '08000002'])
+        database_setup.import_database('patents.db', 2013, 2013, source='xml')
+        connection = sqlite3.connect('patents.db')
+        connection.execute("UPDATE inventors SET surname_key = NULL, identity_id = NULL WHERE id = 1")
+        connection.commit()
+        connection.close()
+
+        self.write_week('ipgb20130108', ['08000003'])
+        database_setup.import_database('patents.db', 2013, 2013, source='xml')
+        connection = sqlite3.connect('patents.db')
+        self.assertEqual(connection.execute("SELECT id FROM inventors WHERE surname_key IS NULL").fetchall(), [(1,)])
+        self.assertEqual(connection.execute("SELECT count(*) FROM inventors WHERE document_number = '08000003' AND identity_id > 0").fetchone()[0], 2)
+        self.assertEqual(connection.execute("SELECT count(*) FROM patent_families").fetchone()[0], 3)
+        self.assertEqual(connection.execute("SELECT count(*) FROM grantees WHERE org_id IS NULL").fetchone()[0], 0)
+        self.assertEqual(connection.execute("SELECT count(*) FROM pending_patents").fetchone()[0], 0)
+        connection.close()
+
+    # a file rewritten with the same size is only found changed by its SHA-256
+    def test_verify_compares_digest(self):
+        self.write_week('ipgb20130101', ['08000001'])
+        self.load()
+        self.write_week('ipgb20130101', ['08000009'])
+        connection = sqlite3.connect('patents.db')
+        imported = database_setup.imported_weeks(connection)
+        connection.close()
+        files = database_setup.list_weekly_files('xml', '2013')
+        for verify, warned in [(False, False), (True, True)]:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(database_setup.pending_files(files, imported, verify), [])
+            self.assertEqual('changed since it was imported' in output.getvalue(), warned)
+
+if __name__ == '__main__':
+    unittest.main()
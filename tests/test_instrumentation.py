@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+import instrumentation
+from search_session import PatentSearchSession
+import test_read_only_search
+
+class TestInstrumentation(unittest.TestCase):
+    setUp = test_read_only_search.TestReadOnlySearch.setUp
+
+    def tearDown(self):
+        instrumentation.profile = None
+        self.tmp.cleanup()
+
+    def test_disabled_is_noop(self):
+        self.assertFalse(instrumentation.enabled())
+        with instrumentation.stage('anything'):
+            pass
+        instrumentation.record_file('ipgb20130101', 'xml/2013/ipgb20130101.xml', 10, 100, 1.0)
+        with PatentSearchSession(self.db_path) as session:
+            self.assertEqual(len(session.search([('Kevin', 'Chang')], 'University of Illinois')), 3)
+        self.assertIsNone(instrumentation.profile)
+
+    def test_search_report(self):
+        instrumentation.enable()
+        with PatentSearchSession(self.db_path) as session:
+            session.search([('Bin', 'He'), ('Kevin', 'Chang')], 'University of Illinois')
+            session.search([('Kevin', 'Chang')], 'University of Illinois')
+        instrumentation.record_file('ipgb20130101', 'xml/2013/ipgb20130101.xml', 10, 100, 0.5)
+        path = os.path.join(self.tmp.name, 'report.json')
+        report = instrumentation.write_report(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['stages'].keys(), report['stages'].keys())
+
+        self.assertEqual(report['stages']['search_patents']['count'], 2)
+        self.assertIn('populate_faculty_database', report['stages'])
+        self.assertEqual(report['stages']['remove_temp_table']['count'], 1)
+        self.assertEqual(report['files'][0]['rows_per_second'], 20)
+        self.assertEqual(report['files'][0]['bytes_per_second'], 200)
+        # the two faculty inserts of the first search and the one of the second share one statement text
+        inserts = [s for s in report['statements'] if s['sql'].startswith('INSERT INTO temp.faculty_session')]
+        self.assertEqual(inserts[0]['count'], 3)
+        self.assertEqual(len(report['query_plans']), 1)
+        self.assertTrue(any('faculty_session' in step['detail'] for step in report['query_plans'][0]['plan']))
+        self.assertIsNone(instrumentation.profile)
+
+if __name__ == '__main__':
+    unittest.main()
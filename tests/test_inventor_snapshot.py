@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import database_setup
+from database_setup import bump_database_version
+from generate_corpus import generate_corpus
+from inventor_snapshot import InventorSnapshot, write_snapshot
+from migrate_schema_v2 import convert
+from process_namelist import process_file
+from search_session import PatentSearchSession
+
+class TestInventorSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        generate_corpus('.', 600, first_year=2011, last_year=2013, weeks_per_year=2, faculty_size=40, faculty_share=0.3)
+        sqlite3.connect('patents.db').close()
+        database_setup.import_database('patents.db', source='xml')
+        self.faculty = process_file('faculty.txt')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def keys(self, results):
+        return [(r[2], r[8]) for r in results]
+
+    def export(self, db_path, directory):
+        connection = sqlite3.connect(db_path)
+        write_snapshot(connection, directory)
+        connection.close()
+
+    def check_snapshot(self, db_path):
+        self.export(db_path, 'snapshot')
+        # the same faculty with initial-only first names, like "Fuchs, W. Kent" once cleaned
+        initials = [(first_name[:1], surname) for first_name, surname in self.faculty]
+        surnames = [('', surname) for _, surname in self.faculty]
+        with PatentSearchSession(db_path) as session, InventorSnapshot('snapshot') as snapshot:
+            for university, filters in [('University of Illinois', ()), ('UIUC', ()), ('University of Illinois', ('2012-01-01', 20121231)),
+                                        ('University of Illinois', (None, None, ['1', '23'])), ('Unknown College', ())]:
+                for namelist in [self.faculty, initials, surnames, []]:
+                    expected = session.search(namelist, university, *filters)
+                    results = snapshot.search(namelist, university, *filters)
+                    self.assertEqual(self.keys(results), self.keys(expected))
+                    self.assertEqual(sorted(r[6] for r in results), sorted(r[6] for r in expected))
+            self.assertGreaterEqual(len(snapshot.search(initials, 'University of Illinois')), len(snapshot.search(self.faculty, 'University of Illinois')))
+            self.assertGreater(len(snapshot.search(self.faculty, 'University of Illinois')), 10)
+
+    def test_schema_v1(self):
+        self.check_snapshot('patents.db')
+
+    def test_schema_v2(self):
+        convert('patents.db', 'patents_v2.db')
+        self.check_snapshot('patents_v2.db')
+
+    def test_export_replaces_snapshot(self):
+        self.export('patents.db', 'snapshot')
+        with InventorSnapshot('snapshot') as snapshot:
+            results = snapshot.search(self.faculty, 'University of Illinois')
+            # an open snapshot keeps searching the files it mapped
+            self.export('patents.db', 'snapshot')
+            self.assertEqual(snapshot.search(self.faculty, 'University of Illinois'), results)
+        self.assertEqual(os.listdir('.').count('snapshot.tmp'), 0)
+        with InventorSnapshot('snapshot') as snapshot:
+            self.assertEqual(snapshot.search([('Nobody', 'Unknownsurname')], 'University of Illinois'), [])
+            self.assertEqual(snapshot.database_version, sqlite3.connect('patents.db').execute("PRAGMA user_version").fetchone()[0])
+            self.assertFalse(snapshot.is_stale('patents.db'))
+            self.assertFalse(snapshot.is_stale('missing.db'))
+            connection = sqlite3.connect('patents.db')
+            bump_database_version(connection)
+            connection.close()
+            self.assertTrue(snapshot.is_stale('patents.db'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from migrate_schema_v2 import convert, compare
+from search_session import PatentSearchSession
+import test_read_only_search
+
+class TestMigrateSchemaV2(unittest.TestCase):
+    def setUp(self):
+        test_read_only_search.TestReadOnlySearch.setUp(self)
+        connection = sqlite3.connect(self.db_path)
+        connection.execute("UPDATE patents SET application_filing_data = 'null' WHERE rowid = 1")
+        connection.commit()
+        connection.close()
+        self.v2_path = os.path.join(self.tmp.name, 'patents_v2.db')
+        convert(self.db_path, self.v2_path)
+
+    def tearDown(self):
+        test_read_only_search.TestReadOnlySearch.tearDown(self)
+
+    def test_schema(self):
+        connection = sqlite3.connect(self.v2_path)
+        dates = connection.execute("SELECT typeof(document_date), typeof(application_filing_data) FROM patents ORDER BY id").fetchall()
+        self.assertEqual(dates, [('integer', 'null'), ('integer', 'integer'), ('integer', 'integer')])
+        self.assertEqual(connection.execute("SELECT count(*) FROM inventors WHERE typeof(patent_id) != 'integer'").fetchone()[0], 0)
+        self.assertEqual(connection.execute("SELECT count(*) FROM inventors WHERE surname_key IS NULL").fetchone()[0], 0)
+        without_rowid = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE sql LIKE '%WITHOUT ROWID%' AND name NOT LIKE 'grantees_fts%' ORDER BY name")]
+        self.assertEqual(without_rowid, ['coinventors', 'derived_versions', 'ingest_manifest', 'organization_aliases'])
+        connection.close()
+
+    def test_same_results(self):
+        names = [('Bin', 'He'), ('Kevin', 'Chang')]
+        jobs = [(names, 'University of Illinois'), ([('Kevin', 'Chang')], 'Stanford')]
+        with PatentSearchSession(self.db_path) as v1, PatentSearchSession(self.v2_path) as v2:
+            self.assertEqual(v2.search(names, 'University of Illinois'), v1.search(names, 'University of Illinois'))
+            self.assertEqual(v2.search(names, 'Illinois'), v1.search(names, 'Illinois'))
+            self.assertEqual(v2.search_batch(jobs), v1.search_batch(jobs))
+            self.assertEqual(len(v2.search(names, 'University of Illinois')), 6)
+
+    def test_compare(self):
+        report = compare(self.db_path, self.v2_path, 'University of Illinois', names=4)
+        self.assertEqual((report['v1']['schema_version'], report['v2']['schema_version']), (1, 2))
+        self.assertEqual(report['v1']['results'], report['v2']['results'])
+        # the v1 file of the test has no derived tables, the converter builds them
+        self.assertNotIn('patent_families', report['v1']['lookups'])
+        self.assertEqual(report['v2']['lookups']['patent_families']['rows'], 3)
+        self.assertGreater(report['v2']['lookups']['patent_families']['lookup_us'], 0)
+        self.assertGreater(report['v2']['lookups']['organizations']['bytes'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
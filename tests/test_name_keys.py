@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from build_indexes import create_indexes
+from build_name_keys import build_name_keys
+import name_keys as name_keys_module
+from name_keys import exact_keys, name_keys, name_keys_version, soundex
+from search_patents import create_faculty_database, populate_faculty_database, search_patents
+from test_bulk_loader import SCHEMA, patent_rows
+
+class TestNameKeys(unittest.TestCase):
+    def test_soundex(self):
+        self.assertEqual(soundex('Robert'), 'r163')
+        self.assertEqual(soundex('Rupert'), 'r163')
+        self.assertEqual(soundex('Ashcraft'), 'a261')
+        self.assertEqual(soundex('Tymczak'), 't522')
+        self.assertEqual(soundex(''), '')
+
+    def test_name_keys(self):
+        self.assertEqual(name_keys('J. Kevin', 'Chang'), ('kevin', 'j', 'k150', 'chang', 'c520'))
+        self.assertEqual(name_keys('Bill', "O'Brien")[0], 'william')
+        self.assertEqual(name_keys('William', 'Smith')[0], 'william')
+        self.assertEqual(name_keys('Al', 'Smith')[0], 'al')
+        self.assertEqual(name_keys('José', 'Núñez')[3], 'nunez')
+        self.assertEqual(name_keys('null', None), ('', '', '', '', ''))
+        self.assertEqual(exact_keys('Bill', "O'Brien"), ('william', 'b', 'obrien'))
+        self.assertEqual(exact_keys('W.', 'Fuchs'), ('w', 'w', 'fuchs'))
+        self.assertEqual(exact_keys(None, 'null'), ('', '', ''))
+
+class TestNameKeySearch(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.executescript(SCHEMA)
+        for n in range(3):
+            patent_row, inventor_rows, grantee_rows = patent_rows(n)
+            self.connection.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", patent_row)
+            self.connection.executemany("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, ?, ?, ?, ?, ?)", inventor_rows)
+            self.connection.executemany("INSERT INTO grantees (document_number, name, city, state, country, type) VALUES (?, ?, ?, ?, ?, ?)", grantee_rows)
+        self.connection.execute("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, 'William', 'Smith', 'Urbana', 'IL', 'US')", (patent_rows(0)[0][0],))
+        self.connection.execute("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, 'W. Kent', 'Fuchs', 'Urbana', 'IL', 'US')", (patent_rows(1)[0][0],))
+        create_indexes(self.connection)
+        build_name_keys(self.connection)
+        self.dbname = create_faculty_database(self.connection, 'University of Illinois')
+
+    def tearDown(self):
+        self.connection.close()
+
+    def search(self, names, name_match):
+        self.connection.execute("DELETE FROM temp.{name}".format(name=self.dbname))
+        populate_faculty_database(self.connection, self.dbname, names)
+        return sorted(search_patents(self.connection, self.dbname, 'University of Illinois', name_match=name_match))
+
+    def test_exact_matches_like(self):
+        names = [('Kevin', 'Chang'), ('Bin', 'He')]
+        self.assertEqual(len(self.search(names, 'exact')), 6)
+        self.assertEqual(self.search(names, 'exact'), self.search(names, 'like'))
+
+    def test_nickname(self):
+        self.assertEqual(len(self.search([('Bill', 'Smith')], 'like')), 0)
+        self.assertEqual(len(self.search([('Bill', 'Smith')], 'exact')), 1)
+        self.assertEqual(len(self.search([('Al', 'Smith')], 'exact')), 0)
+
+    def test_initial_only(self):
+        # "Fuchs, W. Kent" is cleaned to ('W', 'Fuchs'), whose first key is the initial
+        self.assertEqual(len(self.search([('Kent', 'Fuchs')], 'exact')), 1)
+        self.assertEqual(len(self.search([('W', 'Fuchs')], 'exact')), 1)
+        self.assertEqual(len(self.search([('W', 'Fuchs')], 'phonetic')), 1)
+        self.assertEqual(len(self.search([('K', 'Fuchs')], 'exact')), 0)
+        self.assertEqual(len(self.search([('K', 'Chang')], 'exact')), 3)
+
+    def test_phonetic(self):
+        self.assertEqual(len(self.search([('Kevin', 'Chang')], 'exact')), 3)
+        self.assertEqual(len(self.search([('Kevin', 'Cheng')], 'exact')), 0)
+        self.assertEqual(len(self.search([('Kevin', 'Cheng')], 'phonetic')), 3)
+
+    # editing NICKNAMES changes the version of the keys, and every inventor is keyed again
+    def test_rekey_after_nicknames_change(self):
+        version = name_keys_version()
+        with mock.patch.dict(name_keys_module.NICKNAMES, {'kevin': 'kev'}):
+            self.assertNotEqual(name_keys_version(), version)
+            build_name_keys(self.connection)
+            self.assertEqual(len(self.search([('Kev', 'Chang')], 'exact')), 3)
+        build_name_keys(self.connection)
+        self.assertEqual(len(self.search([('Kev', 'Chang')], 'exact')), 0)
+        self.assertEqual(len(self.search([('Kevin', 'Chang')], 'exact')), 3)
+
+    def test_uses_name_key_index(self):
+        build_name_keys(self.connection)
+        plan = ' '.join(row[3] for row in self.connection.execute("EXPLAIN QUERY PLAN SELECT document_number FROM inventors WHERE surname_key = 'chang' AND first_key = 'kevin'"))
+        self.assertIn('idx_inventors_name_key', plan)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from build_organizations import build_organizations
+from organizations import normalize_org_name, resolve_organizations
+from search_patents import NAME_MATCH_SQL, SCHEMA_SQL, FAMILY_SQL, NO_FILTER, SEARCH_SQL, SEARCH_ORG_SQL
+from test_bulk_loader import SCHEMA, patent_rows
+
+GRANTEES = [
+    'The Board of Trustees of the University of Illinois',
+    'University of Illinois',
+    'THE UNIVERSITY OF ILLINOIS FOUNDATION',
+    'The Regents of the University of California',
+    'Stanford University',
+]
+
+class TestOrganizations(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.executescript(SCHEMA)
+        for n, grantee in enumerate(GRANTEES):
+            patent_row, inventor_rows, _ = patent_rows(n)
+            self.connection.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", patent_row)
+            self.connection.executemany("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, ?, ?, ?, ?, ?)", inventor_rows)
+            self.connection.execute("INSERT INTO grantees (document_number, name) VALUES (?, ?)", (patent_row[0], grantee))
+        build_organizations(self.connection)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def resolve(self, name):
+        ids = resolve_organizations(self.connection, name)
+        return sorted(row[0] for row in self.connection.execute("SELECT name FROM organizations WHERE id IN (%s)" % ', '.join(map(str, ids))))
+
+    def test_normalize(self):
+        self.assertEqual(normalize_org_name('The Board of Trustees of the University of Illinois'), 'university of illinois')
+        self.assertEqual(normalize_org_name('Regents of the University of California, The'), 'university of california')
+        self.assertEqual(normalize_org_name('AT&T Corp.'), 'at and t')
+
+    def test_resolve(self):
+        self.assertEqual(self.connection.execute("SELECT count(*) FROM organizations").fetchone()[0], 4)
+        illinois = ['THE UNIVERSITY OF ILLINOIS FOUNDATION', 'The Board of Trustees of the University of Illinois']
+        self.assertEqual(self.resolve('University of Illinois'), illinois)
+        self.assertEqual(self.resolve('UIUC'), illinois)
+        self.assertEqual(self.resolve('University of Illinois Urbana-Champaign'), illinois)
+        self.assertEqual(self.resolve('UC Berkeley'), ['The Regents of the University of California'])
+        self.assertEqual(self.resolve('Harvard'), [])
+
+    def test_org_search_matches_like_search(self):
+        self.connection.execute("CREATE TEMP TABLE faculty (id INTEGER PRIMARY KEY AUTOINCREMENT, first_name TEXT, surname TEXT)")
+        self.connection.execute("INSERT INTO faculty (first_name, surname) VALUES ('Kevin', 'Chang')")
+        org_ids = ', '.join(map(str, resolve_organizations(self.connection, 'UIUC')))
+        expected = self.connection.execute(SEARCH_SQL.format(dbname='faculty', name_match=NAME_MATCH_SQL['like'], **SCHEMA_SQL[1], **FAMILY_SQL['title'], **NO_FILTER), {'university': 'University of Illinois'}).fetchall()
+        self.assertEqual(len(expected), 3)
+        self.assertEqual(self.connection.execute(SEARCH_ORG_SQL.format(dbname='faculty', org_ids=org_ids, name_match=NAME_MATCH_SQL['like'], **SCHEMA_SQL[1], **FAMILY_SQL['title'], **NO_FILTER)).fetchall(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
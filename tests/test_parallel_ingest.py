@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import database_setup
+from generate_corpus import generate_corpus
+
+# columns compared besides the row counts
+COLUMNS = {'patents': 'title_of_invention', 'inventors': 'first_name, surname', 'grantees': 'name'}
+
+class TestParallelIngest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        generate_corpus('.', 600, first_year=2011, last_year=2013, weeks_per_year=2, faculty_size=40, faculty_share=0.3)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def load(self, db_path, workers):
+        sqlite3.connect(db_path).close()
+        # small batches, so the workers send every file in several batches
+        database_setup.import_database(db_path, 2011, 2013, source='xml', workers=workers, batch_size=50)
+        connection = sqlite3.connect(db_path)
+        counts = {table: connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in COLUMNS}
+        manifest = connection.execute("SELECT week, filename, size, sha256, patents, inventors, grantees FROM ingest_manifest ORDER BY week").fetchall()
+        rows = {table: sorted(connection.execute(f"SELECT document_number, {columns} FROM {table}").fetchall()) for table, columns in COLUMNS.items()}
+        connection.close()
+        return counts, manifest, rows
+
+    def test_workers_load_the_same_rows(self):
+        counts, manifest, rows = self.load('sequential.db', 1)
+        self.assertGreater(counts['patents'], 0)
+        self.assertEqual(len(manifest), 6)
+        self.assertEqual(self.load('parallel.db', 3), (counts, manifest, rows))
+
+if __name__ == '__main__':
+    unittest.main()
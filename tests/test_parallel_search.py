@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import database_setup
+from generate_corpus import generate_corpus
+from parallel_search import ParallelSearch, partition_namelist
+from process_namelist import process_file
+from search_session import PatentSearchSession
+
+class TestParallelSearch(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        generate_corpus('.', 600, first_year=2011, last_year=2013, weeks_per_year=2, faculty_size=80, faculty_share=0.3)
+        sqlite3.connect('patents.db').close()
+        database_setup.import_database('patents.db', source='xml')
+        self.faculty = process_file('faculty.txt')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_partitions_keep_surnames_together(self):
+        names = self.faculty + [('Someone', surname) for _, surname in self.faculty[:10]]
+        parts = partition_namelist(names, 4)
+        self.assertEqual(sorted(n for part in parts for n in part), sorted(names))
+        surnames = [set(surname for _, surname in part) for part in parts]
+        for i in range(len(surnames)):
+            for j in range(i + 1, len(surnames)):
+                self.assertFalse(surnames[i] & surnames[j])
+
+    def test_matches_single_connection(self):
+        with PatentSearchSession('patents.db') as session:
+            expected = session.search(self.faculty, 'University of Illinois')
+            expected_2012 = session.search(self.faculty, 'University of Illinois', 20120101, 20121231)
+            expected_few = session.search(self.faculty[:5], 'University of Illinois')
+        self.assertGreater(len(expected), 0)
+        with ParallelSearch('patents.db', workers=3, min_partition_size=1) as parallel:
+            self.assertEqual(parallel.search(self.faculty, 'University of Illinois'), expected)
+            self.assertEqual(parallel.search_file('faculty.txt', 'University of Illinois', 20120101, 20121231), expected_2012)
+        # lists shorter than min_partition_size are searched in one piece
+        with ParallelSearch('patents.db', workers=3) as parallel:
+            self.assertEqual(parallel.search(self.faculty[:5], 'University of Illinois'), expected_few)
+
+if __name__ == '__main__':
+    unittest.main()
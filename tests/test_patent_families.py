@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from build_indexes import create_indexes
+from build_name_keys import build_name_keys
+from build_organizations import build_organizations
+from build_patent_families import build_patent_families
+from family_keys import family_id, normalize_title
+from search_session import PatentSearchSession
+from test_bulk_loader import SCHEMA
+
+# an original grant, its reissue under the grantee's legal name, and a grant with the same title to another grantee
+PATENTS = [
+    ('07654321', 'B2', 'Data mining system', False, 'University of Illinois'),
+    ('RE041234', 'E', 'Data Mining System.', True, 'The Board of Trustees of the University of Illinois'),
+    ('07777777', 'B2', 'Data mining system', False, 'University of Illinois Foundation'),
+]
+
+class TestPatentFamilies(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'patents.db')
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.executescript(SCHEMA)
+        for patent in PATENTS:
+            self.insert(*patent)
+        create_indexes(self.connection)
+        build_organizations(self.connection)
+        build_name_keys(self.connection)
+
+    def tearDown(self):
+        self.connection.close()
+        self.tmp.cleanup()
+
+    def insert(self, number, kind, title, reissue, grantee):
+        self.connection.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (number, False, kind, '20130101', '20100101', '707706', title, reissue))
+        self.connection.execute("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, 'Kevin', 'Chang', 'Champaign', 'IL', 'US')", (number,))
+        self.connection.execute("INSERT INTO grantees (document_number, name, city, state, country, type) VALUES (?, ?, 'Urbana', 'IL', 'US', '02')", (number, grantee))
+        self.connection.commit()
+
+    def families(self):
+        return dict(self.connection.execute("SELECT document_number, family_id FROM patent_families").fetchall())
+
+    def test_family_id(self):
+        self.assertEqual(normalize_title("Method and apparatus for  Data-Mining."), "method and apparatus for data mining")
+        self.assertEqual(family_id('Data mining system', 'University of Illinois'), family_id('DATA MINING SYSTEM', 'The Board of Trustees of the University of Illinois'))
+        self.assertNotEqual(family_id('Data mining system', 'University of Illinois'), family_id('Data mining system', 'Stanford University'))
+        self.assertNotEqual(family_id('null', 'University of Illinois', '1'), family_id('null', 'University of Illinois', '2'))
+
+    def test_reissue_joins_family_of_original(self):
+        build_patent_families(self.connection)
+        families = self.families()
+        self.assertEqual(families['07654321'], families['RE041234'])
+        self.assertNotEqual(families['07654321'], families['07777777'])
+        # a later reissue is added to the existing family, the other patents are not visited again
+        self.insert('RE042000', 'E', 'Data mining system', True, 'University of Illinois')
+        build_patent_families(self.connection)
+        self.assertEqual(self.families()['RE042000'], families['07654321'])
+        self.assertEqual(len(self.families()), 4)
+
+    def test_search_reports_one_row_per_family(self):
+        with PatentSearchSession(self.db_path) as session:
+            by_title = session.search([('Kevin', 'Chang')], 'University of Illinois')
+        build_patent_families(self.connection)
+        with PatentSearchSession(self.db_path) as session:
+            by_family = session.search([('Kevin', 'Chang')], 'University of Illinois')
+        # grouping by the raw title keeps the reissue apart from its original and merges the other grantee's grant
+        self.assertEqual(len(by_title), 2)
+        self.assertIn('RE041234', [r[6] for r in by_title])
+        self.assertEqual(len(by_family), 2)
+        self.assertIn('07777777', [r[6] for r in by_family])
+
+if __name__ == '__main__':
+    unittest.main()
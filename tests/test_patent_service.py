@@ -0,0 +1,87 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from patent_service import SearchPool, make_server
+import test_read_only_search
+
+class TestPatentService(unittest.TestCase):
+    def setUp(self):
+        test_read_only_search.TestReadOnlySearch.setUp(self)
+        self.pool = SearchPool(self.db_path, workers=2, cache_path=None)
+        self.server = make_server('127.0.0.1', 0, self.pool)
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.pool.close()
+        test_read_only_search.TestReadOnlySearch.tearDown(self)
+
+    def post(self, body):
+        request = urllib.request.Request(self.url + '/search', data=json.dumps(body).encode('utf-8'), method='POST')
+        with urllib.request.urlopen(request) as response:
+            return response.read().decode('utf-8')
+
+    def test_search(self):
+        body = {'names': ['Chang, Kevin', 'Bin He'], 'university': 'University of Illinois'}
+        result = json.loads(self.post(body))
+        self.assertEqual(result['count'], 6)
+        lines = self.post(dict(body, stream=True)).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], result['results'])
+
+    def test_concurrent_requests(self):
+        bodies = [{'names': ['Kevin Chang'], 'university': 'University of Illinois'},
+                  {'names': ['Bin He', 'Kevin Chang'], 'university': 'University of Illinois'},
+                  {'names': ['Kevin Chang'], 'university': 'Stanford'}] * 4
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            counts = list(executor.map(lambda body: json.loads(self.post(body))['count'], bodies))
+        self.assertEqual(counts, [3, 6, 0] * 4)
+
+    def test_errors(self):
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.post({'names': 'Kevin Chang'})
+        self.assertEqual(e.exception.code, 400)
+        # quotes in the university are searched as they are
+        self.assertEqual(json.loads(self.post({'names': ['Kevin Chang'], 'university': "Saint Mary's College"}))['count'], 0)
+        with urllib.request.urlopen(self.url + '/status') as response:
+            self.assertEqual(json.loads(response.read())['status'], 'ok')
+
+    def post_error(self, body):
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.post(body)
+        return e.exception.code, json.loads(e.exception.read())
+
+    def test_bad_names(self):
+        self.assertEqual(self.post_error({'names': [5], 'university': 'University of Illinois'})[0], 400)
+        self.assertEqual(self.post_error({'names': ['Kevin Chang', None], 'university': 'University of Illinois', 'stream': True})[0], 400)
+
+    def test_failed_search(self):
+        connection = sqlite3.connect(self.db_path)
+        connection.execute("DROP TABLE grantees")
+        connection.close()
+        code, body = self.post_error({'names': ['Kevin Chang'], 'university': 'University of Illinois'})
+        self.assertEqual(code, 500)
+        self.assertIn('search failed', body['error'])
+
+    def test_stream_chunks(self):
+        chunks = self.pool.iter_search([('Kevin', 'Chang'), ('Bin', 'He')], 'University of Illinois', chunk_size=2)
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 2])
+        # a stream closed early releases its worker
+        for _ in range(3):
+            chunks = self.pool.iter_search([('Kevin', 'Chang'), ('Bin', 'He')], 'University of Illinois', chunk_size=1)
+            next(chunks)
+            chunks.close()
+        self.assertEqual(len(self.pool.search([('Kevin', 'Chang')], 'University of Illinois')), 3)
+
+if __name__ == '__main__':
+    unittest.main()
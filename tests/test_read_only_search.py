@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from build_indexes import create_indexes
+from search_patents import open_database, create_faculty_database, populate_faculty_database, search_patents, remove_temp_table
+from test_bulk_loader import SCHEMA, patent_rows
+
+class TestReadOnlySearch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'patents.db')
+        connection = sqlite3.connect(self.db_path)
+        connection.executescript(SCHEMA)
+        for n in range(3):
+            patent_row, inventor_rows, grantee_rows = patent_rows(n)
+            connection.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", patent_row)
+            connection.executemany("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, ?, ?, ?, ?, ?)", inventor_rows)
+            connection.executemany("INSERT INTO grantees (document_number, name, city, state, country, type) VALUES (?, ?, ?, ?, ?, ?)", grantee_rows)
+        create_indexes(connection)
+        connection.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def tables(self):
+        connection = sqlite3.connect(self.db_path)
+        tables = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        connection.close()
+        return tables
+
+    def test_concurrent_searches_do_not_write(self):
+        before = self.tables()
+        first = open_database(self.db_path)
+        second = open_database(self.db_path)
+        first_table = create_faculty_database(first, 'University of Illinois')
+        second_table = create_faculty_database(second, 'University of Illinois')
+        populate_faculty_database(first, first_table, [('Kevin', 'Chang')])
+        populate_faculty_database(second, second_table, [('Bin', 'He'), ('Kevin', 'Chang')])
+        self.assertEqual(len(search_patents(first, first_table, 'University of Illinois')), 3)
+        self.assertEqual(len(search_patents(second, second_table, 'University of Illinois')), 6)
+        self.assertEqual(self.tables(), before)
+        with self.assertRaises(sqlite3.OperationalError):
+            first.execute("CREATE TABLE stray (id INTEGER)")
+        remove_temp_table(first, first_table)
+        first.close()
+        second.close()
+
+if __name__ == '__main__':
+    unittest.main()
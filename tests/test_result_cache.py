@@ -0,0 +1,93 @@
+import os
+import shutil
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from database_setup import bump_database_version
+from result_cache import ResultCache
+from search_session import PatentSearchSession
+import test_read_only_search
+
+class TestResultCache(unittest.TestCase):
+    setUp = test_read_only_search.TestReadOnlySearch.setUp
+    tearDown = test_read_only_search.TestReadOnlySearch.tearDown
+
+    def test_repeat_search_hits(self):
+        cache_path = os.path.join(self.tmp.name, 'search_cache.db')
+        names = [('Bin', 'He'), ('Kevin', 'Chang')]
+        with PatentSearchSession(self.db_path, cache_path=cache_path) as session:
+            first = session.search(names, 'University of Illinois')
+            self.assertEqual(session.search(names, 'University of Illinois'), first)
+            self.assertEqual(len(session.search(names, 'Stanford')), 0)
+            self.assertEqual((session.cache.hits, session.cache.misses), (1, 2))
+        with PatentSearchSession(self.db_path, cache_path=cache_path) as session:
+            self.assertEqual(session.search(names, 'University of Illinois'), first)
+            self.assertEqual(session.cache.stats()['hits'], 2)
+
+    def test_import_invalidates(self):
+        cache_path = os.path.join(self.tmp.name, 'search_cache.db')
+        names = [('Kevin', 'Chang')]
+        with PatentSearchSession(self.db_path, cache_path=cache_path) as session:
+            session.search(names, 'University of Illinois')
+        connection = sqlite3.connect(self.db_path)
+        bump_database_version(connection)
+        connection.close()
+        with PatentSearchSession(self.db_path, cache_path=cache_path) as session:
+            self.assertEqual(len(session.search(names, 'University of Illinois')), 3)
+            self.assertEqual((session.cache.hits, session.cache.misses), (0, 1))
+            self.assertEqual(session.cache.stats()['entries'], 1)
+
+    def test_other_database_misses(self):
+        cache_path = os.path.join(self.tmp.name, 'search_cache.db')
+        names = [('Kevin', 'Chang')]
+        # a copy of the database at another path, with the same version stamp but other patents
+        other_path = os.path.join(self.tmp.name, 'other.db')
+        shutil.copy(self.db_path, other_path)
+        connection = sqlite3.connect(other_path)
+        connection.execute("DELETE FROM grantees")
+        connection.commit()
+        connection.close()
+        with PatentSearchSession(self.db_path, cache_path=cache_path) as session:
+            self.assertEqual(len(session.search(names, 'University of Illinois')), 3)
+        with PatentSearchSession(other_path, cache_path=cache_path) as session:
+            self.assertEqual(len(session.search(names, 'University of Illinois')), 0)
+            self.assertEqual((session.cache.hits, session.cache.misses), (0, 1))
+        with PatentSearchSession(self.db_path, cache_path=cache_path) as session:
+            self.assertEqual(len(session.search(names, 'University of Illinois')), 3)
+            self.assertEqual((session.cache.hits, session.cache.misses), (1, 0))
+
+    def test_lru_eviction(self):
+        cache = ResultCache(os.path.join(self.tmp.name, 'search_cache.db'), max_size_mb=1)
+        row = ('x' * 1000,)
+        for n in range(3):
+            cache.put('patents.db', [('A', str(n))], 'U', None, 1, [row] * 400)
+            cache.get('patents.db', [('A', '0')], 'U', None, 1)
+        # about 400 KB per entry: the least recently used one (n = 1) is evicted
+        self.assertIsNotNone(cache.get('patents.db', [('A', '0')], 'U', None, 1))
+        self.assertIsNone(cache.get('patents.db', [('A', '1')], 'U', None, 1))
+        self.assertIsNotNone(cache.get('patents.db', [('A', '2')], 'U', None, 1))
+        cache.close()
+
+    # lookups only count in memory, the counts and last_used are written every flush_every lookups and on close
+    def test_lookups_are_flushed_in_batches(self):
+        cache_path = os.path.join(self.tmp.name, 'search_cache.db')
+        cache = ResultCache(cache_path, flush_every=10)
+        cache.put('patents.db', [('A', '0')], 'U', None, 1, [('x',)])
+        changes = cache.connection.total_changes
+        for n in range(9):
+            cache.get('patents.db', [('A', str(n % 2))], 'U', None, 1)
+        self.assertEqual(cache.connection.total_changes, changes)
+        cache.get('patents.db', [('A', '0')], 'U', None, 1)
+        self.assertGreater(cache.connection.total_changes, changes)
+        cache.get('patents.db', [('A', '0')], 'U', None, 1)
+        cache.close()
+        cache = ResultCache(cache_path)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (7, 4))
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
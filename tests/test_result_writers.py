@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from result_writers import RESULT_COLUMNS, read_columnar, write_columnar, write_results
+from search_session import PatentSearchSession
+import test_read_only_search
+
+class TestResultWriters(unittest.TestCase):
+    setUp = test_read_only_search.TestReadOnlySearch.setUp
+    tearDown = test_read_only_search.TestReadOnlySearch.tearDown
+
+    def test_iter_search_matches_search(self):
+        names = [('Bin', 'He'), ('Kevin', 'Chang')]
+        with PatentSearchSession(self.db_path) as session:
+            results = session.search(names, 'University of Illinois')
+            self.assertEqual(list(session.iter_search(names, 'University of Illinois', chunk_size=2)), results)
+
+    def test_formats_round_trip(self):
+        names = [('Bin', 'He'), ('Kevin', 'Chang')]
+        with PatentSearchSession(self.db_path) as session:
+            results = session.search(names, 'University of Illinois')
+            paths = {}
+            for output_format in ['text', 'csv', 'jsonl', 'columnar']:
+                paths[output_format] = os.path.join(self.tmp.name, 'results.' + output_format)
+                count = write_results(session.iter_search(names, 'University of Illinois'), output_format, paths[output_format])
+                self.assertEqual(count, 6)
+        with open(paths['csv'], newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], RESULT_COLUMNS)
+        self.assertEqual([tuple(r) for r in rows[1:]], results)
+        with open(paths['jsonl']) as f:
+            self.assertEqual([tuple(json.loads(line)[c] for c in RESULT_COLUMNS) for line in f], results)
+        self.assertEqual(list(read_columnar(paths['columnar'])), results)
+        with open(paths['text']) as f:
+            self.assertEqual(f.read().splitlines()[-1], "Number of patents found: 6")
+
+    def test_columnar_row_groups(self):
+        rows = [(str(n), n, None) for n in range(25)]
+        f = io.BytesIO()
+        self.assertEqual(write_columnar(iter(rows), f, ['a', 'b', 'c'], row_group_size=10), 25)
+        path = os.path.join(self.tmp.name, 'rows.columnar')
+        with open(path, 'wb') as out:
+            out.write(f.getvalue())
+        self.assertEqual(list(read_columnar(path)), rows)
+
+    # checked before the name list is even read
+    def test_columnar_needs_output(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'src', 'find_all_patents.py')
+        completed = subprocess.run([sys.executable, script, 'missing_namelist.txt', 'University of Illinois', '--format', 'columnar'],
+                                   cwd=self.tmp.name, capture_output=True, text=True)
+        self.assertEqual(completed.returncode, 2)
+        self.assertIn('needs --output', completed.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import database_setup
+from generate_corpus import generate_corpus
+from migrate_schema_v2 import convert
+from process_namelist import process_file
+from search_patents import normalize_date, patent_filter_sql
+from search_session import PatentSearchSession
+
+class TestSearchFilters(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        generate_corpus('.', 600, first_year=2011, last_year=2013, weeks_per_year=2, faculty_size=40, faculty_share=0.3)
+        sqlite3.connect('patents.db').close()
+        database_setup.import_database('patents.db', source='xml')
+        self.faculty = process_file('faculty.txt')
+        connection = sqlite3.connect('patents.db')
+        self.classifications = dict(connection.execute("SELECT document_number, national_main_classifications FROM patents").fetchall())
+        connection.close()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    # the filters applied in python to the unfiltered results
+    def check_filters(self, db_path):
+        with PatentSearchSession(db_path) as session:
+            everything = session.search(self.faculty, 'University of Illinois')
+            self.assertGreater(len(everything), 0)
+            in_2012 = session.search(self.faculty, 'University of Illinois', '2012-01-01', '20121231')
+            self.assertEqual(in_2012, [r for r in everything if str(r[7]).startswith('2012')])
+            self.assertGreater(len(in_2012), 0)
+            self.assertLess(len(in_2012), len(everything))
+            prefixes = ['1', '23']
+            classified = session.search(self.faculty, 'University of Illinois', classifications=prefixes)
+            self.assertEqual(classified, [r for r in everything if self.classifications[r[6]].startswith(tuple(prefixes))])
+            self.assertEqual(list(session.iter_search(self.faculty, 'University of Illinois', 20120101, None, prefixes)),
+                             [r for r in classified if int(r[7]) >= 20120101])
+
+    def test_schema_v1(self):
+        self.check_filters('patents.db')
+
+    def test_schema_v2(self):
+        convert('patents.db', 'patents_v2.db')
+        self.check_filters('patents_v2.db')
+
+    def test_cache_keeps_filtered_results_apart(self):
+        with PatentSearchSession('patents.db', cache_path='cache.db') as session:
+            everything = session.search(self.faculty, 'University of Illinois')
+            in_2011 = session.search(self.faculty, 'University of Illinois', 20110101, 20111231)
+            self.assertLess(len(in_2011), len(everything))
+            self.assertEqual(session.search(self.faculty, 'University of Illinois', 20110101, 20111231), in_2011)
+            self.assertEqual(session.search(self.faculty, 'University of Illinois'), everything)
+            self.assertEqual(session.cache.hits, 2)
+
+    def test_date_filter_uses_index(self):
+        with PatentSearchSession('patents.db') as session:
+            filters = patent_filter_sql(session.connection, 20120101, 20120131)
+            plan = session.connection.execute("EXPLAIN QUERY PLAN SELECT p.document_number FROM patents p WHERE " + filters['patent_filter']).fetchall()
+        self.assertIn('idx_patents_document_date', ' '.join(row[3] for row in plan))
+
+    def test_invalid_filters(self):
+        self.assertEqual(normalize_date('2012-03-04'), 20120304)
+        with self.assertRaises(ValueError):
+            normalize_date('2012')
+        with PatentSearchSession('patents.db') as session:
+            with self.assertRaises(ValueError):
+                session.search(self.faculty, 'University of Illinois', classifications=["1' OR '1"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,13 @@
 import unittest
 from src.process_namelist import process_file
-from src.search_patents import search_patents, create_faculty_database, populate_faculty_database
+from src.search_patents import search_patents, open_database, create_faculty_database, populate_faculty_database
 
 class Testing(unittest.TestCase):
     clean_namelist = process_file('tests/test_set.txt')
-    dbname = create_faculty_database('University of Illinois')
-    populate_faculty_database(dbname, clean_namelist)
-    results = search_patents(dbname, 'University of Illinois')
+    connection = open_database()
+    dbname = create_faculty_database(connection, 'University of Illinois')
+    populate_faculty_database(connection, dbname, clean_namelist)
+    results = search_patents(connection, dbname, 'University of Illinois')
     
     def test_length(self):
         self.assertEqual(len(self.results), 31)
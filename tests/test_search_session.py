@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from build_organizations import build_organizations
+from database_setup import bump_database_version
+from search_patents import open_database, create_faculty_database, populate_faculty_database, search_patents
+from search_session import PatentSearchSession
+import test_read_only_search
+from test_bulk_loader import patent_rows
+
+class TestSearchSession(unittest.TestCase):
+    setUp = test_read_only_search.TestReadOnlySearch.setUp
+    tearDown = test_read_only_search.TestReadOnlySearch.tearDown
+
+    def search_once(self, names):
+        connection = open_database(self.db_path)
+        dbname = create_faculty_database(connection, 'University of Illinois')
+        populate_faculty_database(connection, dbname, names)
+        results = search_patents(connection, dbname, 'University of Illinois')
+        connection.close()
+        return results
+
+    def test_session_matches_single_searches(self):
+        lists = [[('Kevin', 'Chang')], [('Bin', 'He'), ('Kevin', 'Chang')], [('Nobody', 'Here')]]
+        with PatentSearchSession(self.db_path) as session:
+            for names in lists:
+                self.assertEqual(session.search(names, 'University of Illinois'), self.search_once(names))
+
+    def test_batch_matches_single_searches(self):
+        jobs = [([('Kevin', 'Chang')], 'University of Illinois'),
+                ([('Bin', 'He'), ('Kevin', 'Chang')], 'University of Illinois'),
+                ([('Kevin', 'Chang')], 'Stanford')]
+        with PatentSearchSession(self.db_path) as session:
+            results = session.search_batch(jobs)
+            self.assertEqual(results, [session.search(names, university) for names, university in jobs])
+        self.assertEqual([len(r) for r in results], [3, 6, 0])
+
+    def test_quoted_university(self):
+        patent_row, inventor_rows, _ = patent_rows(3)
+        connection = sqlite3.connect(self.db_path)
+        connection.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", patent_row)
+        connection.executemany("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, ?, ?, ?, ?, ?)", inventor_rows)
+        connection.execute("INSERT INTO grantees (document_number, name, city, state, country, type) VALUES (?, 'Saint Mary''s College', 'Notre Dame', 'IN', 'US', '02')", (patent_row[0],))
+        connection.commit()
+        connection.close()
+        jobs = [([('Kevin', 'Chang')], "Saint Mary's College"), ([('Kevin', 'Chang')], 'University of Illinois'), ([('Kevin', 'Chang')], "O'Hare College")]
+        with PatentSearchSession(self.db_path) as session:
+            self.assertEqual([r[5] for r in session.search(*jobs[0])], ["Saint Mary's College"])
+            self.assertEqual(list(session.iter_search(*jobs[0])), session.search(*jobs[0]))
+            self.assertEqual([len(r) for r in session.search_batch(jobs)], [1, 3, 0])
+
+    def add_patent(self, n, grantee):
+        patent_row, inventor_rows, _ = patent_rows(n)
+        connection = sqlite3.connect(self.db_path)
+        connection.execute("INSERT INTO patents VALUES (?, ?, ?, ?, ?, ?, ?, ?)", patent_row)
+        connection.executemany("INSERT INTO inventors (document_number, first_name, surname, city, state, country) VALUES (?, ?, ?, ?, ?, ?)", inventor_rows)
+        connection.execute("INSERT INTO grantees (document_number, name, city, state, country, type) VALUES (?, ?, 'Urbana', 'IL', 'US', '02')", (patent_row[0], grantee))
+        build_organizations(connection)
+        bump_database_version(connection)
+        connection.close()
+
+    def test_import_refreshes_organizations(self):
+        connection = sqlite3.connect(self.db_path)
+        build_organizations(connection)
+        connection.close()
+        names = [('Kevin', 'Chang')]
+        jobs = [(names, 'University of Illinois')]
+        with PatentSearchSession(self.db_path) as session:
+            self.assertEqual(len(session.search(names, 'University of Illinois')), 3)
+            self.assertEqual(len(session.search(names, 'University of Illinois Research Park')), 0)
+            # an import adds an organization the university name matches
+            self.add_patent(3, 'University of Illinois Research Park LLC')
+            self.assertEqual(len(session.search(names, 'University of Illinois')), 4)
+            self.assertEqual(len(session.search(names, 'University of Illinois Research Park')), 1)
+            self.add_patent(4, 'University of Illinois Research Park LLC')
+            self.assertEqual([len(r) for r in session.search_batch(jobs)], [5])
+
+if __name__ == '__main__':
+    unittest.main()
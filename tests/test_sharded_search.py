@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import database_setup
+from generate_corpus import generate_corpus
+from process_namelist import process_file
+from search_session import PatentSearchSession
+from sharded_search import ShardedSearch, list_shards, merge_results
+
+class TestShardedSearch(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        generate_corpus('.', 600, first_year=2011, last_year=2013, weeks_per_year=2, faculty_size=40, faculty_share=0.3)
+        sqlite3.connect('patents.db').close()
+        database_setup.import_database('patents.db', source='xml')
+        os.makedirs('shards')
+        for year in range(2011, 2014):
+            sqlite3.connect(database_setup.shard_path('shards', year)).close()
+            database_setup.import_database(database_setup.shard_path('shards', year), year, year, source='xml')
+        self.faculty = process_file('faculty.txt')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def keys(self, results):
+        return sorted((r[8], r[2]) for r in results)
+
+    def test_matches_single_database(self):
+        self.assertEqual(sorted(list_shards('shards')), [2011, 2012, 2013])
+        with PatentSearchSession('patents.db') as session:
+            expected = session.search(self.faculty, 'University of Illinois')
+        with ShardedSearch('shards', workers=2) as sharded:
+            results = sharded.search(self.faculty, 'University of Illinois')
+        self.assertGreater(len(expected), 10)
+        self.assertEqual(self.keys(results), self.keys(expected))
+        self.assertEqual([(r[2], r[8]) for r in results], [(r[2], r[8]) for r in expected])
+
+    def test_merge_by_stored_family(self):
+        # the row of a grant in another shard may show another grantee of the family, its stored family id decides
+        first = ('Kevin', 'Kevin', 'Chang', 'Urbana', 'IL', 'University of Illinois', '00000001', '20110104', 'Data mining system')
+        reissue = ('Kevin', 'Kevin', 'Chang', 'Urbana', 'IL', 'Yahoo Inc.', '00000002', '20120103', 'Data mining system')
+        untitled = ('Bin', 'Bin', 'Chang', 'Urbana', 'IL', 'University of Illinois', '00000003', '20120103', None)
+        self.assertEqual(merge_results([[(7, first)], [(7, reissue), (8, untitled)]]), [untitled, first])
+
+    def test_year_range(self):
+        with ShardedSearch('shards', workers=2) as sharded:
+            self.assertEqual(sharded.years(2012), [2012, 2013])
+            results = sharded.search(self.faculty, 'University of Illinois', 2012, 2012)
+            everything = sharded.search(self.faculty, 'University of Illinois')
+        self.assertTrue(results)
+        self.assertTrue(all(r[7].startswith('2012') for r in results))
+        self.assertEqual(len([r for r in everything if r[7].startswith('2012')]), len(results))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'database'))
+from xml_stream import iter_xml_documents, read_xml_patents
+from database_setup import extract2013Through2022
+
+GRANT = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE us-patent-grant SYSTEM "us-patent-grant-v44-2013-05-16.dtd" [ ]>
+<us-patent-grant lang="EN" id="us-patent-grant" country="US">
+<us-bibliographic-data-grant>
+<publication-reference><document-id><country>US</country><doc-number>{number}</doc-number><kind>B2</kind><date>20130101</date></document-id></publication-reference>
+<application-reference appl-type="utility"><document-id><country>US</country><doc-number>12345678</doc-number><date>20100101</date></document-id></application-reference>
+<classification-national><country>US</country><main-classification>707706</main-classification></classification-national>
+<invention-title id="d2e53">Method and system for extracting web query interfaces</invention-title>
+<us-parties><us-applicants>
+<us-applicant sequence="001"><addressbook><last-name>Chang</last-name><first-name>Kevin Chen-Chuan</first-name><address><city>Champaign</city><state>IL</state><country>US</country></address></addressbook></us-applicant>
+<us-applicant sequence="002"><addressbook><last-name>He</last-name><first-name>Bin</first-name><address><city>Urbana</city><state>IL</state><country>US</country></address></addressbook></us-applicant>
+</us-applicants></us-parties>
+<assignees><assignee><addressbook><orgname>The Board of Trustees of the University of Illinois</orgname><role>02</role><address><city>Urbana</city><state>IL</state><country>US</country></address></addressbook></assignee></assignees>
+</us-bibliographic-data-grant>
+</us-patent-grant>
+"""
+
+class TestXmlStream(unittest.TestCase):
+    def test_split_documents(self):
+        weekly = GRANT.format(number='08000001') + GRANT.format(number='08000002')
+        documents = list(iter_xml_documents(io.StringIO(weekly)))
+        self.assertEqual(len(documents), 2)
+        self.assertIn('08000002', documents[1])
+
+    def test_extract_streamed_patent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'ipgb20130101.xml')
+            with open(filename, 'w') as f:
+                f.write(GRANT.format(number='08000001') + '<?xml version="1.0"?>\n<broken>\n' + GRANT.format(number='08000002'))
+            patents = list(read_xml_patents(filename))
+        self.assertEqual(len(patents), 2)
+        patent_row, inventor_rows, grantee_rows = extract2013Through2022(patents[1])
+        self.assertEqual(patent_row[0], '08000002')
+        self.assertEqual(patent_row[3], '20130101')
+        self.assertEqual(len(inventor_rows), 2)
+        self.assertEqual(inventor_rows[0], ('08000002', 'Kevin Chen-Chuan', 'Chang', 'Champaign', 'IL', 'US'))
+        self.assertEqual(grantee_rows[0][1], 'The Board of Trustees of the University of Illinois')
+
+if __name__ == '__main__':
+    unittest.main()